@@ -0,0 +1,176 @@
+#  Copyright 2020-2021 Capypara and the SkyTemple Contributors
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+from typing import Optional, List
+
+from gi.repository import Gtk, GLib, Pango
+
+from skytemple.core.error_handler import display_error
+from skytemple.core.full_text_search import SearchHit, SEARCH_KIND_LABELS, MIN_QUERY_LENGTH
+from skytemple.core.rom_project import RomProject
+from skytemple_files.common.i18n_util import f, _
+
+# Time to wait after the last keystroke before running the search, in ms.
+SEARCH_DEBOUNCE_MS = 150
+# How often the progress of building the index is updated, in ms.
+PROGRESS_UPDATE_INTERVAL = 250
+COL_KIND = 0
+COL_TITLE = 1
+COL_TEXT = 2
+COL_HIT = 3
+
+
+class FullTextSearchController:
+    """A dialog to search the whole ROM and to open the editors of the hits."""
+    def __init__(self, parent_window: Gtk.Window):
+        self.parent_window = parent_window
+        self.window: Optional[Gtk.Dialog] = None
+        self._project: Optional[RomProject] = None
+        self._search: Optional[Gtk.SearchEntry] = None
+        self._status: Optional[Gtk.Label] = None
+        self._store: Optional[Gtk.ListStore] = None
+        self._hits: List[SearchHit] = []
+        self._search_timeout_id: Optional[int] = None
+        self._progress_timeout_id: Optional[int] = None
+
+    def run(self):
+        """
+        Shows the (non-modal) search dialog. If the search index of the current project isn't built yet,
+        it's built in the background and the search is enabled once it's done.
+        """
+        project = RomProject.get_current()
+        if project is None:
+            return
+        if self.window is None:
+            self.window = self._build_dialog()
+        if project != self._project:
+            self._project = project
+            self._hits = []
+            self._store.clear()  # type: ignore
+        self.window.show_all()
+        self.window.present()
+        full_text_search = project.get_full_text_search()
+        if full_text_search.is_ready():
+            self._run_search()
+        else:
+            self._status.set_text(_("Building the search index..."))  # type: ignore
+            if self._progress_timeout_id is None:
+                self._progress_timeout_id = GLib.timeout_add(PROGRESS_UPDATE_INTERVAL, self._update_progress)
+            full_text_search.build(
+                lambda: self._on_index_ready(project), lambda exc_info: self._on_index_error(project, exc_info)
+            )
+
+    def _build_dialog(self) -> Gtk.Dialog:
+        dialog = Gtk.Dialog(title=_("Search ROM"), transient_for=self.parent_window)
+        dialog.set_default_size(800, 500)
+        dialog.connect('delete-event', lambda *args: dialog.hide_on_delete())
+        box: Gtk.Box = dialog.get_content_area()
+        box.set_border_width(6)
+        box.set_spacing(6)
+
+        self._search = Gtk.SearchEntry()
+        self._search.set_placeholder_text(_("Search text strings, scripts and names of Pokémon, items, moves and dungeons..."))
+        self._search.connect('search-changed', self.on_search_changed)
+        self._search.connect('activate', self.on_search_activate)
+        box.pack_start(self._search, False, False, 0)
+
+        self._store = Gtk.ListStore(str, str, str, int)
+        tree = Gtk.TreeView.new_with_model(self._store)
+        tree.set_fixed_height_mode(True)
+        for title, col, width in ((_("Type"), COL_KIND, 100), (_("Location"), COL_TITLE, 200), (_("Text"), COL_TEXT, 460)):
+            renderer = Gtk.CellRendererText()
+            renderer.set_property('ellipsize', Pango.EllipsizeMode.END)
+            column = Gtk.TreeViewColumn(title, renderer, text=col)
+            column.set_sizing(Gtk.TreeViewColumnSizing.FIXED)
+            column.set_fixed_width(width)
+            column.set_resizable(True)
+            tree.append_column(column)
+        tree.connect('row-activated', self.on_tree_row_activated)
+        scroll = Gtk.ScrolledWindow()
+        scroll.add(tree)
+        box.pack_start(scroll, True, True, 0)
+
+        self._status = Gtk.Label()
+        self._status.set_xalign(0)
+        box.pack_start(self._status, False, False, 0)
+        return dialog
+
+    def on_search_changed(self, *args):
+        if self._search_timeout_id is not None:
+            GLib.source_remove(self._search_timeout_id)
+        self._search_timeout_id = GLib.timeout_add(SEARCH_DEBOUNCE_MS, self._on_search_timeout)
+
+    def on_search_activate(self, *args):
+        if self._search_timeout_id is not None:
+            GLib.source_remove(self._search_timeout_id)
+            self._search_timeout_id = None
+        self._run_search()
+
+    def on_tree_row_activated(self, tree: Gtk.TreeView, path: Gtk.TreePath, column: Gtk.TreeViewColumn):
+        hit = self._hits[self._store[path][COL_HIT]]  # type: ignore
+        if self._project is not None:
+            self._project.request_open(hit.document.request)
+
+    def _on_search_timeout(self):
+        self._search_timeout_id = None
+        self._run_search()
+        return False
+
+    def _on_index_ready(self, project: RomProject):
+        self._stop_progress_updates()
+        if project == self._project:
+            self._run_search()
+
+    def _on_index_error(self, project: RomProject, exc_info):
+        self._stop_progress_updates()
+        if project == self._project:
+            self._status.set_text(_("The search index could not be built."))  # type: ignore
+        display_error(exc_info, _("Building the search index failed."), window=self.window)
+
+    def _stop_progress_updates(self):
+        if self._progress_timeout_id is not None:
+            GLib.source_remove(self._progress_timeout_id)
+            self._progress_timeout_id = None
+
+    def _update_progress(self):
+        if self._project is None or not self._project.get_full_text_search().is_building():
+            self._progress_timeout_id = None
+            return False
+        progress = round(self._project.get_full_text_search().get_progress() * 100)
+        self._status.set_text(f(_("Building the search index ({progress}%)...")))  # type: ignore
+        return True
+
+    def _on_index_updated(self, project: RomProject):
+        # Modified sources were re-indexed, update the results.
+        if project == self._project and self.window is not None and self.window.get_visible():
+            self._run_search()
+
+    def _run_search(self):
+        if self._project is None or not self._project.get_full_text_search().is_ready():
+            return
+        query = self._search.get_text()  # type: ignore
+        project = self._project
+        self._hits = project.get_full_text_search().search(query, on_updated=lambda: self._on_index_updated(project))
+        self._store.clear()  # type: ignore
+        for i, hit in enumerate(self._hits):
+            document = hit.document
+            self._store.append([  # type: ignore
+                SEARCH_KIND_LABELS[document.kind], document.title, document.text.replace('\n', ' '), i
+            ])
+        if len(query.strip()) < MIN_QUERY_LENGTH:
+            self._status.set_text(f(_("Enter at least {MIN_QUERY_LENGTH} characters.")))  # type: ignore
+        else:
+            self._status.set_text(f(_("{len(self._hits)} results. Double-click a result to open it.")))  # type: ignore
@@ -20,7 +20,7 @@ import sys
 import traceback
 import webbrowser
 from threading import current_thread
-from typing import Optional, List, Type
+from typing import Optional, List, Type, Dict
 import packaging.version
 
 import gi
@@ -28,6 +28,7 @@ import logging
 
 from gi.repository.GdkPixbuf import Pixbuf
 
+from skytemple.controller.full_text_search import FullTextSearchController
 from skytemple.controller.settings import SettingsController
 from skytemple.controller.tilequant import TilequantController
 from skytemple.core.abstract_module import AbstractModule
@@ -57,9 +58,62 @@ main_thread = current_thread()
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 COL_VISIBLE = 7
+# Delay after the last keystroke in the item search field, before the item tree is filtered
+SEARCH_DEBOUNCE_MS = 200
 DISCORD_INVITE_LINK = 'https://discord.gg/skytemple'
 
 
+class ItemSearchIndex:
+    """
+    Lowercase names of all rows of the main item store in tree order, with links to their parents and children,
+    for filtering the item tree without walking the TreeStore.
+    Tree store iters stay valid, as long as their row isn't removed; the index must be rebuilt when rows are added
+    or removed.
+    """
+    def __init__(self, item_store: Gtk.TreeStore):
+        self.names: List[str] = []
+        self.iters: List[Gtk.TreeIter] = []
+        self.parents: List[int] = []
+        self.children: List[List[int]] = []
+        self.visible: List[bool] = []
+        self.by_path: Dict[str, int] = {}
+        self._add_children(item_store, None, -1)
+
+    def _add_children(self, item_store: Gtk.TreeStore, parent_iter: Optional[Gtk.TreeIter], parent_idx: int):
+        treeiter = item_store.iter_children(parent_iter)
+        while treeiter is not None:
+            idx = len(self.names)
+            self.names.append((item_store.get_value(treeiter, 1) or '').lower())
+            self.iters.append(treeiter)
+            self.parents.append(parent_idx)
+            self.children.append([])
+            self.visible.append(item_store.get_value(treeiter, COL_VISIBLE))
+            self.by_path[item_store.get_string_from_iter(treeiter)] = idx
+            if parent_idx > -1:
+                self.children[parent_idx].append(idx)
+            self._add_children(item_store, treeiter, idx)
+            treeiter = item_store.iter_next(treeiter)
+
+    def get_visible(self, matches: List[int]) -> List[bool]:
+        """Returns which rows are visible, if the given rows match: They, their ancestors and their subtrees."""
+        visible = [False] * len(self.names)
+        subtree_visible = [False] * len(self.names)
+        for idx in matches:
+            parent = idx
+            while parent > -1 and not visible[parent]:
+                visible[parent] = True
+                parent = self.parents[parent]
+            stack = [idx]
+            while len(stack) > 0:
+                node = stack.pop()
+                if subtree_visible[node]:
+                    continue
+                visible[node] = True
+                subtree_visible[node] = True
+                stack.extend(self.children[node])
+        return visible
+
+
 class MainController:
 
     _instance: 'MainController' = None  # type: ignore
@@ -113,6 +167,12 @@ class MainController:
         window.connect("destroy", self.on_destroy)
 
         self._search_text: Optional[str] = None
+        self._search_timeout_id: Optional[int] = None
+        self._search_index: Optional[ItemSearchIndex] = None
+        # Last query and its matches, to narrow down the results if the next query contains it.
+        self._search_last_query: Optional[str] = None
+        self._search_last_matches: Optional[List[int]] = None
+        self._search_applying = False
         self._current_view_module: Optional[AbstractModule] = None
         self._current_view_controller: Optional[AbstractController] = None
         self._current_view_controller_class: Optional[Type[AbstractController]] = None
@@ -140,6 +200,7 @@ class MainController:
 
         self.tilequant_controller = TilequantController(self._window, self.builder)
         self.settings_controller = SettingsController(self._window, self.builder, self.settings)
+        self.full_text_search_controller = FullTextSearchController(self._window)
 
     def on_destroy(self, *args):
         logger.debug('Window destroyed.')
@@ -204,6 +265,9 @@ class MainController:
 
         if ctrl and event.keyval == Gdk.KEY_s and RomProject.get_current() is not None:
             self._save()
+        if ctrl and event.keyval == Gdk.KEY_F and RomProject.get_current() is not None:
+            # Ctrl+Shift+F
+            self.full_text_search_controller.run()
 
     def on_save_button_clicked(self, wdg):
         self._save()
@@ -384,6 +448,14 @@ class MainController:
             if model is not None and treeiter is not None and RomProject.get_current() is not None:
                 self.load_view(model, treeiter, tree, False)
 
+    def on_main_item_list_test_expand_row(self, tree: Gtk.TreeView, treeiter: Gtk.TreeIter, path: Gtk.TreePath):
+        """Let the module of the row add its children, if it adds them on demand."""
+        store_iter = self._main_item_filter.convert_iter_to_child_iter(treeiter)
+        module: Optional[AbstractModule] = self._item_store[store_iter][2]
+        if module is not None:
+            module.load_deferred_tree_items(self._item_store, store_iter)
+        return False
+
     def load_view_main_list(self, treeiter: Gtk.TreeIter):
         return self.load_view(self._item_store, treeiter, self._main_item_list)
 
@@ -467,16 +539,37 @@ class MainController:
 
     def on_item_store_row_changed(self, model, path, iter):
         """Update the window title for the current selected tree model row if it changed"""
+        if not self._search_applying and self._search_index is not None:
+            idx = self._search_index.by_path.get(path.to_string())
+            if idx is not None:
+                name = (model.get_value(iter, 1) or '').lower()
+                if name != self._search_index.names[idx]:
+                    self._search_index.names[idx] = name
+                    self._search_last_matches = None
+                self._search_index.visible[idx] = model.get_value(iter, COL_VISIBLE)
         if model is not None and iter is not None:
             selection_model, selection_iter = self._main_item_list.get_selection().get_selected()
             if selection_model is not None and selection_iter is not None:
                 if selection_model[selection_iter].path == path:
                     self._init_window_before_view_load(model[iter])
 
+    def on_item_store_row_inserted(self, model, path, iter):
+        self._filter__invalidate_index()
+
+    def on_item_store_row_deleted(self, model, path):
+        self._filter__invalidate_index()
+
     def on_main_item_list_search_search_changed(self, search: Gtk.SearchEntry):
-        """Filter the main item view using the search field"""
+        """Filter the main item view using the search field, once the user stopped typing"""
         self._search_text = search.get_text().strip()
+        if self._search_timeout_id is not None:
+            GLib.source_remove(self._search_timeout_id)
+        self._search_timeout_id = GLib.timeout_add(SEARCH_DEBOUNCE_MS, self._filter__on_search_timeout)
+
+    def _filter__on_search_timeout(self):
+        self._search_timeout_id = None
         self._filter__refresh_results()
+        return False
 
     def on_settings_show_assistant_clicked(self, *args):
         assistant: Gtk.Assistant = self.builder.get_object('intro_dialog')
@@ -489,6 +582,17 @@ class MainController:
     def on_settings_open_settings_clicked(self, *args):
         self.settings_controller.run()
 
+    def on_settings_full_text_search_clicked(self, *args):
+        if RomProject.get_current() is None:
+            md = SkyTempleMessageDialog(MainController.window(),
+                                        Gtk.DialogFlags.DESTROY_WITH_PARENT, Gtk.MessageType.ERROR,
+                                        Gtk.ButtonsType.OK, _("A project must be opened to use this."))
+            md.set_position(Gtk.WindowPosition.CENTER)
+            md.run()
+            md.destroy()
+            return
+        self.full_text_search_controller.run()
+
     def on_intro_dialog_created_with_clicked(self, *args):
         if RomProject.get_current() is None or self._loaded_map_bg_module is None:
             md = SkyTempleMessageDialog(MainController.window(),
@@ -655,56 +759,78 @@ class MainController:
 
         # TODO: Recent and Favorites
 
-    # TODO: CODE DUPLICATION BETWEEN SKYTEMPLE AND SSB DEBUGGER -- If we ever make a common package, this must go into it!
     def _filter__refresh_results(self):
         """Filter the main item view"""
         if self._search_text == "":
-            self._item_store.foreach(self._filter__reset_row, True)
+            self._search_last_query = None
+            self._search_last_matches = None
+            self._filter__apply(None)
+            return
+        search_query = self._search_text.lower()  # type: ignore
+        project = RomProject.get_current()
+        if project is not None:
+            for module in project.get_modules():
+                module.load_deferred_tree_items_matching(self._item_store, search_query)
+        index = self._filter__get_index()
+        if self._search_last_matches is not None and self._search_last_query in search_query:  # type: ignore
+            # All rows matching the new query also matched the last one.
+            candidates = self._search_last_matches
         else:
-            self._main_item_list.collapse_all()
-            self._item_store.foreach(self._filter__reset_row, False)
-            self._item_store.foreach(self._filter__show_matches)
-            self._main_item_filter.foreach(self._filter__expand_all_visible)
-
-    def _filter__reset_row(self, model, path, iter, make_visible):
-        """Change the visibility of the given row"""
-        self._item_store[iter][COL_VISIBLE] = make_visible
-
-    def _filter__make_path_visible(self, model, iter):
-        """Make a row and its ancestors visible"""
-        while iter:
-            self._item_store[iter][COL_VISIBLE] = True
-            iter = model.iter_parent(iter)
-
-    def _filter__make_subtree_visible(self, model, iter):
-        """Make descendants of a row visible"""
-        for i in range(model.iter_n_children(iter)):
-            subtree = model.iter_nth_child(iter, i)
-            if model[subtree][COL_VISIBLE]:
-                # Subtree already visible
-                continue
-            self._item_store[subtree][COL_VISIBLE] = True
-            self._filter__make_subtree_visible(model, subtree)
-
-    def _filter__expand_all_visible(self, model: Gtk.TreeStore, path, iter):
+            candidates = range(0, len(index.names))  # type: ignore
+        matches = [idx for idx in candidates if search_query in index.names[idx]]
+        self._search_last_query = search_query
+        self._search_last_matches = matches
+        self._filter__apply(matches)
+
+    def _filter__get_index(self) -> ItemSearchIndex:
+        if self._search_index is None:
+            self._search_index = ItemSearchIndex(self._item_store)
+            self._search_last_matches = None
+        return self._search_index
+
+    def _filter__invalidate_index(self):
+        self._search_index = None
+        self._search_last_matches = None
+
+    def _filter__apply(self, matches: Optional[List[int]]):
         """
-        This is super annoying. Because of the two different "views" on the model,
-        we can't do this in show_matches, because we have to use the filter model here!
+        Show only the matching rows (and their ancestors and subtrees) and expand the matches,
+        or show all rows if matches is None.
+        The view is detached from the filter model, while the visibility of the rows is changed.
         """
-        search_query = self._search_text.lower()  # type: ignore
-        text = model[iter][1].lower()
-        if search_query in text:
-            self._main_item_list.expand_to_path(path)
+        index = self._filter__get_index()
+        if matches is None:
+            visible = [True] * len(index.names)
+        else:
+            visible = index.get_visible(matches)
 
-    def _filter__show_matches(self, model: Gtk.TreeStore, path, iter):
-        search_query = self._search_text.lower()  # type: ignore
-        text = model[iter][1].lower()
-        if search_query in text:
-            # Propagate visibility change up
-            self._filter__make_path_visible(model, iter)
-            # Propagate visibility change down
-            self._filter__make_subtree_visible(model, iter)
-    # END CODE DUPLICATION
+        selected_iter = None
+        model, treeiter = self._main_item_list.get_selection().get_selected()
+        if model is not None and treeiter is not None:
+            selected_iter = self._main_item_filter.convert_iter_to_child_iter(treeiter)
+
+        self._main_item_list.set_model(None)
+        self._search_applying = True
+        try:
+            for idx, row_visible in enumerate(visible):
+                if index.visible[idx] != row_visible:
+                    self._item_store.set_value(index.iters[idx], COL_VISIBLE, row_visible)
+            index.visible = visible
+        finally:
+            self._search_applying = False
+        self._main_item_list.set_model(self._main_item_filter)
+
+        if matches is not None:
+            for idx in matches:
+                path = self._main_item_filter.convert_child_path_to_path(self._item_store.get_path(index.iters[idx]))
+                if path is not None:
+                    self._main_item_list.expand_to_path(path)
+        if selected_iter is not None:
+            path = self._main_item_filter.convert_child_path_to_path(self._item_store.get_path(selected_iter))
+            if path is not None:
+                self._main_item_list.expand_to_path(path)
+                self._main_item_list.get_selection().select_path(path)
+                self._main_item_list.scroll_to_cell(path, None, True, 0.5, 0.5)
 
     def _configure_error_view(self):
         sw: Gtk.ScrolledWindow = self.builder.get_object('es_error_text_sw')
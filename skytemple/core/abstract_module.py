@@ -62,3 +62,15 @@ class AbstractModule(ABC):
         If not implemented, always returns None
         """
         return None
+
+    def load_deferred_tree_items(self, item_store: TreeStore, treeiter: TreeIter):
+        """
+        Called before a row of this module is expanded in the main view list. Modules that only add the
+        children of some rows when they are needed must add them here.
+        """
+
+    def load_deferred_tree_items_matching(self, item_store: TreeStore, search_text: str):
+        """
+        Called before the main view list is filtered. Modules that only add the children of some rows when
+        they are needed must add all rows whose name may contain search_text (lowercase) here.
+        """
@@ -0,0 +1,181 @@
+"""Runs long operations in a worker thread, while showing their progress in a dialog."""
+#  Copyright 2020-2021 Capypara and the SkyTemple Contributors
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+import sys
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+from gi.repository import Gtk, GLib
+
+from skytemple.core.error_handler import display_error
+from skytemple_files.common.i18n_util import _
+
+T = TypeVar('T')
+logger = logging.getLogger(__name__)
+# How often the dialog is updated with the current progress, in ms.
+PROGRESS_UPDATE_INTERVAL = 100
+
+
+class TaskCancelled(Exception):
+    """Raised by TaskProgress.check_cancelled if the user cancelled the task."""
+
+
+class TaskProgress:
+    """
+    Passed to the worker function of a background task to report its progress and to check whether it
+    was cancelled. All methods are thread-safe.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._fraction = 0.0
+        self._text: Optional[str] = None
+
+    def update(self, fraction: float, text: Optional[str] = None):
+        """Sets the progress (0.0 - 1.0) and optionally a text describing the current step."""
+        with self._lock:
+            self._fraction = max(0.0, min(1.0, fraction))
+            if text is not None:
+                self._text = text
+
+    def get(self):
+        with self._lock:
+            return self._fraction, self._text
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check_cancelled(self):
+        """Raises TaskCancelled if the task was cancelled. Workers should call this regularly."""
+        if self._cancelled.is_set():
+            raise TaskCancelled()
+
+
+class BackgroundTask(Generic[T]):
+    """
+    Runs worker in a separate thread and shows a modal progress dialog with a cancel button until it is done.
+    The worker must not use Gtk and must not modify models that are still in use by the UI. It should work on
+    copies instead and return the result, which is then passed to on_done on the main thread, where it can be
+    applied.
+
+    If the worker raises TaskCancelled, nothing else happens. Other exceptions are shown with display_error,
+    using error_message or, if it is not set, the message of the exception.
+    """
+    def __init__(
+            self, parent: Gtk.Window, title: str, worker: Callable[[TaskProgress], T],
+            on_done: Callable[[T], None], error_message: Optional[str] = None, cancellable: bool = True
+    ):
+        self.parent = parent
+        self.title = title
+        self.worker = worker
+        self.on_done = on_done
+        self.error_message = error_message
+        self.cancellable = cancellable
+        self.progress = TaskProgress()
+        self._dialog: Optional[Gtk.Dialog] = None
+        self._progress_bar: Optional[Gtk.ProgressBar] = None
+        self._update_source_id: Optional[int] = None
+
+    def start(self):
+        self._dialog = self._build_dialog()
+        self._dialog.show_all()
+        self._update_source_id = GLib.timeout_add(PROGRESS_UPDATE_INTERVAL, self._update_progress)
+        threading.Thread(target=self._run_worker, daemon=True).start()
+
+    def _build_dialog(self) -> Gtk.Dialog:
+        dialog = Gtk.Dialog(title=self.title, transient_for=self.parent, modal=True)
+        dialog.set_deletable(False)
+        dialog.set_default_size(400, -1)
+        if self.cancellable:
+            dialog.add_button(_("Cancel"), Gtk.ResponseType.CANCEL)
+            dialog.connect('response', self._on_dialog_response)
+        box: Gtk.Box = dialog.get_content_area()
+        box.set_border_width(12)
+        box.set_spacing(6)
+        label = Gtk.Label.new(self.title)
+        label.set_xalign(0)
+        box.pack_start(label, False, False, 0)
+        self._progress_bar = Gtk.ProgressBar()
+        self._progress_bar.set_show_text(True)
+        box.pack_start(self._progress_bar, False, False, 0)
+        return dialog
+
+    def _on_dialog_response(self, dialog: Gtk.Dialog, response: int):
+        if response == Gtk.ResponseType.CANCEL and not self.progress.cancelled:
+            self.progress.cancel()
+            dialog.set_response_sensitive(Gtk.ResponseType.CANCEL, False)
+            if self._progress_bar:
+                self._progress_bar.set_text(_("Cancelling..."))
+
+    def _update_progress(self):
+        if self._progress_bar is None:
+            return False
+        fraction, text = self.progress.get()
+        self._progress_bar.set_fraction(fraction)
+        if not self.progress.cancelled:
+            self._progress_bar.set_text(text if text is not None else f'{round(fraction * 100)}%')
+        return True
+
+    def _run_worker(self):
+        try:
+            result = self.worker(self.progress)
+        except TaskCancelled:
+            GLib.idle_add(self._finish)
+        except BaseException:
+            exc_info = sys.exc_info()
+            GLib.idle_add(lambda: self._finish(exc_info=exc_info))
+        else:
+            GLib.idle_add(lambda: self._finish(result=result, done=True))
+
+    def _finish(self, result=None, done=False, exc_info=None):
+        if self._update_source_id is not None:
+            GLib.source_remove(self._update_source_id)
+            self._update_source_id = None
+        if self._dialog is not None:
+            self._dialog.destroy()
+            self._dialog = None
+            self._progress_bar = None
+        if exc_info is not None:
+            self._display_error(exc_info)
+        elif done:
+            try:
+                self.on_done(result)
+            except BaseException:
+                self._display_error(sys.exc_info())
+        return False
+
+    def _display_error(self, exc_info):
+        display_error(
+            exc_info,
+            self.error_message if self.error_message is not None else str(exc_info[1]),
+            window=self.parent
+        )
+
+
+def run_in_background(
+        parent: Gtk.Window, title: str, worker: Callable[[TaskProgress], T],
+        on_done: Callable[[T], None], error_message: Optional[str] = None, cancellable: bool = True
+) -> BackgroundTask[T]:
+    """Shortcut to create and start a BackgroundTask."""
+    task = BackgroundTask(parent, title, worker, on_done, error_message, cancellable)
+    task.start()
+    return task
@@ -0,0 +1,126 @@
+"""App-wide clock that drives all animated previews."""
+#  Copyright 2020-2021 Capypara and the SkyTemple Contributors
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+import logging
+import weakref
+from typing import Callable, Dict, Optional
+
+from gi.repository import Gtk, Gdk, GLib
+
+logger = logging.getLogger(__name__)
+DEFAULT_FPS = 60
+# If a widget wasn't drawn for longer than this (eg. because it was hidden), the missed ticks are not
+# caught up and the animation just continues.
+MAX_CATCH_UP_TICKS = 10
+
+
+class _Subscription:
+    def __init__(self, widget: Gtk.Widget, callback: Callable[[], bool], fps: int):
+        self.widget = widget
+        self.callback = callback
+        self.fps = fps
+        self.last_tick: Optional[int] = None
+        self.tick_callback_id: Optional[int] = None
+        self.destroy_handler_id: Optional[int] = None
+
+
+class FrameClock:
+    """
+    Drives animations at a fixed number of ticks per second, using the frame clocks of the widgets that show them
+    (Gtk.Widget.add_tick_callback). Gtk only calls tick callbacks while a widget is mapped, so hidden or
+    destroyed previews don't use any CPU. All subscribers share the same time base, so animations with the same
+    speed stay in sync.
+    """
+    _instance = None
+
+    def __init__(self):
+        self._subscriptions: Dict[int, _Subscription] = {}
+        # Owner -> ID of the subscription managed by set_subscribed
+        self._owner_subscriptions: 'weakref.WeakKeyDictionary[object, int]' = weakref.WeakKeyDictionary()
+        self._next_id = 0
+
+    @classmethod
+    def instance(cls) -> 'FrameClock':
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def subscribe(self, widget: Gtk.Widget, callback: Callable[[], bool], fps: int = DEFAULT_FPS) -> int:
+        """
+        Calls callback once per tick, while widget is visible. If the callback returns False, the subscription
+        ends. Returns an ID that can be passed to unsubscribe.
+        """
+        subscription_id = self._next_id
+        self._next_id += 1
+        subscription = _Subscription(widget, callback, fps)
+        subscription.tick_callback_id = widget.add_tick_callback(self._on_widget_tick, subscription_id)
+        # Tick callbacks are not called for widgets that are not mapped anymore, make sure the widget is released.
+        subscription.destroy_handler_id = widget.connect('destroy', lambda *args: self.unsubscribe(subscription_id))
+        self._subscriptions[subscription_id] = subscription
+        return subscription_id
+
+    def unsubscribe(self, subscription_id: Optional[int]):
+        if subscription_id is None or subscription_id not in self._subscriptions:
+            return
+        subscription = self._subscriptions.pop(subscription_id)
+        if subscription.tick_callback_id is not None:
+            subscription.widget.remove_tick_callback(subscription.tick_callback_id)
+        if subscription.destroy_handler_id is not None:
+            subscription.widget.disconnect(subscription.destroy_handler_id)
+
+    def set_subscribed(self, owner: object, enabled: bool,
+                       widget: Gtk.Widget, callback: Callable[[], bool], fps: int = DEFAULT_FPS):
+        """
+        Subscribes (see subscribe) or unsubscribes the owner (eg. a drawer), depending on enabled.
+        Owners can call this whenever something changed that decides whether they need ticks, calling it again
+        with the same state does nothing.
+        """
+        subscription_id = self._owner_subscriptions.get(owner)
+        subscription = self._subscriptions.get(subscription_id) if subscription_id is not None else None
+        if subscription is not None and (not enabled or subscription.widget is not widget):
+            self.unsubscribe(subscription_id)
+            subscription = None
+        if subscription is None:
+            self._owner_subscriptions.pop(owner, None)
+            if enabled:
+                self._owner_subscriptions[owner] = self.subscribe(widget, callback, fps)
+
+    def number_of_subscriptions(self) -> int:
+        return len(self._subscriptions)
+
+    def _on_widget_tick(self, widget: Gtk.Widget, frame_clock: Gdk.FrameClock, subscription_id: int) -> bool:
+        subscription = self._subscriptions.get(subscription_id)
+        if subscription is None:
+            return GLib.SOURCE_REMOVE
+        tick = frame_clock.get_frame_time() * subscription.fps // 1000000
+        if subscription.last_tick is None:
+            subscription.last_tick = tick - 1
+        elapsed = tick - subscription.last_tick
+        if elapsed > MAX_CATCH_UP_TICKS:
+            elapsed = 1
+        subscription.last_tick = tick
+        for _ in range(0, elapsed):
+            try:
+                keep = subscription.callback()
+            except BaseException as ex:
+                logger.error("Error in animation tick.", exc_info=ex)
+                keep = False
+            if not keep:
+                # The tick callback itself is removed by returning SOURCE_REMOVE.
+                subscription.tick_callback_id = None
+                self.unsubscribe(subscription_id)
+                return GLib.SOURCE_REMOVE
+        return GLib.SOURCE_CONTINUE
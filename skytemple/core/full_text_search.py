@@ -0,0 +1,462 @@
+"""ROM-wide full-text search over the text strings, the script sources and the names of Pokémon, items, moves and dungeons."""
+#  Copyright 2020-2021 Capypara and the SkyTemple Contributors
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import heapq
+import logging
+import re
+import sys
+import threading
+from bisect import bisect_left
+from types import TracebackType
+from typing import TYPE_CHECKING, Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Set, Tuple, \
+    Type
+
+from gi.repository import GLib
+
+from skytemple.core.open_request import OpenRequest, REQUEST_TYPE_STRING, REQUEST_TYPE_MONSTER, REQUEST_TYPE_ITEM, \
+    REQUEST_TYPE_MOVE, REQUEST_TYPE_DUNGEON, REQUEST_TYPE_SCRIPT
+from skytemple.core.string_provider import StringType, MESSAGE_DIR
+from skytemple_files.common.script_util import SCRIPT_DIR, SSB_EXT
+from skytemple_files.common.types.file_types import FileType
+from skytemple_files.common.i18n_util import _
+
+if TYPE_CHECKING:
+    from skytemple.core.rom_project import RomProject
+
+logger = logging.getLogger(__name__)
+
+SEARCH_KIND_MONSTER = 'monster'
+SEARCH_KIND_ITEM = 'item'
+SEARCH_KIND_MOVE = 'move'
+SEARCH_KIND_DUNGEON = 'dungeon'
+SEARCH_KIND_STRING = 'string'
+SEARCH_KIND_SCRIPT = 'script'
+SEARCH_KIND_LABELS = {
+    SEARCH_KIND_MONSTER: _('Pokémon'),
+    SEARCH_KIND_ITEM: _('Item'),
+    SEARCH_KIND_MOVE: _('Move'),
+    SEARCH_KIND_DUNGEON: _('Dungeon'),
+    SEARCH_KIND_STRING: _('Text String'),
+    SEARCH_KIND_SCRIPT: _('Script'),
+}
+# Added to the score of hits, so that names rank above text strings and text strings above script lines.
+SEARCH_KIND_BONUS = {
+    SEARCH_KIND_MONSTER: 20,
+    SEARCH_KIND_ITEM: 20,
+    SEARCH_KIND_MOVE: 20,
+    SEARCH_KIND_DUNGEON: 20,
+    SEARCH_KIND_STRING: 5,
+    SEARCH_KIND_SCRIPT: 0,
+}
+# Names that are indexed: string type, kind and the request type to open the entry with that ID.
+NAME_SOURCES = [
+    (StringType.POKEMON_NAMES, SEARCH_KIND_MONSTER, REQUEST_TYPE_MONSTER),
+    (StringType.ITEM_NAMES, SEARCH_KIND_ITEM, REQUEST_TYPE_ITEM),
+    (StringType.MOVE_NAMES, SEARCH_KIND_MOVE, REQUEST_TYPE_MOVE),
+    (StringType.DUNGEON_NAMES_MAIN, SEARCH_KIND_DUNGEON, REQUEST_TYPE_DUNGEON),
+]
+MIN_QUERY_LENGTH = 2
+DEFAULT_LIMIT = 200
+# If more than this fraction of the documents in the index were removed or replaced, the index is rebuilt.
+COMPACT_THRESHOLD = 0.25
+PATTERN_WHITESPACE = re.compile(r'\s+')
+PATTERN_TOKEN = re.compile(r'\w+')
+PATTERN_WORD_CHAR = re.compile(r'\w')
+
+SourceKey = Hashable
+SourceProducer = Callable[[], List[Tuple[Hashable, 'SearchDocument']]]
+ExcInfo = Tuple[Type[BaseException], BaseException, TracebackType]
+
+
+class SearchDocument(NamedTuple):
+    kind: str
+    title: str
+    text: str
+    request: OpenRequest
+
+
+class SearchHit(NamedTuple):
+    document: SearchDocument
+    score: float
+
+
+def normalize(text: str) -> str:
+    """Normalizes text for searching: case-insensitive and with all whitespace collapsed to single spaces."""
+    return PATTERN_WHITESPACE.sub(' ', text).strip().casefold()
+
+
+def trigrams(normalized: str) -> Set[str]:
+    return set(normalized[i:i + 3] for i in range(0, len(normalized) - 2))
+
+
+class FullTextIndex:
+    """
+    An inverted index from trigrams and word tokens to documents.
+
+    Documents belong to sources (eg. a language's string file or a script) and are identified by a key within
+    their source. Sources are replaced as a whole with set_source; documents with unchanged text keep their entries.
+    Removed documents are only marked as removed in the posting lists, until enough of them are collected
+    and the index is compacted.
+
+    Queries with three or more characters are looked up by their trigrams, shorter ones by the prefixes of tokens.
+    This class is not thread-safe.
+    """
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._documents: List[Optional[SearchDocument]] = []
+        self._normalized: List[Optional[str]] = []
+        self._trigrams: Dict[str, List[int]] = {}
+        self._tokens: Dict[str, List[int]] = {}
+        self._sorted_tokens: Optional[List[str]] = None
+        self._sources: Dict[SourceKey, Dict[Hashable, int]] = {}
+        self._removed = 0
+
+    def __len__(self):
+        return len(self._documents) - self._removed
+
+    def set_source(self, source: SourceKey, documents: Iterable[Tuple[Hashable, SearchDocument]]):
+        """Replaces all documents of the source with documents (pairs of key and document)."""
+        old = self._sources.pop(source, {})
+        new = {}
+        for key, document in documents:
+            doc_id = old.pop(key, None)
+            if doc_id is not None:
+                if self._documents[doc_id].text == document.text:  # type: ignore
+                    # Unchanged text, the title or request may still have changed.
+                    self._documents[doc_id] = document
+                    new[key] = doc_id
+                    continue
+                self._remove(doc_id)
+            doc_id = self._add(document)
+            if doc_id is not None:
+                new[key] = doc_id
+        for doc_id in old.values():
+            self._remove(doc_id)
+        self._sources[source] = new
+        if self._removed > len(self._documents) * COMPACT_THRESHOLD:
+            self._compact()
+
+    def remove_source(self, source: SourceKey):
+        for doc_id in self._sources.pop(source, {}).values():
+            self._remove(doc_id)
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[SearchHit]:
+        """Returns the best hits for documents that contain query (case-insensitive), best first."""
+        query = normalize(query)
+        if len(query) < MIN_QUERY_LENGTH:
+            return []
+        candidates: Set[int] = set()
+        if len(query) >= 3:
+            postings = []
+            for trigram in trigrams(query):
+                if trigram not in self._trigrams:
+                    return []
+                postings.append(self._trigrams[trigram])
+            postings.sort(key=len)
+            candidates.update(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+                if len(candidates) < 1:
+                    return []
+        else:
+            for token in self._tokens_with_prefix(query):
+                candidates.update(self._tokens[token])
+
+        pattern_word = re.compile(r'(?<!\w)' + re.escape(query) + r'(?!\w)')
+        pattern_prefix = re.compile(r'(?<!\w)' + re.escape(query))
+        hits = []
+        for doc_id in candidates:
+            text = self._normalized[doc_id]
+            if text is None or query not in text:
+                continue
+            document = self._documents[doc_id]
+            assert document is not None
+            hits.append(SearchHit(document, self._score(query, text, document, pattern_word, pattern_prefix)))
+        return heapq.nlargest(limit, hits, key=lambda hit: hit.score)
+
+    def _add(self, document: SearchDocument) -> Optional[int]:
+        normalized = normalize(document.text)
+        if len(normalized) < 1:
+            return None
+        doc_id = len(self._documents)
+        self._documents.append(document)
+        self._normalized.append(normalized)
+        for trigram in trigrams(normalized):
+            if trigram not in self._trigrams:
+                self._trigrams[trigram] = []
+            self._trigrams[trigram].append(doc_id)
+        for token in set(PATTERN_TOKEN.findall(normalized)):
+            if token not in self._tokens:
+                self._tokens[token] = []
+                self._sorted_tokens = None
+            self._tokens[token].append(doc_id)
+        return doc_id
+
+    def _remove(self, doc_id: int):
+        self._documents[doc_id] = None
+        self._normalized[doc_id] = None
+        self._removed += 1
+
+    def _compact(self):
+        logger.debug(f"Compacting the search index ({self._removed} of {len(self._documents)} documents removed).")
+        sources = [
+            (source, [(key, self._documents[doc_id]) for key, doc_id in entries.items()])
+            for source, entries in self._sources.items()
+        ]
+        self._reset()
+        for source, documents in sources:
+            self.set_source(source, documents)  # type: ignore
+
+    def _tokens_with_prefix(self, prefix: str) -> Iterable[str]:
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._tokens.keys())
+        i = bisect_left(self._sorted_tokens, prefix)
+        while i < len(self._sorted_tokens) and self._sorted_tokens[i].startswith(prefix):
+            yield self._sorted_tokens[i]
+            i += 1
+
+    @staticmethod
+    def _score(query: str, text: str, document: SearchDocument, pattern_word, pattern_prefix) -> float:
+        if text == query:
+            score = 100
+        elif text.startswith(query):
+            score = 60
+        elif pattern_word.search(text):
+            score = 40
+        elif pattern_prefix.search(text):
+            score = 30
+        else:
+            score = 10
+        # Shorter texts are closer matches
+        return score + SEARCH_KIND_BONUS[document.kind] - min(len(text), 1000) / 1000
+
+
+class FullTextSearch:
+    """
+    ROM-wide search over all text strings of all languages, the decompiled (ExplorerScript) source of all
+    SSB scripts and the names of Pokémon, items, moves and dungeons. Hits carry an OpenRequest for the editor
+    of the found entry.
+
+    The index is built in a background thread the first time it's needed (see build). Afterwards it's kept up
+    to date through RomProject.mark_as_modified (see file_modified): changed sources are re-indexed in a
+    background thread when the next query is run.
+    """
+    def __init__(self, project: 'RomProject'):
+        self._project = project
+        self._lock = threading.RLock()
+        self._index: Optional[FullTextIndex] = None
+        self._building = False
+        self._updating = False
+        self._progress = 0.0
+        self._dirty: Set[SourceKey] = set()
+        self._on_ready: List[Callable[[], None]] = []
+        self._on_error: List[Callable[[ExcInfo], None]] = []
+
+    def is_ready(self) -> bool:
+        return self._index is not None
+
+    def is_building(self) -> bool:
+        return self._building
+
+    def get_progress(self) -> float:
+        """Returns how much of the index was built (0.0 - 1.0)."""
+        return self._progress
+
+    def build(self, on_ready: Optional[Callable[[], None]] = None,
+              on_error: Optional[Callable[[ExcInfo], None]] = None):
+        """
+        Starts building the index in a background thread, if it isn't built or being built yet.
+        on_ready is called on the main thread as soon as the index can be queried. If building the index fails,
+        on_error is called on the main thread with the exception info instead.
+        """
+        if self._index is not None:
+            if on_ready is not None:
+                on_ready()
+            return
+        if on_ready is not None:
+            self._on_ready.append(on_ready)
+        if on_error is not None:
+            self._on_error.append(on_error)
+        if self._building:
+            return
+        self._building = True
+        self._progress = 0.0
+        # The sources are collected here, on the main thread; the producers only work on copies.
+        sources = [(source, self._create_producer(source)) for source in self._list_sources()]
+        threading.Thread(target=self._run_build, args=(sources,), daemon=True).start()
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT,
+               on_updated: Optional[Callable[[], None]] = None) -> List[SearchHit]:
+        """
+        Returns the best hits for query, best first. Returns no hits if the index isn't built yet.
+        If sources were modified since the last query, they are re-indexed in the background and on_updated
+        is called on the main thread once that's done, so the query can be run again.
+        """
+        with self._lock:
+            if self._index is None:
+                return []
+            self._update_dirty(on_updated)
+            return self._index.search(query, limit)
+
+    def file_modified(self, filename: str):
+        """Marks the sources that are read from this file for re-indexing."""
+        if self._index is None and not self._building:
+            return
+        with self._lock:
+            if filename.startswith(MESSAGE_DIR + '/'):
+                lang_filename = filename[len(MESSAGE_DIR) + 1:]
+                self._dirty.add(('strings', lang_filename))
+                if lang_filename == self._project.get_string_provider().get_language().filename:
+                    self._dirty.add(('names',))
+            elif filename.startswith(SCRIPT_DIR + '/') and filename.endswith(SSB_EXT):
+                self._dirty.add(('script', filename))
+
+    def _list_sources(self) -> List[SourceKey]:
+        sources: List[SourceKey] = [('names',)]
+        for lang in self._project.get_string_provider().get_languages():
+            sources.append(('strings', lang.filename))
+        script_files = self._project.get_module('script').script_catalog.script_files
+        for ssb in script_files['common']:
+            if ssb.endswith(SSB_EXT):
+                sources.append(('script', f'{SCRIPT_DIR}/COMMON/{ssb}'))
+        for map_obj in script_files['maps'].values():
+            path = f"{SCRIPT_DIR}/{map_obj['name']}/"
+            ssbs = list(map_obj['enter_ssbs'])
+            ssbs += [ssb for _ssa, ssb in map_obj['ssas']]
+            for sub_ssbs in map_obj['subscripts'].values():
+                ssbs += sub_ssbs
+            for ssb in ssbs:
+                sources.append(('script', path + ssb))
+        return sources
+
+    def _create_producer(self, source: SourceKey) -> SourceProducer:
+        """Creates the function that returns the documents of the source. Must be called on the main thread."""
+        kind = source[0]  # type: ignore
+        string_provider = self._project.get_string_provider()
+        if kind == 'names':
+            names = [(src, string_provider.get_all(src[0])) for src in NAME_SOURCES]
+            return lambda: self._produce_names(names)
+        if kind == 'strings':
+            for lang in string_provider.get_languages():
+                if lang.filename == source[1]:  # type: ignore
+                    strings = list(string_provider.get_model(lang).strings)
+                    return lambda: self._produce_strings(lang.name_localized, lang.filename, strings)
+            return lambda: []
+        filename = source[1]  # type: ignore
+        if not self._project.file_exists(filename):
+            return lambda: []
+        data = self._project.open_file_manually(filename)
+        static_data = self._project.get_rom_module().get_static_data()
+        return lambda: self._produce_script(filename, data, static_data)
+
+    @staticmethod
+    def _produce_names(names) -> List[Tuple[Hashable, SearchDocument]]:
+        documents = []
+        for (_string_type, kind, request_type), values in names:
+            for i, name in enumerate(values):
+                documents.append(((kind, i), SearchDocument(kind, f'#{i:04}', name, OpenRequest(request_type, i))))
+        return documents
+
+    @staticmethod
+    def _produce_strings(lang_name: str, lang_filename: str, strings: List[str]) -> List[Tuple[Hashable, SearchDocument]]:
+        return [
+            (i, SearchDocument(
+                SEARCH_KIND_STRING, f'{lang_name} #{i + 1}', string, OpenRequest(REQUEST_TYPE_STRING, (lang_filename, i))
+            ))
+            for i, string in enumerate(strings)
+        ]
+
+    @staticmethod
+    def _produce_script(filename: str, data: bytes, static_data) -> List[Tuple[Hashable, SearchDocument]]:
+        try:
+            source, _source_map = FileType.SSB.deserialize(data, static_data).to_explorerscript()
+        except Exception as ex:
+            logger.warning(f"Could not decompile {filename} for the search index.", exc_info=ex)
+            return []
+        title_prefix = filename[len(SCRIPT_DIR) + 1:]
+        request = OpenRequest(REQUEST_TYPE_SCRIPT, filename)
+        documents = []
+        for line_no, line in enumerate(source.splitlines(), start=1):
+            # Lines without any words (braces, blank lines) are not worth indexing.
+            if PATTERN_WORD_CHAR.search(line):
+                documents.append((line_no, SearchDocument(
+                    SEARCH_KIND_SCRIPT, f'{title_prefix}:{line_no}', line.strip(), request
+                )))
+        return documents
+
+    def _run_build(self, sources: List[Tuple[SourceKey, SourceProducer]]):
+        index = FullTextIndex()
+        try:
+            for i, (source, producer) in enumerate(sources):
+                index.set_source(source, producer())
+                self._progress = (i + 1) / len(sources)
+        except BaseException:
+            exc_info = sys.exc_info()
+            GLib.idle_add(lambda: self._fail_build(exc_info))
+            return
+        logger.debug(f"Built the search index ({len(index)} documents).")
+        GLib.idle_add(lambda: self._finish_build(index))
+
+    def _finish_build(self, index: FullTextIndex):
+        with self._lock:
+            self._index = index
+            self._building = False
+        callbacks = self._on_ready
+        self._on_ready = []
+        self._on_error = []
+        for callback in callbacks:
+            callback()
+        return False
+
+    def _fail_build(self, exc_info: ExcInfo):
+        logger.error("Building the search index failed.", exc_info=exc_info)
+        with self._lock:
+            self._building = False
+        callbacks = self._on_error
+        self._on_ready = []
+        self._on_error = []
+        for callback in callbacks:
+            callback(exc_info)
+        return False
+
+    def _update_dirty(self, on_updated: Optional[Callable[[], None]]):
+        if len(self._dirty) < 1 or self._updating:
+            return
+        self._updating = True
+        # Like in build, only the snapshots are taken here. Decompiling the scripts is done in the thread.
+        sources = [(source, self._create_producer(source)) for source in self._dirty]
+        self._dirty = set()
+        threading.Thread(target=self._run_update, args=(sources, on_updated), daemon=True).start()
+
+    def _run_update(self, sources: List[Tuple[SourceKey, SourceProducer]], on_updated: Optional[Callable[[], None]]):
+        try:
+            for source, producer in sources:
+                documents = producer()
+                with self._lock:
+                    self._index.set_source(source, documents)  # type: ignore
+        except BaseException as ex:
+            logger.error("Updating the search index failed.", exc_info=ex)
+        GLib.idle_add(lambda: self._finish_update(on_updated))
+
+    def _finish_update(self, on_updated: Optional[Callable[[], None]]):
+        with self._lock:
+            self._updating = False
+        if on_updated is not None:
+            on_updated()
+        return False
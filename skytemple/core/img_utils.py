@@ -16,15 +16,113 @@
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
 
+from typing import Sequence, Iterable
+
 import cairo
+from PIL import Image
+from gi.repository import Gdk, GdkPixbuf
 
 
-def pil_to_cairo_surface(im, format=cairo.FORMAT_ARGB32) -> cairo.ImageSurface:
+def pil_to_cairo_surface(im: Image.Image, format=cairo.FORMAT_ARGB32) -> cairo.ImageSurface:
     """
+    Converts a Pillow image into a new cairo surface. The pixel data is packed by Pillow directly into the buffer
+    of the surface, honoring cairo's stride.
+
     :param im: Pillow Image
     :param format: Pixel format for output surface
     """
     assert format in (cairo.FORMAT_RGB24, cairo.FORMAT_ARGB32), "Unsupported pixel format: %s" % format
-    arr = memoryview(bytearray(im.tobytes('raw', 'BGRa')))
-    surface = cairo.ImageSurface.create_for_data(arr, format, im.width, im.height)
+    if im.mode != 'RGBA':
+        im = im.convert('RGBA')
+    surface = cairo.ImageSurface(format, im.width, im.height)
+    _write_surface_data(surface, im.tobytes('raw', 'BGRa'), im.width * 4)
     return surface
+
+
+def pil_indexed_to_cairo_surface(im: Image.Image, palette: Sequence[int],
+                                 transparent_indices: Iterable[int] = ()) -> cairo.ImageSurface:
+    """
+    Converts an indexed (mode 'P' or 'L') Pillow image into a new ARGB32 cairo surface,
+    using the given flat RGB palette (up to 256 colors) instead of the palette of the image.
+    The indices in transparent_indices are rendered fully transparent.
+
+    The palette is applied through lookup tables per channel, so no per-pixel work is done in Python.
+    """
+    return pil_indexed_to_cairo_surface_with_luts(im, palette_to_bgra_luts(palette, transparent_indices))
+
+
+def pil_indexed_to_cairo_surface_with_luts(im: Image.Image, luts) -> cairo.ImageSurface:
+    """
+    Converts an indexed (mode 'P' or 'L') Pillow image into a new ARGB32 cairo surface,
+    using the (B, G, R, A) lookup tables returned by palette_to_bgra_luts.
+    """
+    return indexed_bytes_to_cairo_surface(im.tobytes('raw', 'P' if im.mode == 'P' else 'L'), im.width, im.height, luts)
+
+
+def palette_to_bgra_luts(palette: Sequence[int], transparent_indices: Iterable[int] = ()):
+    """
+    Builds four 256 byte lookup tables (B, G, R, A) for the given flat RGB palette, that map a color index to
+    the premultiplied channel value in a cairo ARGB32 surface. Usable with bytes.translate.
+    """
+    b_lut = bytearray(256)
+    g_lut = bytearray(256)
+    r_lut = bytearray(256)
+    a_lut = bytearray(b'\xff' * 256)
+    for i in range(0, min(256, len(palette) // 3)):
+        r_lut[i] = palette[i * 3]
+        g_lut[i] = palette[i * 3 + 1]
+        b_lut[i] = palette[i * 3 + 2]
+    for i in transparent_indices:
+        # Premultiplied alpha: Fully transparent pixels are all zero.
+        b_lut[i] = g_lut[i] = r_lut[i] = a_lut[i] = 0
+    return bytes(b_lut), bytes(g_lut), bytes(r_lut), bytes(a_lut)
+
+
+def indexed_bytes_to_cairo_surface(data: bytes, width: int, height: int, luts) -> cairo.ImageSurface:
+    """
+    Converts 8-bit indexed pixel data (one byte per pixel, no padding) into a new ARGB32 cairo surface,
+    using the (B, G, R, A) lookup tables returned by palette_to_bgra_luts.
+    """
+    planes = [Image.frombytes('L', (width, height), data.translate(lut)) for lut in luts]
+    # The channels are in cairo's (little endian) memory order, Pillow just interleaves them.
+    interleaved = Image.merge('RGBA', planes).tobytes()
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+    _write_surface_data(surface, interleaved, width * 4)
+    return surface
+
+
+def cairo_surface_to_pil(surface: cairo.ImageSurface) -> Image.Image:
+    """Converts an ARGB32 cairo surface into a new RGBA Pillow image (un-premultiplying the alpha channel)."""
+    surface.flush()
+    return Image.frombytes(
+        'RGBA', (surface.get_width(), surface.get_height()), bytes(surface.get_data()),
+        'raw', 'BGRa', surface.get_stride()
+    )
+
+
+def cairo_surface_to_pixbuf(surface: cairo.ImageSurface) -> GdkPixbuf.Pixbuf:
+    """Converts a cairo image surface into a new GdkPixbuf. The conversion is done natively by GDK."""
+    surface.flush()
+    return Gdk.pixbuf_get_from_surface(surface, 0, 0, surface.get_width(), surface.get_height())
+
+
+def pixbuf_to_cairo_surface(pixbuf: GdkPixbuf.Pixbuf) -> cairo.ImageSurface:
+    """Converts a GdkPixbuf into a new ARGB32 cairo surface. The conversion is done natively by GDK."""
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, pixbuf.get_width(), pixbuf.get_height())
+    ctx = cairo.Context(surface)
+    Gdk.cairo_set_source_pixbuf(ctx, pixbuf, 0, 0)
+    ctx.paint()
+    return surface
+
+
+def _write_surface_data(surface: cairo.ImageSurface, data: bytes, row_length: int):
+    """Copies tightly packed rows of pixel data into the surface buffer, padding rows to the surface stride."""
+    surface.flush()
+    stride = surface.get_stride()
+    buffer = surface.get_data()
+    if stride == row_length:
+        buffer[:len(data)] = data
+    else:
+        for y in range(0, surface.get_height()):
+            buffer[y * stride:y * stride + row_length] = data[y * row_length:(y + 1) * row_length]
+    surface.mark_dirty()
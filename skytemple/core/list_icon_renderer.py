@@ -14,70 +14,217 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import weakref
 from functools import partial
-from itertools import zip_longest
-from typing import Dict
+from typing import Dict, Tuple, Optional, Any, List, Callable, Set
 
 import cairo
-from gi.repository import GdkPixbuf, GLib
+from gi.repository import GdkPixbuf, GLib, Gtk
 
-from skytemple.core.ui_utils import get_list_store_iter_by_idx
+from skytemple.core.img_utils import cairo_surface_to_pixbuf
 
 ORANGE = 'orange'
 ORANGE_RGB = (1, 0.65, 0)
+# (store, load_fn, target_name, parameters, is_placeholder)
+Registration = Tuple[Gtk.ListStore, Callable, Any, Tuple[Any, ...], bool]
+
+
+class _Icon:
+    """A pixbuf rendered from a sprite surface."""
+    __slots__ = ('sprite', 'pixbuf', '__weakref__')
+
+    def __init__(self, sprite: cairo.ImageSurface, pixbuf: GdkPixbuf.Pixbuf):
+        self.sprite = sprite
+        self.pixbuf = pixbuf
 
 
 class ListIconRenderer:
+    """
+    Renders sprites into an icon column of list stores.
+    Each registered row is tracked with a row reference, so icons that finish loading later still end up in the
+    right row after rows were moved, inserted or removed. Pixbufs are shared between all rows showing the same
+    sprite and rows are only updated if their sprite changed. Icons are only kept for as long as a row shows them,
+    so sprites that aren't shown anymore can be evicted from the sprite cache.
+    """
     def __init__(self, column_id, can_be_placeholder=False):
-        self._icon_pixbufs: Dict[any, GdkPixbuf.Pixbuf] = {}
+        # (id of sprite surface, is_placeholder) -> icon, as long as any row shows it.
+        self._icons: 'weakref.WeakValueDictionary[Tuple[int, bool], _Icon]' = weakref.WeakValueDictionary()
         self._refresh_timer = None
         self.column_id = column_id
         self.can_be_placeholder = can_be_placeholder
-        self._registered_for_reload = []
+        # The registrations are identified by a stable ID, independent of the position of their rows.
+        self._registered_for_reload: Dict[int, Registration] = {}
+        self._row_refs: Dict[int, Gtk.TreeRowReference] = {}
+        # Per store: row index -> registration ID. Only valid for stores not in _stale_stores, stores become stale
+        # when rows are removed, reordered or inserted anywhere but at the end.
+        self._row_ids: Dict[Gtk.ListStore, Dict[int, int]] = {}
+        self._stale_stores: Set[Gtk.ListStore] = set()
+        self._store_handlers: Dict[Gtk.ListStore, List[int]] = {}
+        # (store, row index) of rows that are about to be added to the store, until the row references are created.
+        self._pending_rows: Dict[int, Tuple[Gtk.ListStore, int]] = {}
+        self._bind_pending_scheduled = False
+        self._next_registration_id = 0
+        # The icon each row is currently showing.
+        self._row_icons: Dict[int, _Icon] = {}
         self._loading = True
 
     def load_icon(self, store, load_fn, target_name, idx, parameters, is_placeholder=False):
-        self._registered_for_reload.append((store, idx, (store, load_fn, target_name, idx, parameters, is_placeholder)))
-        return self._get_icon(store, load_fn, target_name, idx, parameters, is_placeholder)
+        """
+        Returns the icon for the row at index idx of the store and updates that row once the sprite is loaded.
+        If idx is the index of a row that will be added after this call (usually len(store)), the row is looked up
+        once it exists.
+        """
+        registration_id = self._next_registration_id
+        self._next_registration_id += 1
+        self._registered_for_reload[registration_id] = (store, load_fn, target_name, parameters, is_placeholder)
+        if idx < len(store):
+            # The row already exists (eg. it is edited), it replaces the previous registration for that row.
+            self._bind_row(registration_id, store, idx)
+        else:
+            self._pending_rows[registration_id] = (store, idx)
+            if not self._bind_pending_scheduled:
+                self._bind_pending_scheduled = True
+                GLib.idle_add(self._bind_pending_rows)
+        return self._get_icon(registration_id)[0]
 
     def unload(self):
-        self._icon_pixbufs = None
+        if self._store_handlers is not None:
+            for store, handler_ids in self._store_handlers.items():
+                for handler_id in handler_ids:
+                    store.disconnect(handler_id)
+        self._icons = None
         self._refresh_timer = None
         self.column_id = None
         self.can_be_placeholder = None
         self._registered_for_reload = None
+        self._row_refs = None
+        self._row_ids = None
+        self._stale_stores = None
+        self._store_handlers = None
+        self._pending_rows = None
+        self._row_icons = None
         self._loading = True
 
-    def _get_icon(self, store, load_fn, target_name, idx, parameters, is_placeholder=False):
+    def _get_icon(self, registration_id: int, is_placeholder: Optional[bool] = None) -> Tuple[GdkPixbuf.Pixbuf, bool]:
+        """Returns the pixbuf for the row and whether or not the sprite changed since it was last requested."""
+        _, load_fn, _, parameters, registered_is_placeholder = self._registered_for_reload[registration_id]
+        if is_placeholder is None:
+            is_placeholder = registered_is_placeholder
         was_loading = self._loading
         sprite, x, y, w, h = load_fn(*parameters,
                                      lambda: GLib.idle_add(
-                                         partial(self._reload_icon, parameters, idx, store, load_fn, target_name, was_loading)
+                                         partial(self._reload_icon, registration_id, was_loading)
                                      ))
+        key = (id(sprite), is_placeholder)
+        icon = self._icons.get(key)
+        if icon is None or icon.sprite is not sprite:
+            icon = _Icon(sprite, cairo_surface_to_pixbuf(
+                self._tint_placeholder(sprite, w, h) if is_placeholder else sprite
+            ))
+            self._icons[key] = icon
+        changed = self._row_icons.get(registration_id) is not icon
+        self._row_icons[registration_id] = icon
+        return icon.pixbuf, changed
+
+    @staticmethod
+    def _tint_placeholder(sprite: cairo.ImageSurface, w, h) -> cairo.ImageSurface:
+        # Draw on a copy, the sprite itself is shared with all other users of the sprite provider.
+        tinted = cairo.ImageSurface(cairo.FORMAT_ARGB32, w, h)
+        ctx = cairo.Context(tinted)
+        ctx.set_source_surface(sprite)
+        ctx.paint()
+        ctx.set_source_rgb(*ORANGE_RGB)
+        ctx.rectangle(0, 0, w, h)
+        ctx.set_operator(cairo.OPERATOR_IN)
+        ctx.fill()
+        return tinted
+
+    def _bind_row(self, registration_id: int, store: Gtk.ListStore, idx: int):
+        row_ids = self._get_row_ids(store)
+        if idx in row_ids:
+            self._forget(row_ids[idx])
+        row_ids[idx] = registration_id
+        self._row_refs[registration_id] = Gtk.TreeRowReference.new(store, Gtk.TreePath.new_from_indices([idx]))
+
+    def _get_row_ids(self, store: Gtk.ListStore) -> Dict[int, int]:
+        """Returns the registration IDs by row index for the store, re-indexing them if rows were moved."""
+        if store not in self._store_handlers:
+            self._store_handlers[store] = [
+                store.connect('row-inserted', self._on_store_row_inserted),
+                store.connect('row-deleted', self._on_store_rows_changed),
+                store.connect('rows-reordered', self._on_store_rows_changed),
+            ]
+            self._row_ids[store] = {}
+        if store in self._stale_stores:
+            self._stale_stores.discard(store)
+            row_ids = {}
+            for registration_id, ref in list(self._row_refs.items()):
+                if self._registered_for_reload[registration_id][0] is not store:
+                    continue
+                if ref.valid():
+                    row_ids[ref.get_path().get_indices()[0]] = registration_id
+                else:
+                    # The row was removed.
+                    self._forget(registration_id)
+            self._row_ids[store] = row_ids
+        return self._row_ids[store]
+
+    def _on_store_row_inserted(self, store: Gtk.ListStore, path: Gtk.TreePath, *args):
+        # Appending rows doesn't move any of the other rows.
+        if path.get_indices()[0] < len(store) - 1:
+            self._stale_stores.add(store)
 
-        if is_placeholder:
-            ctx = cairo.Context(sprite)
-            ctx.set_source_rgb(*ORANGE_RGB)
-            ctx.rectangle(0, 0, w, h)
-            ctx.set_operator(cairo.OPERATOR_IN)
-            ctx.fill()
-
-        data = bytes(sprite.get_data())
-        # this is painful.
-        new_data = bytearray()
-        for b, g, r, a in grouper(data, 4):
-            new_data += bytes([r, g, b, a])
-        self._icon_pixbufs[target_name] = GdkPixbuf.Pixbuf.new_from_data(
-            new_data, GdkPixbuf.Colorspace.RGB, True, 8, w, h, sprite.get_stride()
-        )
-        return self._icon_pixbufs[target_name]
-
-    def _reload_icon(self, parameters, idx, store, load_fn, target_name, was_loading):
-        if store == None:
+    def _on_store_rows_changed(self, store: Gtk.ListStore, *args):
+        self._stale_stores.add(store)
+
+    def _bind_pending_rows(self):
+        self._bind_pending_scheduled = False
+        if self._pending_rows is None:
+            return False  # The view was unloaded in the meantime.
+        for registration_id, (store, idx) in list(self._pending_rows.items()):
+            del self._pending_rows[registration_id]
+            if idx < len(store):
+                self._bind_row(registration_id, store, idx)
+            else:
+                self._forget(registration_id)
+        return False
+
+    def _forget(self, registration_id: int):
+        registration = self._registered_for_reload.pop(registration_id, None)
+        ref = self._row_refs.pop(registration_id, None)
+        if registration is not None and ref is not None and ref.valid():
+            store = registration[0]
+            if store not in self._stale_stores:
+                idx = ref.get_path().get_indices()[0]
+                if self._row_ids[store].get(idx) == registration_id:
+                    del self._row_ids[store][idx]
+        self._pending_rows.pop(registration_id, None)
+        self._row_icons.pop(registration_id, None)
+
+    def _get_row_iter(self, registration_id: int) -> Optional[Gtk.TreeIter]:
+        if registration_id in self._pending_rows:
+            self._bind_pending_rows()
+        ref = self._row_refs.get(registration_id)
+        if ref is None or not ref.valid():
+            # The row was removed.
+            self._forget(registration_id)
+            return None
+        return ref.get_model().get_iter(ref.get_path())
+
+    def _reload_icon(self, registration_id, was_loading):
+        if self._registered_for_reload is None or registration_id not in self._registered_for_reload:
             return
         if not self._loading and not was_loading:
-            row = store[get_list_store_iter_by_idx(store, idx)]
-            row[self.column_id] = self._get_icon(store, load_fn, target_name, idx, parameters, row[8] == ORANGE if self.can_be_placeholder else False)
+            row_iter = self._get_row_iter(registration_id)
+            if row_iter is None:
+                return
+            store = self._registered_for_reload[registration_id][0]
+            row = store[row_iter]
+            pixbuf, changed = self._get_icon(
+                registration_id, row[8] == ORANGE if self.can_be_placeholder else False
+            )
+            if changed:
+                row[self.column_id] = pixbuf
             return
         if self._refresh_timer is not None:
             GLib.source_remove(self._refresh_timer)
@@ -85,14 +232,18 @@ class ListIconRenderer:
 
     def _reload_icons_in_tree(self):
         try:
-            for model, idx, params in self._registered_for_reload:
-                model[get_list_store_iter_by_idx(model, idx)][self.column_id] = self._get_icon(*params)
+            updates: List[Tuple[Gtk.ListStore, Gtk.TreeIter, GdkPixbuf.Pixbuf]] = []
+            for registration_id in list(self._registered_for_reload.keys()):
+                # Also drops the registrations of removed rows.
+                row_iter = self._get_row_iter(registration_id)
+                if row_iter is None:
+                    continue
+                pixbuf, changed = self._get_icon(registration_id)
+                if changed:
+                    updates.append((self._registered_for_reload[registration_id][0], row_iter, pixbuf))
+            for store, row_iter, pixbuf in updates:
+                store.set_value(row_iter, self.column_id, pixbuf)
             self._loading = False
             self._refresh_timer = None
         except (AttributeError, TypeError):
             pass  # This happens when the view was unloaded in the meantime.
-
-
-def grouper(iterable, n, fillvalue=None):
-    args = [iter(iterable)] * n
-    return ((bytes(bytearray(x))) for x in zip_longest(fillvalue=fillvalue, *args))
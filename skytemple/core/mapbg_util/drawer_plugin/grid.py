@@ -19,6 +19,7 @@ import math
 import cairo
 
 from skytemple.core.mapbg_util.drawer_plugin.abstract import AbstractDrawerPlugin
+from skytemple.core.mapbg_util.visible_area import get_visible_cells
 
 
 class GridDrawerPlugin(AbstractDrawerPlugin):
@@ -31,24 +32,19 @@ class GridDrawerPlugin(AbstractDrawerPlugin):
         self.offset_x = offset_x
 
     def draw(self, ctx: cairo.Context, size_w: int, size_h: int, mouse_x: int, mouse_y: int):
-        ctx.translate(self.offset_x, self.offset_y)
         ctx.set_line_width(1)
         ctx.set_source_rgba(*self.color)
         width_in_lines = int(size_w / self.dist_x) - int(math.floor(self.offset_x / self.dist_x))
         height_in_lines = int(size_h / self.dist_y) - int(math.floor(self.offset_y / self.dist_y))
-        for i in range(0, width_in_lines * height_in_lines):
-            ctx.rectangle(
-                0, 0,
-                self.dist_x,
-                self.dist_y
-            )
-            ctx.stroke()
-            if (i + 1) % width_in_lines == 0:
-                # Move to beginning of next line
-                ctx.translate(-self.dist_x * (width_in_lines - 1), self.dist_y)
-            else:
-                # Move to next tile in line
-                ctx.translate(self.dist_x, 0)
-        # Move back to beginning
-        ctx.translate(0, -self.dist_y * height_in_lines)
-        ctx.translate(-self.offset_x, -self.offset_y)
+        # Only the cells inside the clip region are drawn
+        visible_x, visible_y = get_visible_cells(
+            ctx, self.dist_x, self.dist_y, width_in_lines, height_in_lines, self.offset_x, self.offset_y
+        )
+        for y in visible_y:
+            for x in visible_x:
+                ctx.rectangle(
+                    self.offset_x + x * self.dist_x, self.offset_y + y * self.dist_y,
+                    self.dist_x,
+                    self.dist_y
+                )
+                ctx.stroke()
@@ -0,0 +1,40 @@
+#  Copyright 2020-2021 Capypara and the SkyTemple Contributors
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+
+import math
+from typing import Tuple
+
+import cairo
+
+
+def get_visible_cells(
+        ctx: cairo.Context, cell_width: int, cell_height: int, width_in_cells: int, height_in_cells: int,
+        offset_x: float = 0, offset_y: float = 0
+) -> Tuple[range, range]:
+    """
+    Returns the ranges of columns and rows of a grid of cells (chunks, tiles, ...) that are inside the
+    current clip region of the context. The clip extents are returned by cairo in user space, so
+    any scaling (zoom) and translation that was already applied to the context is taken into account.
+    The grid starts at (offset_x, offset_y) in user space.
+    """
+    x1, y1, x2, y2 = ctx.clip_extents()
+    return (
+        range(max(0, math.floor((x1 - offset_x) / cell_width)),
+              max(0, min(width_in_cells, math.ceil((x2 - offset_x) / cell_width)))),
+        range(max(0, math.floor((y1 - offset_y) / cell_height)),
+              max(0, min(height_in_cells, math.ceil((y2 - offset_y) / cell_height))))
+    )
@@ -0,0 +1,177 @@
+"""Shared, cached list stores with the names of items, moves and Pokémon, for completions and combo boxes."""
+#  Copyright 2020-2021 Capypara and the SkyTemple Contributors
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+from typing import TYPE_CHECKING, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from gi.repository import Gtk, GLib
+
+from skytemple.core.string_provider import StringType, MESSAGE_DIR
+
+if TYPE_CHECKING:
+    from skytemple.core.rom_project import RomProject
+
+logger = logging.getLogger(__name__)
+
+MONSTER_MD_FILE = 'BALANCE/monster.md'
+
+# Item IDs, format fields: name, id
+NAME_KIND_ITEM = 'item'
+# Move IDs, format fields: name, id
+NAME_KIND_MOVE = 'move'
+# Entry indices in monster.md (without the dummy entry 0 by default), format fields: name, id, gender
+NAME_KIND_MONSTER = 'monster'
+# Like NAME_KIND_MONSTER, but named by md_index_base even if ExpandPokeList is applied (as in the floor editor)
+NAME_KIND_MONSTER_BASE_NAMED = 'monster_base_named'
+# Base IDs of Pokémon (entid if ExpandPokeList is applied, md_index_base otherwise), format fields: name, id
+NAME_KIND_MONSTER_BASE = 'monster_base'
+
+COL_NAME = 0
+COL_ID = 1
+
+
+class NameStore:
+    """
+    A Gtk.ListStore with one row (label, id) per ID and a dict of the same labels by ID.
+    The store and the dict are updated in place when names change, so views can keep references to both.
+    """
+    def __init__(self):
+        self.store = Gtk.ListStore(str, int)
+        self.names: Dict[int, str] = {}
+        self.stale = True
+        self._ids: List[int] = []
+        self._iters: Dict[int, Gtk.TreeIter] = {}
+
+    def update(self, labels: List[Tuple[int, str]]):
+        """Sets the labels. If the IDs didn't change, only the rows with changed labels are updated."""
+        ids = [idx for idx, _ in labels]
+        if ids != self._ids:
+            self.store.clear()
+            self.names.clear()
+            self._iters.clear()
+            for idx, label in labels:
+                self.names[idx] = label
+                self._iters[idx] = self.store.append([label, idx])
+            self._ids = ids
+        else:
+            for idx, label in labels:
+                if self.names[idx] != label:
+                    self.names[idx] = label
+                    self.store.set_value(self._iters[idx], COL_NAME, label)
+        self.stale = False
+
+
+class NameStores:
+    """
+    Builds the name stores of the project once per language, kind of name, label format and list of IDs
+    and shares them between all views that request them. Stores are refreshed when the string files of their
+    language or the monster.md are marked as modified.
+    """
+    def __init__(self, project: 'RomProject'):
+        self.project = project
+        self._stores: Dict[Hashable, NameStore] = {}
+        self._refresh_scheduled = False
+
+    def get(self, kind: str, name_format: str, ids: Optional[Iterable[int]] = None) -> NameStore:
+        """
+        Returns the shared store for the names of the given kind (see the NAME_KIND_* constants) in the
+        current language. name_format is a str.format template, see the constants for the available fields.
+        If ids is not given, all IDs of that kind are included.
+        """
+        if ids is not None:
+            ids = tuple(dict.fromkeys(ids))
+        key = (self._language_filename(), kind, name_format, ids)
+        if key not in self._stores:
+            self._stores[key] = NameStore()
+        name_store = self._stores[key]
+        if name_store.stale:
+            self._refresh(key, name_store)
+        return name_store
+
+    def file_modified(self, filename: str):
+        """Marks the affected stores as stale and refreshes them. Called by RomProject.mark_as_modified."""
+        if filename.startswith(MESSAGE_DIR + '/'):
+            lang_filename = filename[len(MESSAGE_DIR) + 1:]
+            self._mark_stale(lambda key: key[0] == lang_filename)
+        elif filename == MONSTER_MD_FILE:
+            self._mark_stale(
+                lambda key: key[1] in (NAME_KIND_MONSTER, NAME_KIND_MONSTER_BASE_NAMED, NAME_KIND_MONSTER_BASE)
+            )
+
+    def _mark_stale(self, predicate):
+        changed = False
+        for key, name_store in self._stores.items():
+            if predicate(key):
+                name_store.stale = True
+                changed = True
+        if changed and not self._refresh_scheduled:
+            # Names are usually changed on every keystroke, so this is coalesced into one refresh.
+            self._refresh_scheduled = True
+            GLib.idle_add(self._refresh_stale)
+
+    def _refresh_stale(self):
+        self._refresh_scheduled = False
+        for key, name_store in list(self._stores.items()):
+            if name_store.stale:
+                self._refresh(key, name_store)
+        return False
+
+    def _refresh(self, key: Hashable, name_store: NameStore):
+        _, kind, name_format, ids = key  # type: ignore
+        try:
+            name_store.update(self._build_labels(kind, name_format, ids))
+        except Exception as ex:
+            logger.error(f"Failed to build the name store for {kind}.", exc_info=ex)
+            name_store.stale = False
+
+    def _build_labels(self, kind: str, name_format: str, ids: Optional[Tuple[int, ...]]) -> List[Tuple[int, str]]:
+        string_provider = self.project.get_string_provider()
+        if kind == NAME_KIND_ITEM or kind == NAME_KIND_MOVE:
+            string_type = StringType.ITEM_NAMES if kind == NAME_KIND_ITEM else StringType.MOVE_NAMES
+            if ids is None:
+                ids = tuple(range(0, len(string_provider.get_all_view(string_type))))
+            return [
+                (idx, name_format.format(name=string_provider.get_value(string_type, idx), id=idx))
+                for idx in ids
+            ]
+        monster_md = self.project.get_module('monster').monster_md
+        expand_poke_list = self.project.is_patch_applied('ExpandPokeList')
+        if kind == NAME_KIND_MONSTER or kind == NAME_KIND_MONSTER_BASE_NAMED:
+            if ids is None:
+                ids = tuple(range(1, len(monster_md.entries)))
+            labels = []
+            for idx in ids:
+                entry = monster_md.entries[idx]
+                sidx = entry.md_index if expand_poke_list and kind == NAME_KIND_MONSTER else entry.md_index_base
+                name = string_provider.get_value(StringType.POKEMON_NAMES, sidx)
+                labels.append((idx, name_format.format(name=name, id=idx, gender=entry.gender.print_name)))
+            return labels
+        if kind == NAME_KIND_MONSTER_BASE:
+            base_names: Dict[int, str] = {}
+            for entry in monster_md.entries:
+                midx = entry.entid if expand_poke_list else entry.md_index_base
+                if midx not in base_names:
+                    base_names[midx] = string_provider.get_value(StringType.POKEMON_NAMES, entry.md_index_base)
+            if ids is None:
+                ids = tuple(base_names.keys())
+            return [
+                (idx, name_format.format(name=base_names[idx], id=idx)) for idx in ids if idx in base_names
+            ]
+        raise ValueError(f"Unknown kind of names: {kind}")
+
+    def _language_filename(self) -> str:
+        return self.project.get_string_provider().get_language().filename
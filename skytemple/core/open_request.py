@@ -27,6 +27,12 @@ REQUEST_TYPE_DUNGEON_TILESET = 'dungeon_tileset'  # identifier is the tileset id
 REQUEST_TYPE_DUNGEON_FIXED_FLOOR = 'dungeon_fixed_floor'  # identifier is the fixed floor id
 REQUEST_TYPE_DUNGEON_FIXED_FLOOR_ENTITY = 'dungeon_fixed_floor_entity'  # identifier is the entity id to highlight
 REQUEST_TYPE_DUNGEON_MUSIC = "dungeon_music"  # no identifier
+REQUEST_TYPE_DUNGEON = 'dungeon'  # identifier is the dungeon id
+REQUEST_TYPE_MONSTER = 'monster'  # identifier is the entity id (index in the Pokémon names)
+REQUEST_TYPE_ITEM    = 'item'     # identifier is the item id
+REQUEST_TYPE_MOVE    = 'move'     # identifier is the move id
+REQUEST_TYPE_STRING  = 'string'   # identifier is (language file name, string index)
+REQUEST_TYPE_SCRIPT  = 'script'   # identifier is the path of the SSB file. Opens it in the debugger.
 
 
 class OpenRequest:
@@ -29,6 +29,9 @@ from skytemple.core.open_request import OpenRequest
 from skytemple.core.model_context import ModelContext
 from skytemple.core.sprite_provider import SpriteProvider
 from skytemple.core.string_provider import StringProvider, StringType
+from skytemple.core.full_text_search import FullTextSearch
+from skytemple.core.name_stores import NameStores
+from skytemple.core.xref_index import CrossReferenceIndex
 from skytemple_files.data.md.model import MdProperties
 from skytemple_files.common.ppmdu_config.pmdsky_debug.data import Pmd2Binary
 from skytemple_files.common.project_file_manager import ProjectFileManager
@@ -119,6 +122,9 @@ class RomProject:
         self._loaded_modules: Dict[str, AbstractModule] = {}
         self._sprite_renderer: Optional[SpriteProvider] = None
         self._string_provider: Optional[StringProvider] = None
+        self._xref_index = CrossReferenceIndex(self)
+        self._full_text_search = FullTextSearch(self)
+        self._name_stores = NameStores(self)
         # Dict of filenames -> models
         self._opened_files: Dict[str, Any] = {}
         self._opened_files_contexts: Dict[str, ModelContext] = {}
@@ -313,6 +319,7 @@ class RomProject:
         """Mark a file as modified, either by filename or model. TODO: Input checking"""
         if isinstance(file, str):
             assert file in self._opened_files
+            filename = file
             if file not in self._modified_files:
                 self._modified_files.append(file)
         else:
@@ -320,6 +327,11 @@ class RomProject:
             self._modified_files.append(filename)
             if file not in self._modified_files:
                 self._modified_files.append(file)  # type: ignore
+        if self._string_provider is not None:
+            self._string_provider.file_modified(filename)
+        self._xref_index.file_modified(filename)
+        self._full_text_search.file_modified(filename)
+        self._name_stores.file_modified(filename)
 
     def force_mark_as_modified(self):
         self._forced_modified = True
@@ -443,6 +455,18 @@ class RomProject:
     def get_string_provider(self) -> StringProvider:
         return self._string_provider  # type: ignore
 
+    def get_xref_index(self) -> CrossReferenceIndex:
+        """Returns the index of references between levels, map backgrounds, scenes and scripts."""
+        return self._xref_index
+
+    def get_full_text_search(self) -> FullTextSearch:
+        """Returns the ROM-wide search over strings, scripts and names."""
+        return self._full_text_search
+
+    def get_name_stores(self) -> NameStores:
+        """Returns the shared list stores with the names of items, moves and Pokémon."""
+        return self._name_stores
+
     def create_patcher(self):
         if self._patcher==None:
             self._patcher = Patcher(self._rom, self.get_rom_module().get_static_data())
@@ -42,6 +42,7 @@ KEY_GTK_THEME = 'gtk_theme'
 KEY_LOCALE = 'locale'
 KEY_USE_NATIVE_FILE_HANDLERS = 'use_native_file_handlers'
 KEY_ASYNC_CONFIGURATION = 'async_configuration'
+KEY_SURFACE_CACHE_BUDGET = 'surface_cache_budget_mb'
 
 KEY_WINDOW_SIZE_X = 'width'
 KEY_WINDOW_SIZE_Y = 'height'
@@ -208,6 +209,22 @@ class SkyTempleSettingsStore:
         self.loaded_config[SECT_GENERAL][KEY_ASYNC_CONFIGURATION] = value.value
         self._save()
 
+    def get_surface_cache_budget(self, default: int) -> int:
+        """Memory budget in MB for each of the sprite and portrait caches."""
+        if SECT_GENERAL in self.loaded_config:
+            if KEY_SURFACE_CACHE_BUDGET in self.loaded_config[SECT_GENERAL]:
+                try:
+                    return int(self.loaded_config[SECT_GENERAL][KEY_SURFACE_CACHE_BUDGET])
+                except ValueError:
+                    pass
+        return default
+
+    def set_surface_cache_budget(self, value: int):
+        if SECT_GENERAL not in self.loaded_config:
+            self.loaded_config[SECT_GENERAL] = {}
+        self.loaded_config[SECT_GENERAL][KEY_SURFACE_CACHE_BUDGET] = str(value)
+        self._save()
+
     def _save(self):
         with open_utf8(self.config_file, 'w') as f:
             self.loaded_config.write(f)
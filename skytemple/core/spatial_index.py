@@ -0,0 +1,88 @@
+"""Uniform grid over bounding boxes, for hit-testing many rectangles at a point."""
+#  Copyright 2020-2021 Capypara and the SkyTemple Contributors
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+from typing import TypeVar, Generic, Dict, Tuple, List, Any, Set
+
+T = TypeVar('T')
+BoundingBox = Tuple[int, int, int, int]
+
+
+class SpatialIndex(Generic[T]):
+    """
+    Stores items with their bounding boxes (x, y, w, h) in the cells of a uniform grid they overlap,
+    so that the items at a point can be found without checking all bounding boxes.
+
+    Every item also has a priority (anything comparable); point queries return the items
+    with the highest priority first. Items are identified by identity, not equality.
+    """
+    def __init__(self, cell_size: int):
+        self._cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], Set[int]] = {}
+        self._items: Dict[int, Tuple[T, BoundingBox, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, item: T) -> bool:
+        return id(item) in self._items
+
+    def get_priority(self, item: T) -> Any:
+        return self._items[id(item)][2]
+
+    def insert(self, item: T, bb: BoundingBox, priority: Any):
+        """Inserts the item or updates its bounding box and priority, if it was already inserted."""
+        if id(item) in self._items:
+            self.remove(item)
+        self._items[id(item)] = (item, bb, priority)
+        for cell in self._cells_for(bb):
+            if cell not in self._cells:
+                self._cells[cell] = set()
+            self._cells[cell].add(id(item))
+
+    def remove(self, item: T):
+        if id(item) not in self._items:
+            return
+        _, bb, _ = self._items.pop(id(item))
+        for cell in self._cells_for(bb):
+            self._cells[cell].discard(id(item))
+            if len(self._cells[cell]) < 1:
+                del self._cells[cell]
+
+    def clear(self):
+        self._cells.clear()
+        self._items.clear()
+
+    def query(self, x: int, y: int) -> List[T]:
+        """Returns all items whose bounding box contains the point, highest priority first."""
+        cell = (int(x // self._cell_size), int(y // self._cell_size))
+        if cell not in self._cells:
+            return []
+        hits = []
+        for key in self._cells[cell]:
+            item, (bb_x, bb_y, bb_w, bb_h), priority = self._items[key]
+            if bb_x <= x < bb_x + bb_w and bb_y <= y < bb_y + bb_h:
+                hits.append((priority, item))
+        hits.sort(key=lambda hit: hit[0], reverse=True)
+        return [item for _, item in hits]
+
+    def _cells_for(self, bb: BoundingBox):
+        x, y, w, h = bb
+        if w <= 0 or h <= 0:
+            return
+        for cell_y in range(int(y // self._cell_size), int((y + h - 1) // self._cell_size) + 1):
+            for cell_x in range(int(x // self._cell_size), int((x + w - 1) // self._cell_size) + 1):
+                yield cell_x, cell_y
@@ -15,11 +15,12 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import asyncio
 import json
 import logging
 import os
 import threading
-from typing import TYPE_CHECKING, Tuple, Dict, List, Union, Optional
+from typing import TYPE_CHECKING, Tuple, List, Union, Optional, Iterable
 
 import cairo
 
@@ -32,8 +33,10 @@ from skytemple_files.graphics.img_trp.model import ImgTrp
 from PIL import Image, ImageFilter
 from gi.repository import Gdk, Gtk, GdkPixbuf
 
-from skytemple.core.img_utils import pil_to_cairo_surface
+from skytemple.core.img_utils import pil_to_cairo_surface, pil_indexed_to_cairo_surface
 from skytemple.core.model_context import ModelContext
+from skytemple.core.settings import SkyTempleSettingsStore
+from skytemple.core.surface_cache import SurfaceCache, SurfaceCacheStats, surface_size, DEFAULT_BUDGET_MB
 from skytemple.core.ui_utils import data_dir
 from skytemple.core.async_tasks.delegator import AsyncTaskDelegator
 from skytemple_files.common.types.file_types import FileType
@@ -48,6 +51,8 @@ if TYPE_CHECKING:
 
 SpriteAndOffsetAndDims = Tuple[cairo.ImageSurface, int, int, int, int]
 ActorSpriteKey = Tuple[Union[str, int], int]
+# (kind, *kind specific key)
+CacheKey = Tuple
 sprite_provider_lock = threading.RLock()
 logger = logging.getLogger(__name__)
 
@@ -150,23 +155,31 @@ TRP_FILENAME = 'traps.trp.img'
 ITM_FILENAME = 'items.itm.img'
 FILE_NAME_STANDIN_SPRITES = '.standin_sprites.json'
 
+KIND_MONSTER = 'monster'
+KIND_MONSTER_OUTLINE = 'monster_outline'
+KIND_ACTOR_PLACEHOLDER = 'actor_placeholder'
+KIND_OBJECT = 'object'
+KIND_TRAP = 'trap'
+KIND_ITEM = 'item'
+
 
 class SpriteProvider:
     """
     SpriteProvider. This class renders sprites using Threads. If a Sprite is requested, a loading icon
     is returned instead, until it is loaded by the AsyncTaskDelegator.
+
+    Loaded sprites are kept in a LRU cache with a memory budget. Views can pass a pin_owner to the getters,
+    to make sure the sprites they display are not evicted, and must call release_pins when they are unloaded.
     """
     def __init__(self, project: 'RomProject'):
         self._project = project
         self._loader_surface_dims: Optional[Tuple[int, int]] = None
         self._loader_surface: Optional[cairo.ImageSurface] = None
+        self._error_surface: Optional[cairo.ImageSurface] = None
 
-        self._loaded__monsters: Dict[ActorSpriteKey, SpriteAndOffsetAndDims] = {}
-        self._loaded__monsters_outlines: Dict[ActorSpriteKey, SpriteAndOffsetAndDims] = {}
-        self._loaded__actor_placeholders: Dict[ActorSpriteKey, SpriteAndOffsetAndDims] = {}
-        self._loaded__objects: Dict[str, SpriteAndOffsetAndDims] = {}
-        self._loaded__traps: Dict[int, SpriteAndOffsetAndDims] = {}
-        self._loaded__items: Dict[int, SpriteAndOffsetAndDims] = {}
+        self._loaded: SurfaceCache[CacheKey, SpriteAndOffsetAndDims] = SurfaceCache(
+            SkyTempleSettingsStore().get_surface_cache_budget(DEFAULT_BUDGET_MB) * 1024 * 1024, self._sprite_size
+        )
 
         self._requests__monsters: List[ActorSpriteKey] = []
         self._requests__monsters_outlines: List[ActorSpriteKey] = []
@@ -207,71 +220,84 @@ class SpriteProvider:
 
     def reset(self):
         with sprite_provider_lock:
-            self._loaded__monsters = {}
-            self._loaded__actor_placeholders = {}
-            self._loaded__objects = {}
-            self._loaded__traps = {}
-            self._loaded__items = {}
+            self._loaded.clear()
 
             self._requests__monsters = []
+            self._requests__monsters_outlines = []
             self._requests__actor_placeholders = []
             self._requests__objects = []
             self._requests__traps = []
             self._requests__items = []
 
-    def get_actor_placeholder(self, actor_id, direction_id: int, after_load_cb=lambda: None) -> SpriteAndOffsetAndDims:
+    def get_actor_placeholder(self, actor_id, direction_id: int, after_load_cb=lambda: None, pin_owner=None) -> SpriteAndOffsetAndDims:
         """
         Returns a placeholder sprite for the actor with the given index (in the actor table).
         As long as the sprite is being loaded, the loader sprite is returned instead.
         """
         with sprite_provider_lock:
-            if (actor_id, direction_id) in self._loaded__actor_placeholders:
-                return self._loaded__actor_placeholders[(actor_id, direction_id)]
+            key = (KIND_ACTOR_PLACEHOLDER, actor_id, direction_id)
+            if pin_owner is not None:
+                self._loaded.pin(pin_owner, key)
+            loaded = self._loaded.get(key)
+            if loaded is not None:
+                return loaded
             if (actor_id, direction_id) not in self._requests__actor_placeholders:
                 self._requests__actor_placeholders.append((actor_id, direction_id))
                 self._load_actor_placeholder(actor_id, direction_id, after_load_cb)
         return self.get_loader()
 
-    def get_monster(self, md_index, direction_id: int, after_load_cb=lambda: None) -> SpriteAndOffsetAndDims:
+    def get_monster(self, md_index, direction_id: int, after_load_cb=lambda: None, pin_owner=None) -> SpriteAndOffsetAndDims:
         """
         Returns the sprite using the index from the monster.md.
         As long as the sprite is being loaded, the loader sprite is returned instead.
         """
         with sprite_provider_lock:
-            if (md_index, direction_id) in self._loaded__monsters:
-                return self._loaded__monsters[(md_index, direction_id)]
+            key = (KIND_MONSTER, md_index, direction_id)
+            if pin_owner is not None:
+                self._loaded.pin(pin_owner, key)
+            loaded = self._loaded.get(key)
+            if loaded is not None:
+                return loaded
             if (md_index, direction_id) not in self._requests__monsters:
                 self._requests__monsters.append((md_index, direction_id))
                 self._load_monster(md_index, direction_id, after_load_cb)
         return self.get_loader()
 
-    def get_monster_outline(self, md_index, direction_id: int, after_load_cb=lambda: None) -> SpriteAndOffsetAndDims:
+    def get_monster_outline(self, md_index, direction_id: int, after_load_cb=lambda: None, pin_owner=None) -> SpriteAndOffsetAndDims:
         """
         Returns the outline of a sprite using the index from the monster.md.
         As long as the sprite is being loaded, the loader sprite is returned instead.
         """
         with sprite_provider_lock:
-            if (md_index, direction_id) in self._loaded__monsters_outlines:
-                return self._loaded__monsters_outlines[(md_index, direction_id)]
+            key = (KIND_MONSTER_OUTLINE, md_index, direction_id)
+            if pin_owner is not None:
+                self._loaded.pin(pin_owner, key)
+            loaded = self._loaded.get(key)
+            if loaded is not None:
+                return loaded
             if (md_index, direction_id) not in self._requests__monsters_outlines:
                 self._requests__monsters_outlines.append((md_index, direction_id))
                 self._load_monster_outline(md_index, direction_id, after_load_cb)
         return self.get_loader()
 
-    def get_for_object(self, name, after_load_cb=lambda: None) -> SpriteAndOffsetAndDims:
+    def get_for_object(self, name, after_load_cb=lambda: None, pin_owner=None) -> SpriteAndOffsetAndDims:
         """
         Returns a named object sprite file from the GROUND directory.
         As long as the sprite is being loaded, the loader sprite is returned instead.
         """
         with sprite_provider_lock:
-            if name in self._loaded__objects:
-                return self._loaded__objects[name]
+            key = (KIND_OBJECT, name)
+            if pin_owner is not None:
+                self._loaded.pin(pin_owner, key)
+            loaded = self._loaded.get(key)
+            if loaded is not None:
+                return loaded
             if name not in self._requests__objects:
                 self._requests__objects.append(name)
                 self._load_object(name, after_load_cb)
         return self.get_loader()
 
-    def get_for_trap(self, trp: Union[MappaTrapType, int], after_load_cb=lambda: None) -> SpriteAndOffsetAndDims:
+    def get_for_trap(self, trp: Union[MappaTrapType, int], after_load_cb=lambda: None, pin_owner=None) -> SpriteAndOffsetAndDims:
         """
         Returns a trap sprite.
         As long as the sprite is being loaded, the loader sprite is returned instead.
@@ -280,31 +306,81 @@ class SpriteProvider:
             trp = trp.value
         self._load_dungeon_bin()
         with sprite_provider_lock:
-            if trp in self._loaded__traps:
-                return self._loaded__traps[trp]  # type: ignore
+            key = (KIND_TRAP, trp)
+            if pin_owner is not None:
+                self._loaded.pin(pin_owner, key)
+            loaded = self._loaded.get(key)
+            if loaded is not None:
+                return loaded
             if trp not in self._requests__traps:
                 self._requests__traps.append(trp)  # type: ignore
                 self._load_trap(trp, after_load_cb)  # type: ignore
         return self.get_loader()
 
-    def get_for_item(self, itm: ItemPEntry, after_load_cb=lambda: None) -> SpriteAndOffsetAndDims:
+    def get_for_item(self, itm: ItemPEntry, after_load_cb=lambda: None, pin_owner=None) -> SpriteAndOffsetAndDims:
         """
         Returns a item sprite based on the sprite ID.
         As long as the sprite is being loaded, the loader sprite is returned instead.
         """
         self._load_dungeon_bin()
         with sprite_provider_lock:
-            if itm.item_id in self._loaded__items:
-                return self._loaded__items[itm.item_id]
+            key = (KIND_ITEM, itm.item_id)
+            if pin_owner is not None:
+                self._loaded.pin(pin_owner, key)
+            loaded = self._loaded.get(key)
+            if loaded is not None:
+                return loaded
             if itm.item_id not in self._requests__items:
                 self._requests__items.append(itm.item_id)
                 self._load_item(itm, after_load_cb)
         return self.get_loader()
 
+    async def prefetch(self, monsters: Iterable[ActorSpriteKey] = (),
+                       actor_placeholders: Iterable[ActorSpriteKey] = (),
+                       objects: Iterable[str] = (), pin_owner=None):
+        """
+        Loads all of the given sprites (that are not already loaded or being loaded) as one batch in the thread
+        pool of the running event loop and returns once all of them are in the cache. No load callbacks are
+        called for the sprites loaded this way.
+        Meant to be awaited in AbstractController.async_init, so the first paint of a view already shows the
+        finished sprites. If pin_owner is given, all of the sprites are pinned for it.
+        """
+        loop = asyncio.get_event_loop()
+        futures = []
+        with sprite_provider_lock:
+            for md_index, direction_id in set(monsters):
+                key = (KIND_MONSTER, md_index, direction_id)
+                if pin_owner is not None:
+                    self._loaded.pin(pin_owner, key)
+                if key not in self._loaded and (md_index, direction_id) not in self._requests__monsters:
+                    self._requests__monsters.append((md_index, direction_id))
+                    futures.append(loop.run_in_executor(None, self._load_monster__sync, md_index, direction_id))
+            for actor_id, direction_id in set(actor_placeholders):
+                key = (KIND_ACTOR_PLACEHOLDER, actor_id, direction_id)
+                if pin_owner is not None:
+                    self._loaded.pin(pin_owner, key)
+                if key not in self._loaded and (actor_id, direction_id) not in self._requests__actor_placeholders:
+                    self._requests__actor_placeholders.append((actor_id, direction_id))
+                    futures.append(loop.run_in_executor(
+                        None, self._load_actor_placeholder__sync, actor_id, direction_id
+                    ))
+            for name in set(objects):
+                key = (KIND_OBJECT, name)
+                if pin_owner is not None:
+                    self._loaded.pin(pin_owner, key)
+                if key not in self._loaded and name not in self._requests__objects:
+                    self._requests__objects.append(name)
+                    futures.append(loop.run_in_executor(None, self._load_object__sync, name))
+        await asyncio.gather(*futures)
+
     def _load_actor_placeholder(self, actor_id, direction_id: int, after_load_cb):
         AsyncTaskDelegator.run_task(self._load_actor_placeholder__impl(actor_id, direction_id, after_load_cb))
 
     async def _load_actor_placeholder__impl(self, actor_id, direction_id: int, after_load_cb):
+        self._load_actor_placeholder__sync(actor_id, direction_id)
+        after_load_cb()
+
+    def _load_actor_placeholder__sync(self, actor_id, direction_id: int):
         md_index = FALLBACK_STANDIN_ENTITIY
         if actor_id in self.get_standin_entities():
             md_index = self.get_standin_entities()[actor_id]
@@ -343,14 +419,17 @@ class SpriteProvider:
         except BaseException:
             loaded = self.get_error()
         with sprite_provider_lock:
-            self._loaded__actor_placeholders[(actor_id, direction_id)] = loaded
+            self._loaded.put((KIND_ACTOR_PLACEHOLDER, actor_id, direction_id), loaded)
             self._requests__actor_placeholders.remove((actor_id, direction_id))
-        after_load_cb()
 
     def _load_monster(self, md_index, direction_id: int, after_load_cb):
         AsyncTaskDelegator.run_task(self._load_monster__impl(md_index, direction_id, after_load_cb))
 
     async def _load_monster__impl(self, md_index, direction_id: int, after_load_cb):
+        self._load_monster__sync(md_index, direction_id)
+        after_load_cb()
+
+    def _load_monster__sync(self, md_index, direction_id: int):
         try:
             pil_img, cx, cy, w, h = self._retrieve_monster_sprite(md_index, direction_id)
             surf = pil_to_cairo_surface(pil_img)
@@ -358,9 +437,8 @@ class SpriteProvider:
         except BaseException:
             loaded = self.get_error()
         with sprite_provider_lock:
-            self._loaded__monsters[(md_index, direction_id)] = loaded
+            self._loaded.put((KIND_MONSTER, md_index, direction_id), loaded)
             self._requests__monsters.remove((md_index, direction_id))
-        after_load_cb()
 
     def _load_monster_outline(self, md_index, direction_id: int, after_load_cb):
         AsyncTaskDelegator.run_task(self._load_monster_outline__impl(md_index, direction_id, after_load_cb))
@@ -383,7 +461,7 @@ class SpriteProvider:
         except BaseException:
             loaded = self.get_error()
         with sprite_provider_lock:
-            self._loaded__monsters_outlines[(md_index, direction_id)] = loaded
+            self._loaded.put((KIND_MONSTER_OUTLINE, md_index, direction_id), loaded)
             self._requests__monsters_outlines.remove((md_index, direction_id))
         after_load_cb()
 
@@ -411,6 +489,10 @@ class SpriteProvider:
         AsyncTaskDelegator.run_task(self._load_object__impl(name, after_load_cb))
 
     async def _load_object__impl(self, name, after_load_cb):
+        self._load_object__sync(name)
+        after_load_cb()
+
+    def _load_object__sync(self, name):
         try:
             with self._load_sprite_from_rom(f'GROUND/{name}.wan') as sprite:
                 ani_group = sprite.anim_groups[0]
@@ -420,16 +502,15 @@ class SpriteProvider:
                 sprite_img, (cx, cy) = sprite.render_frame_group(sprite.frame_groups[mfg_id])
             surf = pil_to_cairo_surface(sprite_img)
             with sprite_provider_lock:
-                self._loaded__objects[name] = surf, cx, cy, sprite_img.width, sprite_img.height
+                self._loaded.put((KIND_OBJECT, name), (surf, cx, cy, sprite_img.width, sprite_img.height))
 
         except BaseException as e:
             # Error :(
             logger.warning(f"Error loading an object sprite for {name}.", exc_info=e)
             with sprite_provider_lock:
-                self._loaded__objects[name] = self.get_error()
+                self._loaded.put((KIND_OBJECT, name), self.get_error())
         with sprite_provider_lock:
             self._requests__objects.remove(name)
-        after_load_cb()
 
     def _load_trap(self, trp: int, after_load_cb):
         AsyncTaskDelegator.run_task(self._load_trap__impl(trp, after_load_cb))
@@ -441,13 +522,13 @@ class SpriteProvider:
                 traps: ImgTrp = dungeon_bin.get(TRP_FILENAME)
             surf = pil_to_cairo_surface(traps.to_pil(trp, TRAP_PALETTE_MAP[trp]).convert('RGBA'))
             with sprite_provider_lock:
-                self._loaded__traps[trp] = surf, 0, 0, 24, 24
+                self._loaded.put((KIND_TRAP, trp), (surf, 0, 0, 24, 24))
 
         except BaseException as e:
             # Error :(
             logger.warning(f"Error loading an trap sprite for {trp}.", exc_info=e)
             with sprite_provider_lock:
-                self._loaded__traps[trp] = self.get_error()
+                self._loaded.put((KIND_TRAP, trp), self.get_error())
         with sprite_provider_lock:
             self._requests__traps.remove(trp)
         after_load_cb()
@@ -461,19 +542,15 @@ class SpriteProvider:
             with self._dungeon_bin as dungeon_bin:
                 items: ImgItm = dungeon_bin.get(ITM_FILENAME)
             img = items.to_pil(item.sprite, item.palette)
-            alpha = [px % 16 != 0 for px in img.getdata()]
-            img = img.convert('RGBA')
-            alphaimg = Image.new('1', (img.width, img.height))
-            alphaimg.putdata(alpha)
-            img.putalpha(alphaimg)
-            surf = pil_to_cairo_surface(img)
+            # The first color of every 16 color palette is transparent.
+            surf = pil_indexed_to_cairo_surface(img, img.getpalette(), range(0, 256, 16))
             with sprite_provider_lock:
-                self._loaded__items[item.item_id] = surf, 0, 0, 16, 16
+                self._loaded.put((KIND_ITEM, item.item_id), (surf, 0, 0, 16, 16))
         except BaseException as e:
             # Error :(
             logger.warning(f"Error loading an item sprite for {item}.", exc_info=e)
             with sprite_provider_lock:
-                self._loaded__items[item.item_id] = self.get_error()
+                self._loaded.put((KIND_ITEM, item.item_id), self.get_error())
         with sprite_provider_lock:
             self._requests__items.remove(item.item_id)
         after_load_cb()
@@ -501,6 +578,23 @@ class SpriteProvider:
         w, h = self._error_surface_dims
         return self._error_surface, int(w/2), h, w, h
 
+    def release_pins(self, owner: object):
+        """Releases all sprites pinned by owner. They may be evicted from the cache afterwards."""
+        self._loaded.release(owner)
+
+    def get_cache_stats(self) -> SurfaceCacheStats:
+        """Returns hit, miss and eviction statistics and the current memory usage of the sprite cache."""
+        return self._loaded.stats()
+
+    def set_cache_budget(self, budget_mb: int):
+        self._loaded.set_budget(budget_mb * 1024 * 1024)
+
+    def _sprite_size(self, sprite: SpriteAndOffsetAndDims) -> int:
+        # The loader and error icons are shared and never evicted.
+        if sprite[0] is self._error_surface or sprite[0] is self._loader_surface:
+            return 0
+        return surface_size(sprite[0])
+
     def get_standin_entities(self):
         if not self._loaded_standins:
             self._loaded_standins = STANDIN_ENTITIES_DEFAULT
@@ -515,7 +609,7 @@ class SpriteProvider:
 
     def set_standin_entities(self, mappings):
         with sprite_provider_lock:
-            self._loaded__actor_placeholders = {}
+            self._loaded.remove_where(lambda k: k[0] == KIND_ACTOR_PLACEHOLDER)
         p = self._standin_entities_filepath()
         with open_utf8(p, 'w') as f:
             json.dump(mappings, f)
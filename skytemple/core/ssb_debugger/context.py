@@ -118,6 +118,7 @@ class SkyTempleMainDebuggerControlContext(AbstractDebuggerControlContext):
         ssb_loaded_file.ssb_model = ssb_model
         project.prepare_save_model(filename, assert_that=ssb_loaded_file)
         project.save_as_is()
+        project.get_full_text_search().file_modified(filename)
 
     def open_scene_editor(self, type_of_scene, path):
         try:
@@ -204,7 +205,7 @@ class SkyTempleMainDebuggerControlContext(AbstractDebuggerControlContext):
         yield from self.get_static_data().script_data.op_codes__by_name.keys()
         yield from (x.name.replace('$', '') for x in SsbConstant.collect_all(self.get_static_data().script_data))
         yield from EXPS_KEYWORDS
-        yield from pro.get_string_provider().get_all(StringType.POKEMON_NAMES)
+        yield from pro.get_string_provider().get_all_view(StringType.POKEMON_NAMES)
 
     @staticmethod
     def message_dialog_cls():
@@ -16,7 +16,7 @@
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
 import locale
 from enum import Enum, auto
-from typing import TYPE_CHECKING, Optional, Union, List
+from typing import TYPE_CHECKING, Optional, Union, List, Dict, Sequence, overload
 
 from skytemple_files.common.ppmdu_config.data import Pmd2Language, Pmd2StringBlock
 from skytemple_files.common.types.file_types import FileType
@@ -84,12 +84,46 @@ LanguageLike = Union[str, Pmd2Language]  # locale string or Pmd2Language
 MESSAGE_DIR = 'MESSAGE'
 
 
+class StringBlockView(Sequence[str]):
+    """
+    A read-only view of the strings of one string block in a string table model.
+    It doesn't copy the strings and always reflects the current content of the model.
+    """
+    def __init__(self, model: Str, string_block: Pmd2StringBlock):
+        self._model = model
+        self._begin = string_block.begin
+        self._end = string_block.end
+
+    def __len__(self) -> int:
+        return max(0, min(self._end, len(self._model.strings)) - self._begin)
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+    @overload
+    def __getitem__(self, index: slice) -> List[str]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("String block index out of range.")
+        return self._model.strings[self._begin + index]
+
+
 class StringProvider:
     """
     SpriteProvider. Provides strings from the big string table(s).
+
+    Resolved languages, string blocks and models are cached. The cached model of a string file is
+    dropped when the file is marked as modified (see file_modified).
     """
     def __init__(self, project: 'RomProject'):
         self.project = project
+        self._languages: Dict[Optional[str], Pmd2Language] = {}
+        self._string_blocks: Dict[str, Pmd2StringBlock] = {}
+        self._models: Dict[str, Str] = {}
 
     @property
     def _static_data(self):
@@ -102,7 +136,7 @@ class StringProvider:
         If language is not set, the default ROM language is used.
         """
         model = self.get_model(language)
-        return model.strings[self.get_index(string_type, index)]
+        return model.strings[self._get_string_block(string_type).begin + index]
 
     def get_index(self, string_type: StringType, index: int) -> int:
         """
@@ -122,12 +156,22 @@ class StringProvider:
         string_block = self._get_string_block(string_type)
         return model.strings[string_block.begin:string_block.end]
 
+    def get_all_view(self, string_type: StringType, language: LanguageLike = None) -> StringBlockView:
+        """
+        Returns a read-only view of all strings of the given type, without copying them (unlike get_all).
+        If language is not set, the default ROM language is used.
+        """
+        return StringBlockView(self.get_model(language), self._get_string_block(string_type))
+
     def get_model(self, language: LanguageLike = None) -> Str:
         """
         Returns the string table model for the given language.
         If language is not set, the default ROM language is used.
         """
-        return self.project.open_file_in_rom(f'{MESSAGE_DIR}/{self.get_language(language).filename}', FileType.STR)
+        filename = self.get_language(language).filename
+        if filename not in self._models:
+            self._models[filename] = self.project.open_file_in_rom(f'{MESSAGE_DIR}/{filename}', FileType.STR)
+        return self._models[filename]
 
     def get_languages(self) -> List[Pmd2Language]:
         """Returns all supported languages."""
@@ -139,10 +183,20 @@ class StringProvider:
             if self.project.is_opened(fname):
                 self.project.mark_as_modified(fname)
 
+    def file_modified(self, filename: str):
+        """Drops the cached model of a string file. Called by RomProject.mark_as_modified."""
+        if filename.startswith(MESSAGE_DIR + '/'):
+            lang_filename = filename[len(MESSAGE_DIR) + 1:]
+            self._models.pop(lang_filename, None)
+
     def get_language(self, language_locale: LanguageLike = None) -> Pmd2Language:
         if isinstance(language_locale, Pmd2Language):
             return language_locale
+        if language_locale not in self._languages:
+            self._languages[language_locale] = self._resolve_language(language_locale)
+        return self._languages[language_locale]
 
+    def _resolve_language(self, language_locale: Optional[str]) -> Pmd2Language:
         string_index_data = self._static_data.string_index_data
         language: Optional[Pmd2Language] = None
         if language_locale is None and len(string_index_data.languages) > 0:
@@ -157,12 +211,15 @@ class StringProvider:
         return language
 
     def _get_string_block(self, string_type: StringType) -> Pmd2StringBlock:
-        string_index_data = self._static_data.string_index_data
+        # Cached by XML name, since the name of a string type can be replaced.
+        if string_type.xml_name not in self._string_blocks:
+            string_index_data = self._static_data.string_index_data
 
-        if string_type.xml_name not in string_index_data.string_blocks:
-            raise ValueError(f"String mapping for {string_type} not found.")
+            if string_type.xml_name not in string_index_data.string_blocks:
+                raise ValueError(f"String mapping for {string_type} not found.")
 
-        return string_index_data.string_blocks[string_type.xml_name]
+            self._string_blocks[string_type.xml_name] = string_index_data.string_blocks[string_type.xml_name]
+        return self._string_blocks[string_type.xml_name]
 
     def _get_locale_from_app_locale(self) -> Pmd2Language:
         try:
@@ -0,0 +1,174 @@
+"""Byte-accounted LRU cache for rendered surfaces, with support for pinning entries that are in use."""
+#  Copyright 2020-2021 Capypara and the SkyTemple Contributors
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from typing import TypeVar, Generic, Callable, Dict, Hashable, Optional, NamedTuple, Iterator, Set
+
+import cairo
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET_MB = 128
+
+
+class SurfaceCacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    pinned: int
+    size_bytes: int
+    budget_bytes: int
+
+
+def surface_size(surface: cairo.ImageSurface) -> int:
+    """Returns the number of bytes used by the pixel data of a cairo image surface."""
+    return surface.get_stride() * surface.get_height()
+
+
+class SurfaceCache(Generic[K, V]):
+    """
+    A LRU cache that tracks the size of its entries in bytes (as reported by size_fn) and evicts the least
+    recently used entries once the budget is exceeded.
+
+    Entries can be pinned by owners (usually the views that currently display them). Pinned entries are never
+    evicted. Owners are only weakly referenced, so pins are dropped automatically when a view is garbage collected,
+    but views should still call release as soon as they are unloaded.
+    """
+    def __init__(self, budget_bytes: int, size_fn: Callable[[V], int]):
+        self._lock = threading.RLock()
+        self._budget = budget_bytes
+        self._size_fn = size_fn
+        self._entries: 'OrderedDict[K, V]' = OrderedDict()
+        self._sizes: Dict[K, int] = {}
+        self._pins: Dict[K, weakref.WeakSet] = {}
+        # Keys that missed and weren't put yet. Views poll while an entry is loading, this is only one miss.
+        self._pending_misses: Set[K] = set()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __contains__(self, key: K) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def keys(self) -> Iterator[K]:
+        with self._lock:
+            return iter(list(self._entries.keys()))
+
+    def get(self, key: K) -> Optional[V]:
+        """
+        Returns the entry for key (marking it as recently used) or None, if it is not cached.
+        Repeated misses for the same key count as one miss, until the key is put.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            if key not in self._pending_misses:
+                self._misses += 1
+                self._pending_misses.add(key)
+            return None
+
+    def put(self, key: K, value: V):
+        """Inserts or replaces an entry and evicts old entries if the budget is exceeded."""
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._sizes[key]
+            size = self._size_fn(value)
+            self._pending_misses.discard(key)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self._size += size
+            self._evict(keep=key)
+
+    def remove(self, key: K):
+        with self._lock:
+            if key in self._entries:
+                del self._entries[key]
+                self._size -= self._sizes.pop(key)
+
+    def remove_where(self, predicate: Callable[[K], bool]):
+        """Removes all entries whose key matches the predicate."""
+        with self._lock:
+            for key in [k for k in self._entries.keys() if predicate(k)]:
+                self.remove(key)
+
+    def clear(self):
+        """Removes all entries. Pins and statistics are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._pending_misses.clear()
+            self._size = 0
+
+    def pin(self, owner: object, key: K):
+        """Pins the entry for key (even if it isn't loaded yet) for as long as owner holds the pin."""
+        with self._lock:
+            if key not in self._pins:
+                self._pins[key] = weakref.WeakSet()
+            self._pins[key].add(owner)
+
+    def release(self, owner: object):
+        """Releases all pins held by owner."""
+        with self._lock:
+            for key in list(self._pins.keys()):
+                self._pins[key].discard(owner)
+                if len(self._pins[key]) < 1:
+                    del self._pins[key]
+            self._evict()
+
+    def is_pinned(self, key: K) -> bool:
+        with self._lock:
+            return key in self._pins and len(self._pins[key]) > 0
+
+    def set_budget(self, budget_bytes: int):
+        with self._lock:
+            self._budget = budget_bytes
+            self._evict()
+
+    def stats(self) -> SurfaceCacheStats:
+        with self._lock:
+            return SurfaceCacheStats(
+                self._hits, self._misses, self._evictions, len(self._entries),
+                sum(1 for k in self._entries.keys() if self.is_pinned(k)), self._size, self._budget
+            )
+
+    def _evict(self, keep: Optional[K] = None):
+        if self._size <= self._budget:
+            return
+        for key in list(self._entries.keys()):
+            if self._size <= self._budget:
+                break
+            if key == keep or self.is_pinned(key):
+                continue
+            self.remove(key)
+            self._evictions += 1
+        if self._size > self._budget:
+            logger.debug(f"Surface cache is over budget ({self._size} > {self._budget} bytes), "
+                         f"but all remaining entries are pinned.")
@@ -0,0 +1,216 @@
+"""Cross-reference index between levels, map backgrounds, scenes, scripts and the entities placed in scenes."""
+#  Copyright 2020-2021 Capypara and the SkyTemple Contributors
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional, Dict, List, Set
+
+from skytemple_files.common.ppmdu_config.script_data import Pmd2ScriptLevel
+from skytemple_files.common.script_util import SCRIPT_DIR, SSE_EXT, SSA_EXT, SSS_EXT
+from skytemple_files.common.types.file_types import FileType
+from skytemple_files.script.ssa_sse_sss.model import Ssa
+
+if TYPE_CHECKING:
+    from skytemple.core.rom_project import RomProject
+    from skytemple.module.script.script_catalog import ScriptCatalog
+
+logger = logging.getLogger(__name__)
+
+LEVEL_LIST = 'BALANCE/level_list.bin'
+MAP_BG_LIST = 'MAP_BG/bg_list.dat'
+SCENE_EXTS = (SSE_EXT, SSA_EXT, SSS_EXT)
+
+
+class CrossReferenceIndex:
+    """
+    Answers questions like "which levels use map background X", "which map backgrounds use BPC file Y",
+    "which scenes place actor Z" or "which scene does this script belong to" without scanning the ROM.
+
+    Each part of the index is built the first time it's queried (building the scene part reads all
+    scenes of the ROM) and afterwards updated through RomProject.mark_as_modified, see file_modified.
+    The scenes and scripts of the maps are taken from the ScriptCatalog of the script module.
+    All scene and script names are full paths in the ROM.
+    """
+    def __init__(self, project: 'RomProject'):
+        self._project = project
+        # Levels & map backgrounds
+        self._levels_by_bg: Optional[Dict[int, List[Pmd2ScriptLevel]]] = None
+        self._bgs_by_file: Optional[Dict[str, List[int]]] = None
+        # Scenes & scripts
+        self._scenes_by_level: Optional[Dict[str, List[str]]] = None
+        self._scripts_by_scene: Dict[str, List[str]] = {}
+        self._scene_by_script: Dict[str, str] = {}
+        # Scene entities: scene -> set of ids and id -> set of scenes
+        self._actors_by_scene: Dict[str, Set[int]] = {}
+        self._objects_by_scene: Dict[str, Set[int]] = {}
+        self._scenes_by_actor: Dict[int, Set[str]] = {}
+        self._scenes_by_object: Dict[int, Set[str]] = {}
+        self._entities_indexed = False
+
+    # LEVELS & MAP BACKGROUNDS #
+    def get_levels_for_map_bg(self, bg_id: int) -> List[Pmd2ScriptLevel]:
+        """Returns all levels in the level list that use the map background with this ID."""
+        if self._levels_by_bg is None:
+            self._index_levels()
+        return self._levels_by_bg.get(bg_id, [])  # type: ignore
+
+    def get_map_bgs_using_file(self, filename: str) -> List[int]:
+        """
+        Returns the IDs of all map backgrounds that use this BMA, BPC, BPL or BPA file.
+        The file name is the name in the map background list (without extension, case-insensitive).
+        """
+        if self._bgs_by_file is None:
+            self._index_bg_list()
+        return self._bgs_by_file.get(filename.upper(), [])  # type: ignore
+
+    # SCENES & SCRIPTS #
+    def get_scenes_for_level(self, level_name: str) -> List[str]:
+        """Returns all scenes (SSE, SSA and SSS) of the level."""
+        if self._scenes_by_level is None:
+            self._index_script_files()
+        return self._scenes_by_level.get(level_name, [])  # type: ignore
+
+    def get_scripts_for_scene(self, scene: str) -> List[str]:
+        """Returns the SSB scripts that belong to this scene."""
+        if self._scenes_by_level is None:
+            self._index_script_files()
+        return self._scripts_by_scene.get(scene, [])
+
+    def get_scene_for_script(self, script: str) -> Optional[str]:
+        """Returns the scene the SSB script belongs to, or None for common scripts or unassigned scripts."""
+        if self._scenes_by_level is None:
+            self._index_script_files()
+        return self._scene_by_script.get(script, None)
+
+    def get_scenes_using_actor(self, actor_id: int) -> List[str]:
+        """Returns all scenes that place the actor (ID in the actor list of the script data)."""
+        self._ensure_entities_indexed()
+        return sorted(self._scenes_by_actor.get(actor_id, []))
+
+    def get_scenes_using_object(self, object_id: int) -> List[str]:
+        """Returns all scenes that place the object (ID in the object list of the script data)."""
+        self._ensure_entities_indexed()
+        return sorted(self._scenes_by_object.get(object_id, []))
+
+    # UPDATES #
+    def file_modified(self, filename: str):
+        """Updates the index after the file was modified. Called by RomProject.mark_as_modified."""
+        if filename == LEVEL_LIST:
+            self._levels_by_bg = None
+        elif filename == MAP_BG_LIST:
+            self._bgs_by_file = None
+        elif filename.startswith(SCRIPT_DIR + '/') and filename.endswith(SCENE_EXTS):
+            if self._scenes_by_level is not None and filename not in self._scripts_by_scene:
+                # A new scene; the script module already added it to the script catalog.
+                map_obj = self._script_catalog().maps.get(filename.split('/')[1], None)
+                if map_obj is not None:
+                    self._index_map(map_obj)
+            if self._entities_indexed:
+                self._index_scene_entities(filename, self._project.open_file_in_rom(
+                    filename, FileType.SSA, scriptdata=self._script_data()
+                ))
+
+    def _index_levels(self):
+        self._levels_by_bg = {}
+        for level in self._script_data().level_list__by_id.values():
+            if level.mapid not in self._levels_by_bg:
+                self._levels_by_bg[level.mapid] = []
+            self._levels_by_bg[level.mapid].append(level)
+
+    def _index_bg_list(self):
+        self._bgs_by_file = {}
+        bg_list = self._project.open_file_in_rom(MAP_BG_LIST, FileType.BG_LIST_DAT)
+        for bg_id, entry in enumerate(bg_list.level):
+            for name in [entry.bma_name, entry.bpc_name, entry.bpl_name] + list(entry.bpa_names):
+                if name is None:
+                    continue
+                if name.upper() not in self._bgs_by_file:
+                    self._bgs_by_file[name.upper()] = []
+                if bg_id not in self._bgs_by_file[name.upper()]:
+                    self._bgs_by_file[name.upper()].append(bg_id)
+
+    def _index_script_files(self):
+        self._scenes_by_level = OrderedDict()
+        self._scripts_by_scene = {}
+        self._scene_by_script = {}
+        for map_obj in self._script_catalog().maps.values():
+            self._index_map(map_obj)
+
+    def _index_map(self, map_obj: dict):
+        """(Re-)indexes the scenes and scripts of one map of the script catalog."""
+        for scene in self._scenes_by_level.get(map_obj['name'], []):  # type: ignore
+            for script in self._scripts_by_scene.pop(scene, []):
+                self._scene_by_script.pop(script, None)
+        path = f"{SCRIPT_DIR}/{map_obj['name']}/"
+        scenes = []
+        if map_obj['enter_sse'] is not None:
+            scenes.append(path + map_obj['enter_sse'])
+            self._add_scripts(path + map_obj['enter_sse'], [path + ssb for ssb in map_obj['enter_ssbs']])
+        for ssa, ssb in map_obj['ssas']:
+            scenes.append(path + ssa)
+            self._add_scripts(path + ssa, [path + ssb])
+        for sss, ssbs in map_obj['subscripts'].items():
+            scenes.append(path + sss)
+            self._add_scripts(path + sss, [path + ssb for ssb in ssbs])
+        self._scenes_by_level[map_obj['name']] = scenes  # type: ignore
+
+    def _add_scripts(self, scene: str, scripts: List[str]):
+        self._scripts_by_scene[scene] = scripts
+        for script in scripts:
+            self._scene_by_script[script] = scene
+
+    def _ensure_entities_indexed(self):
+        if self._entities_indexed:
+            return
+        logger.debug("Indexing the entities of all scenes.")
+        if self._scenes_by_level is None:
+            self._index_script_files()
+        script_data = self._script_data()
+        for scenes in self._scenes_by_level.values():  # type: ignore
+            for scene in scenes:
+                if self._project.is_opened(scene):
+                    ssa = self._project.open_file_in_rom(scene, FileType.SSA, scriptdata=script_data)
+                else:
+                    # Don't keep all scenes of the ROM open.
+                    ssa = FileType.SSA.deserialize(self._project.open_file_manually(scene), scriptdata=script_data)
+                self._index_scene_entities(scene, ssa)
+        self._entities_indexed = True
+
+    def _index_scene_entities(self, scene: str, ssa: Ssa):
+        for entity_id in self._actors_by_scene.pop(scene, set()):
+            self._scenes_by_actor[entity_id].discard(scene)
+        for entity_id in self._objects_by_scene.pop(scene, set()):
+            self._scenes_by_object[entity_id].discard(scene)
+        actors = set()
+        objects = set()
+        for layer in ssa.layer_list:
+            for actor in layer.actors:
+                actors.add(actor.actor.id)
+            for obj in layer.objects:
+                objects.add(obj.object.id)
+        self._actors_by_scene[scene] = actors
+        self._objects_by_scene[scene] = objects
+        for entity_id in actors:
+            self._scenes_by_actor.setdefault(entity_id, set()).add(scene)
+        for entity_id in objects:
+            self._scenes_by_object.setdefault(entity_id, set()).add(scene)
+
+    def _script_catalog(self) -> 'ScriptCatalog':
+        return self._project.get_module('script').script_catalog
+
+    def _script_data(self):
+        return self._project.get_rom_module().get_static_data().script_data
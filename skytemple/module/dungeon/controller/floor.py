@@ -21,18 +21,19 @@ import sys
 import traceback
 from enum import Enum
 from functools import partial, reduce
-from itertools import zip_longest
 from math import gcd
 from typing import TYPE_CHECKING, List, Type, Dict, Tuple, Optional
 from xml.etree import ElementTree
 
-from gi.repository import Gtk, GLib, GdkPixbuf
+from gi.repository import Gtk, GLib
 
 from skytemple.controller.main import MainController
 from skytemple.core.error_handler import display_error
+from skytemple.core.img_utils import cairo_surface_to_pixbuf
 from skytemple.core.list_icon_renderer import ListIconRenderer
 from skytemple.core.message_dialog import SkyTempleMessageDialog
 from skytemple.core.module_controller import AbstractController
+from skytemple.core.name_stores import NAME_KIND_ITEM, NAME_KIND_MONSTER_BASE_NAMED
 from skytemple.core.open_request import OpenRequest, REQUEST_TYPE_DUNGEON_TILESET, REQUEST_TYPE_DUNGEON_FIXED_FLOOR, \
     REQUEST_TYPE_DUNGEON_MUSIC
 from skytemple.core.string_provider import StringType
@@ -1401,14 +1402,9 @@ class FloorController(AbstractController):
             ])
 
     def _init_monster_completion_store(self):
-        monster_md = self.module.get_monster_md()
-        monster_store: Gtk.ListStore = self.builder.get_object('completion_monsters_store')
-        for idx, entry in enumerate(monster_md.entries):
-            if idx == 0:
-                continue
-            name = self.module.project.get_string_provider().get_value(StringType.POKEMON_NAMES, entry.md_index_base)
-            self._ent_names[idx] = f'{name} (#{idx:03})'
-            monster_store.append([self._ent_names[idx]])
+        monster_name_store = self.module.project.get_name_stores().get(NAME_KIND_MONSTER_BASE_NAMED, '{name} (#{id:03})')
+        self._ent_names = monster_name_store.names
+        self.builder.get_object('completion_monsters').set_model(monster_name_store.store)
 
     def _init_trap_spawns(self):
         store: Gtk.Store = self.builder.get_object('trap_spawns_store')
@@ -1513,33 +1509,26 @@ class FloorController(AbstractController):
         return out_items
 
     def _init_item_completion_store(self):
-        completion_item_thrown_pierce_store: Gtk.ListStore = self.builder.get_object('completion_item_thrown_pierce_store')
-        completion_item_thrown_rock_store: Gtk.ListStore = self.builder.get_object('completion_item_thrown_rock_store')
-        completion_item_berries_store: Gtk.ListStore = self.builder.get_object('completion_item_berries_store')
-        completion_item_foods_store: Gtk.ListStore = self.builder.get_object('completion_item_foods_store')
-        completion_item_hold_store: Gtk.ListStore = self.builder.get_object('completion_item_hold_store')
-        completion_item_tms_store: Gtk.ListStore = self.builder.get_object('completion_item_tms_store')
-        completion_item_orbs_store: Gtk.ListStore = self.builder.get_object('completion_item_orbs_store')
-        completion_item_others_store: Gtk.ListStore = self.builder.get_object('completion_item_others_store')
-        completion_stores = {
-            self.item_categories[0]: completion_item_thrown_pierce_store,
-            self.item_categories[1]: completion_item_thrown_rock_store,
-            self.item_categories[2]: completion_item_berries_store,
-            self.item_categories[3]: completion_item_foods_store,
-            self.item_categories[4]: completion_item_hold_store,
-            self.item_categories[5]: completion_item_tms_store,
-            self.item_categories[9]: completion_item_orbs_store,
-            self.item_categories[8]: completion_item_others_store
+        name_stores = self.module.project.get_name_stores()
+        item_format = '{name} (#{id:03})'
+        completions = {
+            self.item_categories[0]: 'completion_item_thrown_pierce',
+            self.item_categories[1]: 'completion_item_thrown_rock',
+            self.item_categories[2]: 'completion_item_berries',
+            self.item_categories[3]: 'completion_item_foods',
+            self.item_categories[4]: 'completion_item_hold',
+            self.item_categories[5]: 'completion_item_tms',
+            self.item_categories[9]: 'completion_item_orbs',
+            self.item_categories[8]: 'completion_item_others'
         }
 
-        for i in range(0, MAX_ITEM_ID):
-            name = self.module.project.get_string_provider().get_value(StringType.ITEM_NAMES, i)
-            self._item_names[i] = f'{name} (#{i:03})'
+        self._item_names = name_stores.get(NAME_KIND_ITEM, item_format, range(0, MAX_ITEM_ID)).names
 
-        for category, store in completion_stores.items():
-            for item in category.item_ids():
-                if item < MAX_ITEM_ID:
-                    store.append([self._item_names[item]])
+        for category, completion_name in completions.items():
+            category_store = name_stores.get(
+                NAME_KIND_ITEM, item_format, [item for item in category.item_ids() if item < MAX_ITEM_ID]
+            )
+            self.builder.get_object(completion_name).set_model(category_store.store)
 
     def _calculate_relative_weights(self, list_of_weights: List[int]) -> List[int]:
         weights = []
@@ -1578,14 +1567,7 @@ class FloorController(AbstractController):
                                                                lambda: GLib.idle_add(
                                                                    partial(self._reload_icon, entid, idx, was_loading)
                                                                ))
-        data = bytes(sprite.get_data())
-        # this is painful.
-        new_data = bytearray()
-        for b, g, r, a in grouper(data, 4):
-            new_data += bytes([r, g, b, a])
-        return GdkPixbuf.Pixbuf.new_from_data(
-            new_data, GdkPixbuf.Colorspace.RGB, True, 8, w, h, sprite.get_stride()
-        )
+        return cairo_surface_to_pixbuf(sprite)
 
     def _reload_icon(self, entid, idx, was_loading):
         store: Gtk.Store = self.builder.get_object('monster_spawns_store')
@@ -1910,7 +1892,3 @@ class FloorController(AbstractController):
         md.run()
         md.destroy()
 
-
-def grouper(iterable, n, fillvalue=None):
-    args = [iter(iterable)] * n
-    return ((bytes(bytearray(x))) for x in zip_longest(fillvalue=fillvalue, *args))
@@ -28,7 +28,7 @@ from skytemple.core.abstract_module import AbstractModule
 from skytemple.core.error_handler import display_error
 from skytemple.core.model_context import ModelContext
 from skytemple.core.open_request import OpenRequest, REQUEST_TYPE_DUNGEON_FIXED_FLOOR, \
-    REQUEST_TYPE_DUNGEON_FIXED_FLOOR_ENTITY, REQUEST_TYPE_DUNGEONS
+    REQUEST_TYPE_DUNGEON_FIXED_FLOOR_ENTITY, REQUEST_TYPE_DUNGEONS, REQUEST_TYPE_DUNGEON
 from skytemple.core.rom_project import RomProject, BinaryName
 from skytemple.core.string_provider import StringType
 from skytemple.core.ui_utils import recursive_up_item_store_mark_as_modified, \
@@ -210,6 +210,8 @@ class DungeonModule(AbstractModule):
     def handle_request(self, request: OpenRequest) -> Optional[Gtk.TreeIter]:
         if request.type == REQUEST_TYPE_DUNGEONS:
             return self._root_iter
+        if request.type == REQUEST_TYPE_DUNGEON:
+            return self._dungeon_iters.get(request.identifier)
         if request.type == REQUEST_TYPE_DUNGEON_FIXED_FLOOR:
             return self._fixed_floor_iters[request.identifier]
         if request.type == REQUEST_TYPE_DUNGEON_FIXED_FLOOR_ENTITY:
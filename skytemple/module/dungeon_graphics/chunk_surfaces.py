@@ -0,0 +1,79 @@
+#  Copyright 2020-2021 Capypara and the SkyTemple Contributors
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import itertools
+from typing import List, Optional, Hashable, Sequence
+
+from PIL import Image
+
+from skytemple.module.tiled_img.indexed_surfaces import IndexedSurfaceCache
+from skytemple_files.common.util import lcm
+from skytemple_files.graphics.dpc.model import Dpc
+from skytemple_files.graphics.dpci.model import Dpci
+from skytemple_files.graphics.dpl.model import Dpl
+from skytemple_files.graphics.dpla.model import Dpla
+
+
+class DungeonChunkSurfaceCache(IndexedSurfaceCache):
+    """
+    Renders the cairo surfaces for all chunks of a dungeon tileset or dungeon background on demand.
+    There is only one collection, chunks_surfaces[0][chunk_idx][palette_animation_frame][frame]. Dungeon chunks
+    don't have animated tiles, so there is always one frame.
+    """
+    def __init__(self, dpc: Dpc, dpci: Dpci, dpl: Dpl, dpla: Dpla):
+        super().__init__()
+        self._dpc = dpc
+        self._dpci = dpci
+        self._dpl = dpl
+        self._dpla = dpla
+
+    def number_of_collections(self) -> int:
+        return 1
+
+    def number_of_cells(self, collection: int) -> int:
+        return len(self._dpc.chunks)
+
+    def _render_images(self, collection: int, chunk_idx: int) -> List[Image.Image]:
+        return [self._dpc.single_chunk_to_pil(chunk_idx, self._dpci, self._dpl.palettes)]
+
+    def _count_pal_ani_frames(self, collection: int, chunk_idx: int) -> int:
+        chunk_data = self._dpc.chunks[chunk_idx]
+        if not any(tile.pal_idx >= 10 and self._dpla.has_for_palette(tile.pal_idx - 10) for tile in chunk_data):
+            return 0
+        # Both animated palettes are advanced with the same palette animation frame counter.
+        ani_pal_lengths = [self._dpla.get_frame_count_for_palette(x) for x in (0, 1) if self._dpla.has_for_palette(x)]
+        if len(ani_pal_lengths) < 2:
+            return ani_pal_lengths[0]
+        return lcm(*ani_pal_lengths)
+
+    def _get_palette_key(self, collection: int, chunk_idx: int, pal_frame: Optional[int]) -> Hashable:
+        return pal_frame
+
+    def _build_palette(self, pal_frame: Optional[int]) -> Sequence[int]:  # type: ignore
+        if pal_frame is None:
+            return list(itertools.chain.from_iterable(self._dpl.palettes))
+        # Switch out the palette with that from the palette animation
+        return list(itertools.chain.from_iterable(self._dpla.apply_palette_animations(self._dpl.palettes, pal_frame)))
+
+    def get_pal_ani_durations(self) -> int:
+        """
+        The duration of a palette animation frame. Both animated palettes are played at the faster speed.
+        0 if neither palette is animated.
+        """
+        durations = [self._dpla.get_duration_for_palette(x) for x in (0, 1) if self._dpla.has_for_palette(x)]
+        if len(durations) < 1:
+            return 0
+        return min(durations)
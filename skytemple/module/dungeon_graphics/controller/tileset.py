@@ -15,7 +15,6 @@
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
 
-import itertools
 import math
 import os
 import shutil
@@ -34,6 +33,7 @@ from skytemple.core.rom_project import BinaryName
 from skytemple.core.ui_utils import add_dialog_xml_filter
 from skytemple.module.dungeon_graphics.chunk_editor_data_provider.tile_graphics_provider import DungeonTilesProvider
 from skytemple.module.dungeon_graphics.chunk_editor_data_provider.tile_palettes_provider import DungeonPalettesProvider
+from skytemple.module.dungeon_graphics.chunk_surfaces import DungeonChunkSurfaceCache
 from skytemple.module.dungeon_graphics.controller.bg_menu import BgMenuController
 from skytemple.module.tiled_img.dialog_controller.chunk_editor import ChunkEditorController
 from skytemple_dtef import get_template_file
@@ -49,7 +49,7 @@ from skytemple.controller.main import MainController
 from skytemple.core.img_utils import pil_to_cairo_surface
 from skytemple.core.module_controller import AbstractController, SimpleController
 from skytemple.module.dungeon_graphics.dungeon_chunk_drawer import DungeonChunkCellDrawer
-from skytemple_files.common.util import lcm, chunks
+from skytemple_files.common.util import chunks
 from skytemple_files.graphics.dma.model import Dma, DmaExtraType, DmaType
 from skytemple_files.graphics.dpc.model import Dpc
 from skytemple_files.graphics.dpci.model import Dpci
@@ -359,46 +359,10 @@ class TilesetController(AbstractController):
         self._init_chunk_picker_icon_view()
 
     def _init_chunk_imgs(self):
-        """(Re)-draw the chunk images"""
-        self.chunks_surfaces = []
-
-        # For each chunk...
-        for chunk_idx in range(0, len(self.dpc.chunks)):
-            # For each frame of palette animation... ( applicable for this chunk )
-            pal_ani_frames = []
-            self.chunks_surfaces.append(pal_ani_frames)
-
-            chunk_data = self.dpc.chunks[chunk_idx]
-            chunk_image = self.dpc.single_chunk_to_pil(chunk_idx, self.dpci, self.dpl.palettes)
-            has_pal_ani = any(chunk.pal_idx >= 10 and self.dpla.has_for_palette(chunk.pal_idx - 10) for chunk in chunk_data)
-            if not has_pal_ani:
-                len_pal_ani = 1
-            else:
-                ani_pal_lengths = [self.dpla.get_frame_count_for_palette(x) for x in (0, 1) if self.dpla.has_for_palette(x)]
-                if len(ani_pal_lengths) < 2:
-                    len_pal_ani = ani_pal_lengths[0]
-                else:
-                    len_pal_ani = lcm(*ani_pal_lengths)
-
-            for pal_ani in range(0, len_pal_ani):
-                # We don't have animated tiles, so ani_frames just has one entry.
-                ani_frames = []
-                pal_ani_frames.append(ani_frames)
-                # Switch out the palette with that from the palette animation
-                if has_pal_ani:
-                    pal_for_frame = itertools.chain.from_iterable(self.dpla.apply_palette_animations(self.dpl.palettes, pal_ani))
-                    chunk_image.putpalette(pal_for_frame)
-                ani_frames.append(pil_to_cairo_surface(chunk_image.convert('RGBA')))
-
-        # TODO: No DPLA animations at different speeds supported at the moment
-        ani_pal11 = 9999
-        ani_pal12 = 9999
-        if self.dpla.has_for_palette(0):
-            ani_pal11 = self.dpla.get_duration_for_palette(0)
-        if self.dpla.has_for_palette(1):
-            ani_pal12 = self.dpla.get_duration_for_palette(1)
-
-        self.pal_ani_durations = min(ani_pal11, ani_pal12)
+        """(Re)-create the chunk images. They are rendered on demand."""
+        chunks_surfaces = DungeonChunkSurfaceCache(self.dpc, self.dpci, self.dpl, self.dpla)
+        self.chunks_surfaces = chunks_surfaces[0]
+        self.pal_ani_durations = chunks_surfaces.get_pal_ani_durations()
 
     def _init_rule_icon_views(self):
         """Fill the icon views for the three variations and the extra rules."""
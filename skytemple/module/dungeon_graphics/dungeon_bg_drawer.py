@@ -18,13 +18,15 @@
 
 from typing import List, Union, Iterable
 
-from gi.repository import GLib, Gtk
+from gi.repository import Gtk
 from gi.repository.GObject import ParamFlags
 from gi.repository.Gtk import Widget
 
 from skytemple.core.events.manager import EventManager
+from skytemple.core.frame_clock import FrameClock
 from skytemple.core.mapbg_util.drawer_plugin.grid import GridDrawerPlugin
 from skytemple.core.mapbg_util.drawer_plugin.selection import SelectionDrawerPlugin
+from skytemple.core.mapbg_util.visible_area import get_visible_cells
 from skytemple.module.tiled_img.animation_context import AnimationContext
 import cairo
 
@@ -47,6 +49,7 @@ class Drawer:
         :param chunks_surfaces: Bg controller format chunk surfaces
         """
         self.draw_area = draw_area
+        self.drawing_is_active = False
 
         self.reset(dbg, pal_ani_durations, chunks_surfaces)
 
@@ -75,8 +78,6 @@ class Drawer:
 
         self.scale = 1
 
-        self.drawing_is_active = False
-
     # noinspection PyAttributeOutsideInit
     def reset(self, dbg, pal_ani_durations, chunks_surfaces):
         if isinstance(dbg, Dbg):
@@ -85,6 +86,8 @@ class Drawer:
             self.mappings = []
 
         self.animation_context = AnimationContext([chunks_surfaces], 0, pal_ani_durations)
+        # The palette animation may have been added or removed.
+        self._update_frame_clock_subscription()
 
     def start(self):
         """Start drawing on the DrawingArea"""
@@ -92,10 +95,17 @@ class Drawer:
         if isinstance(self.draw_area, Gtk.DrawingArea):
             self.draw_area.connect('draw', self.draw)
         self.draw_area.queue_draw()
-        GLib.timeout_add(int(1000 / FPS), self._tick)
+        self._update_frame_clock_subscription()
 
     def stop(self):
         self.drawing_is_active = False
+        self._update_frame_clock_subscription()
+
+    def _update_frame_clock_subscription(self):
+        """Only receive ticks from the frame clock while drawing and if there is anything animated."""
+        FrameClock.instance().set_subscribed(
+            self, self.drawing_is_active and self.animation_context.is_animated, self.draw_area, self._tick, FPS
+        )
 
     def _tick(self):
         if self.draw_area is None:
@@ -104,8 +114,7 @@ class Drawer:
             # XXX: Gtk doesn't remove the widget on switch sometimes...
             self.draw_area.destroy()
             return False
-        self.animation_context.advance()
-        if EventManager.instance().get_if_main_window_has_fous():
+        if self.animation_context.advance() and EventManager.instance().get_if_main_window_has_fous():
             self.draw_area.queue_draw()
         return self.drawing_is_active
 
@@ -127,25 +136,25 @@ class Drawer:
         ctx.fill()
 
         # Layers
+        # Only the chunks inside the clip region are drawn
+        visible_chunks_x, visible_chunks_y = get_visible_cells(
+            ctx, chunk_width, chunk_height, self.width_in_chunks, self.height_in_chunks
+        )
         for chunks_at_frame in self.animation_context.current():
-            for i, chunk_at_pos in enumerate(self.mappings):
-                if 0 < chunk_at_pos < len(chunks_at_frame):
-                    chunk = chunks_at_frame[chunk_at_pos]
-                    ctx.set_source_surface(chunk, 0, 0)
-                    ctx.get_source().set_filter(cairo.Filter.NEAREST)
-                    ctx.paint()
-                if (i + 1) % self.width_in_chunks == 0:
-                    # Move to beginning of next line
-                    if do_translates:
-                        ctx.translate(-chunk_width * (self.width_in_chunks - 1), chunk_height)
-                else:
-                    # Move to next tile in line
-                    if do_translates:
-                        ctx.translate(chunk_width, 0)
-
-            # Move back to beginning
-            if do_translates:
-                ctx.translate(0, -chunk_height * self.height_in_chunks)
+            for y in visible_chunks_y:
+                for x in visible_chunks_x:
+                    i = y * self.width_in_chunks + x
+                    if i >= len(self.mappings):
+                        break
+                    chunk_at_pos = self.mappings[i]
+                    if 0 < chunk_at_pos < len(chunks_at_frame):
+                        chunk = chunks_at_frame[chunk_at_pos]
+                        if do_translates:
+                            ctx.set_source_surface(chunk, x * chunk_width, y * chunk_height)
+                        else:
+                            ctx.set_source_surface(chunk, 0, 0)
+                        ctx.get_source().set_filter(cairo.Filter.NEAREST)
+                        ctx.paint()
             break
 
         size_w, size_h = self.draw_area.get_size_request()
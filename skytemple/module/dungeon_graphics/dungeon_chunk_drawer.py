@@ -18,11 +18,12 @@
 
 from typing import List, Iterable
 
-from gi.repository import GLib, Gtk
+from gi.repository import Gtk
 from gi.repository.GObject import ParamFlags
 from gi.repository.Gtk import Widget
 
 from skytemple.core.events.manager import EventManager
+from skytemple.core.frame_clock import FrameClock
 from skytemple.module.tiled_img.animation_context import AnimationContext
 import cairo
 
@@ -45,13 +46,12 @@ class DungeonChunkDrawer:
         :param chunks_surfaces: Bg controller format chunk surfaces
         """
         self.draw_area = draw_area
+        self.drawing_is_active = False
 
         self.reset(pal_ani_durations, chunks_surfaces)
 
         self.scale = 2
 
-        self.drawing_is_active = False
-
     # noinspection PyAttributeOutsideInit
     def reset(self, pal_ani_durations, chunks_surfaces):
         # Chunk to draw
@@ -61,7 +61,9 @@ class DungeonChunkDrawer:
 
     # noinspection PyAttributeOutsideInit
     def reset_surfaces(self, chunks_surfaces):
-        self.animation_context = AnimationContext([chunks_surfaces], 1, self.pal_ani_durations)
+        self.animation_context = AnimationContext([chunks_surfaces], 0, self.pal_ani_durations)
+        # The palette animation may have been added or removed.
+        self._update_frame_clock_subscription()
 
     def start(self):
         """Start drawing on the DrawingArea"""
@@ -69,10 +71,17 @@ class DungeonChunkDrawer:
         if isinstance(self.draw_area, Gtk.DrawingArea):
             self.draw_area.connect('draw', self.draw)
         self.draw_area.queue_draw()
-        GLib.timeout_add(int(1000 / FPS), self._tick)
+        self._update_frame_clock_subscription()
 
     def stop(self):
         self.drawing_is_active = False
+        self._update_frame_clock_subscription()
+
+    def _update_frame_clock_subscription(self):
+        """Only receive ticks from the frame clock while drawing and if there is anything animated."""
+        FrameClock.instance().set_subscribed(
+            self, self.drawing_is_active and self.animation_context.is_animated, self.draw_area, self._tick, FPS
+        )
 
     def _tick(self):
         if self.draw_area is None:
@@ -81,8 +90,7 @@ class DungeonChunkDrawer:
             # XXX: Gtk doesn't remove the widget on switch sometimes...
             self.draw_area.destroy()
             return False
-        self.animation_context.advance()
-        if EventManager.instance().get_if_main_window_has_fous():
+        if self.animation_context.advance() and EventManager.instance().get_if_main_window_has_fous():
             self.draw_area.queue_draw()
         return self.drawing_is_active
 
@@ -45,6 +45,7 @@ from skytemple.core.error_handler import display_error
 from skytemple.controller.main import MainController
 from skytemple.core.message_dialog import SkyTempleMessageDialog
 from skytemple.core.module_controller import AbstractController
+from skytemple.core.name_stores import NAME_KIND_MONSTER_BASE
 from skytemple.core.string_provider import StringType
 from skytemple_files.common.util import open_utf8
 from skytemple.module.lists.controller.base import PATTERN_MD_ENTRY
@@ -76,7 +77,6 @@ class AnimationsController(AbstractController):
             return stack
         self.animations = self.module.get_animations()
 
-        self._ent_names: Dict[str, str] = dict()
         self._init_monster_store()
         self._init_combos()
         self._init_trees()
@@ -179,16 +179,9 @@ class AnimationsController(AbstractController):
         editable.set_completion(self.builder.get_object('completion_entities'))
 
     def _init_monster_store(self):
-        monster_md = self.module.get_monster_md()
-        monster_store: Gtk.ListStore = self.builder.get_object('monster_store')
-        for idx, entry in enumerate(monster_md.entries):
-            midx = entry.md_index_base
-            if self.module.project.is_patch_applied("ExpandPokeList"):
-                midx = entry.entid
-            if not midx in self._ent_names:
-                name = self.module.project.get_string_provider().get_value(StringType.POKEMON_NAMES, entry.md_index_base)
-                self._ent_names[midx] = f'{name} (${midx:04})'
-                monster_store.append([self._ent_names[midx]])
+        monster_name_store = self.module.project.get_name_stores().get(NAME_KIND_MONSTER_BASE, '{name} (${id:04})')
+        self._ent_names: Dict[int, str] = monster_name_store.names
+        self.builder.get_object('completion_entities').set_model(monster_name_store.store)
     
     def set_tree_attr(self, path, text, store_name, attr_name, attr_pos):
         try:
@@ -123,6 +123,6 @@ class RankListController(AbstractController):
     def _init_item_store(self):
         item_store: Gtk.ListStore = self.builder.get_object('item_store')
         sp = self.module.project.get_string_provider()
-        for i, name in enumerate(sp.get_all(StringType.ITEM_NAMES)):
+        for i, name in enumerate(sp.get_all_view(StringType.ITEM_NAMES)):
             self._item_names[i] = f'{name} (#{i:03})'
             item_store.append([self._item_names[i]])
@@ -0,0 +1,155 @@
+#  Copyright 2020-2021 Capypara and the SkyTemple Contributors
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import itertools
+from typing import List, Optional, Dict, Hashable, Sequence, Tuple
+
+from PIL import Image
+
+from skytemple.module.tiled_img.animation_context import AnimationTimeline, AnimationClock, CellClocks
+from skytemple.module.tiled_img.indexed_surfaces import IndexedSurfaceCache
+from skytemple_files.graphics.bma import MASK_PAL
+from skytemple_files.graphics.bpa.protocol import BpaProtocol
+from skytemple_files.graphics.bpc.protocol import BpcProtocol
+from skytemple_files.graphics.bpl.protocol import BplProtocol
+
+# Color indices that are transparent in chunk images (black in the mask palette).
+MASK_PAL_TRANSPARENT = [i for i in range(0, len(MASK_PAL) // 3) if sum(MASK_PAL[i * 3:i * 3 + 3]) < 3 * 128]
+
+
+class ChunkSurfaceCache(IndexedSurfaceCache):
+    """
+    Renders the cairo surfaces for all chunks of a map background on demand and caches them.
+
+    Behaves like the nested list format expected by the map background drawers:
+    chunks_surfaces[layer_number][chunk_idx][palette_animation_frame][frame]
+    """
+    transparent_indices = MASK_PAL_TRANSPARENT
+
+    def __init__(self, bpc: BpcProtocol, bpl: BplProtocol, bpas: List[Optional[BpaProtocol]]):
+        super().__init__()
+        self._bpc = bpc
+        self._bpl = bpl
+        self._bpas = bpas
+        if bpc.number_of_layers > 1:
+            self._layer_idxs_bpc = [1, 0]
+        else:
+            self._layer_idxs_bpc = [0]
+
+    def number_of_collections(self) -> int:
+        return len(self._layer_idxs_bpc)
+
+    def number_of_cells(self, layer: int) -> int:
+        return self._bpc.layers[self._layer_idxs_bpc[layer]].chunk_tilemap_len
+
+    def _render_images(self, layer: int, chunk: int) -> List[Image.Image]:
+        return self._bpc.single_chunk_animated_to_pil(
+            self._layer_idxs_bpc[layer], chunk, self._bpl.palettes, self._bpas
+        )
+
+    def _count_pal_ani_frames(self, layer: int, chunk: int) -> int:
+        # Each animated palette used by the chunk runs at its own speed,
+        # so there is one frame for each combination of their frames.
+        number_of_frames = 0
+        for pal_idx in self._get_animated_palettes(layer, chunk):
+            number_of_frames = max(1, number_of_frames) * self._bpl.animation_specs[pal_idx].number_of_frames
+        return number_of_frames
+
+    def _get_animated_palettes(self, layer: int, chunk: int) -> Tuple[int, ...]:
+        """The indices of the animated palettes used by the chunk, in ascending order."""
+        chunk_data = self._bpc.get_chunk(self._layer_idxs_bpc[layer], chunk)
+        return tuple(sorted(
+            pal_idx for pal_idx in set(tile.pal_idx for tile in chunk_data)
+            if self._bpl.is_palette_affected_by_animation(pal_idx)
+        ))
+
+    def _get_palette_key(self, layer: int, chunk: int, pal_frame: Optional[int]) -> Hashable:
+        if pal_frame is None:
+            return None
+        # pal_frame is a mixed radix number with one digit (the frame) per animated palette, see AnimationTimeline.
+        pal_frames = []
+        for pal_idx in reversed(self._get_animated_palettes(layer, chunk)):
+            pal_frame, frame = divmod(pal_frame, self._bpl.animation_specs[pal_idx].number_of_frames)
+            pal_frames.append((pal_idx, frame))
+        return tuple(reversed(pal_frames))
+
+    def _build_palette(self, key: Optional[Tuple[Tuple[int, int], ...]]) -> Sequence[int]:  # type: ignore
+        if key is None:
+            return list(itertools.chain.from_iterable(self._bpl.palettes))
+        return self._get_palettes_at_frames(dict(key))
+
+    def create_animation_timeline(self) -> AnimationTimeline:
+        """
+        Returns a timeline with one clock for each BPA and each animated palette, using their own frame durations.
+        Chunks are driven by the clocks of the BPA and all animated palettes they use.
+
+        The frames of a chunk that uses multiple BPAs are rendered with all BPAs advancing in lockstep,
+        so those chunks follow the clock of the BPA with the most frames.
+        """
+        bpa_clocks = {}
+        for bpa_idx, bpa in enumerate(self._bpas):
+            if bpa is not None and bpa.number_of_frames > 0:
+                if len(bpa.frame_info) > 0:
+                    bpa_clocks[bpa_idx] = AnimationClock([info.duration_per_frame for info in bpa.frame_info])
+                else:
+                    bpa_clocks[bpa_idx] = AnimationClock([9999] * bpa.number_of_frames)
+        pal_clocks = {}
+        if self._bpl.has_palette_animation:
+            for pal_idx, spec in enumerate(self._bpl.animation_specs):
+                if spec.number_of_frames > 0:
+                    pal_clocks[pal_idx] = AnimationClock([spec.duration_per_frame] * spec.number_of_frames)
+        return AnimationTimeline(bpa_clocks, pal_clocks, self._get_chunk_clocks)
+
+    def _get_chunk_clocks(self, layer: int, chunk: int) -> CellClocks:
+        bpc_layer = self._layer_idxs_bpc[layer]
+        ldata = self._bpc.layers[bpc_layer]
+        # Tile slots of the BPAs of this layer, following the BPC tiles
+        bpa_ranges = []
+        start = len(ldata.tiles)
+        for i, number_tiles in enumerate(ldata.bpas):
+            bpa_idx = bpc_layer * 4 + i
+            if bpa_idx < len(self._bpas) and self._bpas[bpa_idx] is not None:
+                bpa_ranges.append((range(start, start + number_tiles), bpa_idx))
+                start += number_tiles
+        used_bpas = set()
+        for tile in self._bpc.get_chunk(bpc_layer, chunk):
+            for tile_range, bpa_idx in bpa_ranges:
+                if tile.idx in tile_range:
+                    used_bpas.add(bpa_idx)
+        bpa_clock = None
+        used_bpas = set(idx for idx in used_bpas if self._bpas[idx].number_of_frames > 0)  # type: ignore
+        if len(used_bpas) > 0:
+            bpa_clock = max(used_bpas, key=lambda idx: self._bpas[idx].number_of_frames)  # type: ignore
+        # The palette clocks are in the same order as the digits of the palette animation frames of the chunk.
+        return bpa_clock, self._get_animated_palettes(layer, chunk)
+
+    def get_palette(self, pal_ani_counters: Dict[int, int]) -> List[int]:
+        """
+        Returns all palettes (flattened, as for Image.putpalette), with each animated palette in
+        pal_ani_counters (palette index -> frame counter of its animation) at its current animation frame.
+        """
+        return self._get_palettes_at_frames({
+            pal_idx: counter % self._bpl.animation_specs[pal_idx].number_of_frames
+            for pal_idx, counter in pal_ani_counters.items()
+        })
+
+    def _get_palettes_at_frames(self, pal_frames: Dict[int, int]) -> List[int]:
+        """Returns all palettes (flattened), with the palettes in pal_frames at the given animation frame."""
+        palettes = list(self._bpl.palettes)
+        for pal_idx, pal_frame in pal_frames.items():
+            # Switch out the palette with that from the palette animation
+            palettes[pal_idx] = self._bpl.apply_palette_animations(pal_frame)[pal_idx]
+        return list(itertools.chain.from_iterable(palettes))
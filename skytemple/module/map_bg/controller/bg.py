@@ -15,8 +15,7 @@
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
 
-import itertools
-from typing import TYPE_CHECKING, Optional, Iterable, List
+from typing import TYPE_CHECKING, Optional, List
 from copy import deepcopy
 
 import cairo
@@ -26,21 +25,21 @@ from gi.repository.GObject import TYPE_PYOBJECT
 from gi.repository.GdkPixbuf import Pixbuf, Colorspace
 
 from skytemple.controller.main import MainController
-from skytemple.core.img_utils import pil_to_cairo_surface
 from skytemple.core.mapbg_util.map_tileset_overlay import MapTilesetOverlay
 from skytemple.core.message_dialog import SkyTempleMessageDialog
 from skytemple.core.module_controller import AbstractController
 from skytemple.core.open_request import OpenRequest, REQUEST_TYPE_SCENE
+from skytemple.module.map_bg.chunk_surfaces import ChunkSurfaceCache
 from skytemple.module.map_bg.controller.bg_menu import BgMenuController
 from skytemple.module.map_bg.drawer import Drawer, DrawerCellRenderer, DrawerInteraction
+from skytemple.module.map_bg.palette_check import find_invalid_palette_uses, InvalidPaletteUse
+from skytemple.module.tiled_img.animation_context import AnimationTimeline
 from skytemple_files.common.ppmdu_config.script_data import Pmd2ScriptLevelMapType
 from skytemple_files.common.types.file_types import FileType
 from skytemple_files.graphics.bg_list_dat import BMA_EXT, BPC_EXT, BPL_EXT, BPA_EXT, DIR
-from skytemple_files.graphics.bma import MASK_PAL
 from skytemple_files.graphics.bma.protocol import BmaProtocol
 from skytemple_files.graphics.bpc import BPC_TILE_DIM
-from skytemple_files.graphics.bpl import BPL_NORMAL_MAX_PAL
-from skytemple_files.common.i18n_util import _
+from skytemple_files.common.i18n_util import _, f
 from skytemple_files.hardcoded.ground_dungeon_tilesets import resolve_mapping_for_level
 
 if TYPE_CHECKING:
@@ -127,11 +126,15 @@ class BgController(AbstractController):
         self.bpc = module.get_bpc(item_id)
         self.bpas = module.get_bpas(item_id)
         self.first_cursor_pos = (0, 0)
+        self.weird_palette = False
+        self.invalid_palette_uses: List[InvalidPaletteUse] = []
+        self._warning_palette_label_text: Optional[str] = None
         self.last_bma: Optional[BmaProtocol] = None
 
-        # Cairo surfaces for each tile in each layer for each frame
+        # Cairo surfaces for each tile in each layer for each frame, rendered on demand
         # chunks_surfaces[layer_number][chunk_idx][palette_animation_frame][frame]
-        self.chunks_surfaces: List[Iterable[Iterable[List[cairo.Surface]]]] = []
+        self.chunks_surfaces: Optional[ChunkSurfaceCache] = None
+        self.animation_timeline: Optional[AnimationTimeline] = None
         self.bpa_durations = 0
 
         self.drawer: Optional[Drawer] = None
@@ -171,13 +174,6 @@ class BgController(AbstractController):
         self._refresh_metadata()
         self._init_rest_room_note()
         self.builder.connect_signals(self)
-        try:
-            # Invalidate SSA scene cache for this BG
-            # TODO: This is obviously very ugly coupling...
-            from skytemple.module.script.controller.ssa import SsaController
-            SsaController.map_bg_surface_cache = (None, )
-        except ImportError:
-            pass
         if self._was_asset_copied:
                 md = SkyTempleMessageDialog(MainController.window(),
                                             Gtk.DialogFlags.DESTROY_WITH_PARENT, Gtk.MessageType.INFO,
@@ -202,7 +198,10 @@ class BgController(AbstractController):
         self.bpl = None
         self.bpc = None
         self.bpas = None
+        if self.chunks_surfaces:
+            self.chunks_surfaces.stop_background_fill()
         self.chunks_surfaces = None
+        self.animation_timeline = None
         self.bpa_durations = None
         if self.drawer:
             self.drawer.unload()
@@ -494,73 +493,54 @@ class BgController(AbstractController):
     def set_warning_palette(self):
         if self.builder:
             self.builder.get_object('editor_warning_palette').set_revealed(self.weird_palette)
+            label: Gtk.Label = self.builder.get_object('editor_warning_palette_label')
+            if self._warning_palette_label_text is None:
+                self._warning_palette_label_text = label.get_text()
+            text = self._warning_palette_label_text
+            if self.weird_palette:
+                text += '\n' + self._format_invalid_palette_uses()
+            label.set_text(text)
+
+    def _format_invalid_palette_uses(self, max_lines=8) -> str:
+        lines = []
+        for use in self.invalid_palette_uses[:max_lines]:
+            layer = use.layer + 1
+            chunk_idx = use.chunk_idx
+            tile_idx = use.tile_idx
+            pal_idx = use.pal_idx
+            lines.append(f(_("Layer {layer}, Chunk {chunk_idx}, Tile {tile_idx}: Palette {pal_idx}")))
+        if len(self.invalid_palette_uses) > max_lines:
+            more = len(self.invalid_palette_uses) - max_lines
+            lines.append(f(_("...and {more} more.")))
+        return '\n'.join(lines)
         
     def _init_chunk_imgs(self):
         """(Re)-draw the chunk images"""
+        if self.chunks_surfaces:
+            self.chunks_surfaces.stop_background_fill()
+        # The surfaces are rendered when first drawn, the chunks used by the map are rendered in the
+        # background first, then all others.
+        self.chunks_surfaces = ChunkSurfaceCache(self.bpc, self.bpl, self.bpas)
+        self.chunks_surfaces.fill_in_background([self.bma.layer0, self.bma.layer1 or []])
 
-        # Set the weird palette warning to false
-        self.weird_palette = False
-        
-        if self.bpc.number_of_layers > 1:
-            layer_idxs_bpc = [1, 0]
-        else:
-            layer_idxs_bpc = [0]
-
-        self.chunks_surfaces = []
-
-        # For each layer...
-        for layer_idx, layer_idx_bpc in enumerate(layer_idxs_bpc):
-            chunks_current_layer = []
-            self.chunks_surfaces.append(chunks_current_layer)
-            # For each chunk...
-            for chunk_idx in range(0, self.bpc.layers[layer_idx_bpc].chunk_tilemap_len):
-                # For each frame of palette animation... ( applicable for this chunk )
-                pal_ani_frames = []
-                chunks_current_layer.append(pal_ani_frames)
-
-                chunk_data = self.bpc.get_chunk(layer_idx_bpc, chunk_idx)
-                chunk_images = self.bpc.single_chunk_animated_to_pil(layer_idx_bpc, chunk_idx, self.bpl.palettes, self.bpas)
-                if not self.weird_palette:
-                    for x in chunk_images:
-                        for n in x.tobytes("raw", "P"):
-                            n//=16
-                            if n>=self.bpl.number_palettes or n>=BPL_NORMAL_MAX_PAL:
-                                # If one chunk uses weird palette values, display the warning
-                                self.weird_palette = True
-                                break
-                        if self.weird_palette:break 
-                has_pal_ani = any(self.bpl.is_palette_affected_by_animation(chunk.pal_idx) for chunk in chunk_data)
-                len_pal_ani = len(self.bpl.animation_palette) if has_pal_ani else 1
-
-                for pal_ani in range(0, len_pal_ani):
-                    # For each frame of tile animation...
-                    bpa_ani_frames = []
-                    pal_ani_frames.append(bpa_ani_frames)
-                    for img in chunk_images:
-                        # Switch out the palette with that from the palette animation
-                        if has_pal_ani:
-                            pal_for_frame = itertools.chain.from_iterable(self.bpl.apply_palette_animations(pal_ani))
-                            img.putpalette(pal_for_frame)
-                        # Remove alpha first
-                        img_mask = img.copy()
-                        img_mask.putpalette(MASK_PAL)
-                        img_mask = img_mask.convert('1')
-                        img = img.convert('RGBA')
-                        img.putalpha(img_mask)
-                        bpa_ani_frames.append(pil_to_cairo_surface(img))
-
-            # TODO: No BPAs at different speeds supported at the moment
-            self.bpa_durations = 0
-            for bpa in self.bpas:
-                if bpa is not None:
-                    single_bpa_duration = max(info.duration_per_frame for info in bpa.frame_info) if len(bpa.frame_info) > 0 else 9999
-                    if single_bpa_duration > self.bpa_durations:
-                        self.bpa_durations = single_bpa_duration
-
-            # TODO: No BPL animations at different speeds supported at the moment
-            self.pal_ani_durations = 0
-            if self.bpl.has_palette_animation:
-                self.pal_ani_durations = max(spec.duration_per_frame for spec in self.bpl.animation_specs)
+        # If one chunk uses weird palette values, display the warning
+        self.invalid_palette_uses = find_invalid_palette_uses(self.bpc, self.bpl)
+        self.weird_palette = len(self.invalid_palette_uses) > 0
+
+        # The map drawers animate each BPA and palette at their own speed
+        self.animation_timeline = self.chunks_surfaces.create_animation_timeline()
+
+        # The tiled image editors only support one speed for all BPAs and all palette animations
+        self.bpa_durations = 0
+        for bpa in self.bpas:
+            if bpa is not None:
+                single_bpa_duration = max(info.duration_per_frame for info in bpa.frame_info) if len(bpa.frame_info) > 0 else 9999
+                if single_bpa_duration > self.bpa_durations:
+                    self.bpa_durations = single_bpa_duration
+
+        self.pal_ani_durations = 0
+        if self.bpl.has_palette_animation:
+            self.pal_ani_durations = max(spec.duration_per_frame for spec in self.bpl.animation_specs)
         self.set_warning_palette()
 
     def _init_drawer(self):
@@ -592,7 +572,8 @@ class BgController(AbstractController):
             self.bma.map_height_chunks * self.bma.tiling_height * BPC_TILE_DIM
         )
 
-        self.drawer = Drawer(self.bg_draw, self.bma, self.bpa_durations, self.pal_ani_durations, self.chunks_surfaces)
+        self.drawer = Drawer(self.bg_draw, self.bma, self.bpa_durations, self.pal_ani_durations, self.chunks_surfaces,
+                             self.animation_timeline)
         if self._tileset_drawer_overlay:
             self.drawer.add_overlay(self._tileset_drawer_overlay)
         self.drawer.start()
@@ -634,7 +615,7 @@ class BgController(AbstractController):
         icon_view.set_selection_mode(Gtk.SelectionMode.BROWSE)
         self.current_icon_view_renderer = DrawerCellRenderer(icon_view, layer_number,
                                                              self.bpa_durations, self.pal_ani_durations,
-                                                             self.chunks_surfaces)
+                                                             self.chunks_surfaces, self.animation_timeline)
         store = Gtk.ListStore(int)
         icon_view.set_model(store)
         icon_view.pack_start(self.current_icon_view_renderer, True)
@@ -803,7 +784,8 @@ class BgController(AbstractController):
             self.current_icon_view_renderer.stop()
         self.bpas = self.module.get_bpas(self.item_id)
         self._init_chunk_imgs()
-        self.drawer.reset(self.bma, self.bpa_durations, self.pal_ani_durations, self.chunks_surfaces)
+        self.drawer.reset(self.bma, self.bpa_durations, self.pal_ani_durations, self.chunks_surfaces,
+                          self.animation_timeline)
         self._init_tab(self.notebook.get_nth_page(self.notebook.get_current_page()))
         self._refresh_metadata()
 
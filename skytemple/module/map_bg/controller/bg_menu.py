@@ -20,9 +20,11 @@ import os
 import re
 import sys
 from collections import OrderedDict
+from copy import deepcopy
 from functools import partial
-from typing import TYPE_CHECKING, List, Optional, Tuple
+from typing import TYPE_CHECKING, List, Optional, Tuple, Callable
 
+from skytemple.core.background_task import run_in_background, TaskProgress
 from skytemple.core.error_handler import display_error
 from skytemple.core.message_dialog import SkyTempleMessageDialog
 from skytemple.module.map_bg.chunk_editor_data_provider.tile_graphics_provider import MapBgStaticTileProvider, \
@@ -31,6 +33,7 @@ from skytemple.module.map_bg.chunk_editor_data_provider.tile_palettes_provider i
 from skytemple_files.common.protocol import TilemapEntryProtocol
 from skytemple_files.common.types.file_types import FileType
 from skytemple_files.graphics.bg_list_dat import BPA_EXT, DIR
+from skytemple_files.graphics.bma.protocol import BmaProtocol
 from skytemple_files.graphics.bpa.protocol import BpaProtocol
 from skytemple_files.graphics.bpc.protocol import BpcProtocol
 from skytemple_files.graphics.bpl.protocol import BplProtocol
@@ -43,6 +46,7 @@ from natsort import ns, natsorted
 
 from skytemple.controller.main import MainController
 from skytemple.core.ui_utils import add_dialog_gif_filter, add_dialog_png_filter
+from skytemple.module.map_bg.gif_export import export_map_gif
 from skytemple.module.tiled_img.dialog_controller.chunk_editor import ChunkEditorController
 from skytemple.module.map_bg.controller.bg_menu_dialogs.map_width_height import on_map_width_chunks_changed, \
     on_map_height_chunks_changed, on_map_wh_link_state_set
@@ -52,6 +56,10 @@ if TYPE_CHECKING:
     from skytemple.module.map_bg.controller.bg import BgController
 
 logger = logging.getLogger(__name__)
+# Attributes of the models that are changed by map, chunk and tile imports.
+IMPORT_BMA_ATTRS = ('number_of_layers', 'layer0', 'layer1')
+IMPORT_BPC_ATTRS = ('number_of_layers', 'layers')
+IMPORT_BPL_ATTRS = ('number_palettes', 'palettes', 'animation_specs')
 
 
 class BgMenuController:
@@ -209,25 +217,18 @@ class BgMenuController:
 
         response = dialog.run()
         fn = dialog.get_filename()
-        if '.' not in fn:
-            fn += '.gif'
         dialog.destroy()
 
-        duration = 1000
-        non_none_bpas = [b for b in self.parent.bpas if b is not None]
-        if len(non_none_bpas) > 0:
-            # Assuming the game runs 60 FPS.
-            duration = round(1000 / 60 * non_none_bpas[0].frame_info[0].duration_per_frame)
-
         if response == Gtk.ResponseType.ACCEPT:
-            frames = self.parent.bma.to_pil(self.parent.bpc, self.parent.bpl, self.parent.bpas, False, False)
-            frames[0].save(
-                fn,
-                save_all=True,
-                append_images=frames[1:],
-                duration=duration,
-                loop=0,
-                optimize=False
+            if '.' not in fn:
+                fn += '.gif'
+            # The export runs in another thread, it must not share the models with the editor.
+            bma, bpc, bpl, bpas = deepcopy((self.parent.bma, self.parent.bpc, self.parent.bpl, self.parent.bpas))
+            run_in_background(
+                MainController.window(), _("Exporting GIF..."),
+                lambda progress: export_map_gif(fn, bma, bpc, bpl, bpas, progress),
+                lambda result: None,
+                error_message=_("Error exporting the map as GIF.")
             )
 
     def on_men_map_export_activate(self):
@@ -280,31 +281,22 @@ class BgMenuController:
         dialog.hide()
 
         if resp == ResponseType.OK:
-            try:
-                img1_path = map_import_layer1_file.get_filename()
-                img2_path = map_import_layer2_file.get_filename()
-                palettes_from_lower_layer = 16  # self.parent.builder.get_object('dialog_map_import_palette_config').get_value()
-                if self.parent.bma.number_of_layers < 2 and img1_path is not None:
-                    with open(img1_path, 'rb') as f:
-                        self.parent.bma.from_pil(self.parent.bpc, self.parent.bpl, Image.open(f), None, True)
-                elif img1_path is not None and img2_path is None:
-                    with open(img1_path, 'rb') as f1:
-                        self.parent.bma.from_pil(self.parent.bpc, self.parent.bpl, Image.open(f1), None, True)
-                elif img1_path is None and img2_path is not None:
-                    with open(img2_path, 'rb') as f2:
-                        self.parent.bma.from_pil(self.parent.bpc, self.parent.bpl, None, Image.open(f2), True)
-                elif img1_path is not None and img2_path is not None:
-                    with open(img1_path, 'rb') as f1:
-                        with open(img2_path, 'rb') as f2:
-                            self.parent.bma.from_pil(self.parent.bpc, self.parent.bpl, Image.open(f1), Image.open(f2),
-                                                     True, how_many_palettes_lower_layer=int(palettes_from_lower_layer))
-            except Exception as err:
-                display_error(
-                    sys.exc_info(),
-                    str(err)
-                )
-            self.parent.reload_all()
-            self.parent.mark_as_modified()
+            img1_path = map_import_layer1_file.get_filename()
+            img2_path = map_import_layer2_file.get_filename() if self.parent.bma.number_of_layers > 1 else None
+            palettes_from_lower_layer = 16  # self.parent.builder.get_object('dialog_map_import_palette_config').get_value()
+            if img1_path is None and img2_path is None:
+                return
+
+            def import_map(bma: BmaProtocol, bpc: BpcProtocol, bpl: BplProtocol, progress: TaskProgress):
+                progress.update(0, _("Reading images..."))
+                lower_img = _open_image(img1_path) if img1_path is not None else None
+                upper_img = _open_image(img2_path) if img2_path is not None else None
+                progress.check_cancelled()
+                progress.update(0.1, _("Importing map..."))
+                bma.from_pil(bpc, bpl, lower_img, upper_img, True,
+                             how_many_palettes_lower_layer=int(palettes_from_lower_layer))
+
+            self._import_in_background(_("Importing map..."), import_map)
 
     def on_men_chunks_layer1_edit_activate(self):
         # This is controlled by a separate controller
@@ -777,17 +769,24 @@ class BgMenuController:
                     md.run()
                     md.destroy()
                 else:
-                    with open(chunks_import_file.get_filename(), 'rb') as f:
-                        palettes = self.parent.bpc.pil_to_chunks(layer, Image.open(f))
-                        if chunks_import_palettes.get_active():
-                            self.parent.bpl.palettes = palettes
+                    fn = chunks_import_file.get_filename()
+                    import_palettes = chunks_import_palettes.get_active()
+
+                    def import_chunks(bma: BmaProtocol, bpc: BpcProtocol, bpl: BplProtocol, progress: TaskProgress):
+                        progress.update(0, _("Reading image..."))
+                        img = _open_image(fn)
+                        progress.check_cancelled()
+                        progress.update(0.1, _("Importing chunks..."))
+                        palettes = bpc.pil_to_chunks(layer, img)
+                        if import_palettes:
+                            bpl.palettes = palettes
+
+                    self._import_in_background(_("Importing chunks..."), import_chunks)
             except Exception as err:
                 display_error(
                     sys.exc_info(),
                     str(err)
                 )
-            self.parent.reload_all()
-            self.parent.mark_as_modified()
 
     def _export_tiles(self, layer):
         dialog: Gtk.Dialog = self.parent.builder.get_object('dialog_tiles_export')
@@ -839,15 +838,49 @@ class BgMenuController:
                     md.run()
                     md.destroy()
                 else:
-                    with open(tiles_import_file.get_filename(), 'rb') as f:
-                        self.parent.bpc.pil_to_tiles(layer, Image.open(f))
+                    fn = tiles_import_file.get_filename()
+
+                    def import_tiles(bma: BmaProtocol, bpc: BpcProtocol, bpl: BplProtocol, progress: TaskProgress):
+                        progress.update(0, _("Reading image..."))
+                        img = _open_image(fn)
+                        progress.check_cancelled()
+                        progress.update(0.1, _("Importing tiles..."))
+                        bpc.pil_to_tiles(layer, img)
+
+                    self._import_in_background(_("Importing tiles..."), import_tiles)
             except Exception as err:
                 display_error(
                     sys.exc_info(),
                     str(err)
                 )
-            self.parent.reload_all()
-            self.parent.mark_as_modified()
+
+    def _import_in_background(
+            self, title: str, import_fn: Callable[[BmaProtocol, BpcProtocol, BplProtocol, TaskProgress], None]
+    ):
+        """
+        Runs import_fn in a worker thread, with copies of the BMA, BPC and BPL. Once it is done, the imported data
+        is applied to the models of the map all at once. If the import fails or is cancelled, the map is not changed.
+        """
+        models = deepcopy((self.parent.bma, self.parent.bpc, self.parent.bpl))
+
+        def worker(progress: TaskProgress) -> Tuple[BmaProtocol, BpcProtocol, BplProtocol]:
+            import_fn(*models, progress)
+            # The import itself can not be interrupted, but its result can still be discarded.
+            progress.check_cancelled()
+            progress.update(1.0)
+            return models
+
+        run_in_background(MainController.window(), title, worker, self._apply_import)
+
+    def _apply_import(self, models: Tuple[BmaProtocol, BpcProtocol, BplProtocol]):
+        bma, bpc, bpl = models
+        for target, source, attrs in ((self.parent.bma, bma, IMPORT_BMA_ATTRS),
+                                      (self.parent.bpc, bpc, IMPORT_BPC_ATTRS),
+                                      (self.parent.bpl, bpl, IMPORT_BPL_ATTRS)):
+            for attr in attrs:
+                setattr(target, attr, getattr(source, attr))
+        self.parent.reload_all()
+        self.parent.mark_as_modified()
 
     def _no_second_layer(self):
         md = SkyTempleMessageDialog(MainController.window(),
@@ -878,3 +911,10 @@ class BgMenuController:
                 animated_tiles.append(MapBgAnimatedTileProvider(bpa))
 
         return bpc.layers[bpc_layer_to_use].tilemap, static_tiles, animated_tiles, palettes
+
+
+def _open_image(path: str) -> Image.Image:
+    with open(path, 'rb') as f:
+        img = Image.open(f)
+        img.load()
+    return img
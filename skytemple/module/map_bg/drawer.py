@@ -16,18 +16,21 @@
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
 
+import math
 from enum import Enum, auto
-from typing import List, Union, Iterable, Optional
+from typing import List, Union, Iterable, Optional, Dict, Sequence, Callable
 
-from gi.repository import GLib, Gtk
+from gi.repository import Gtk
 from gi.repository.GObject import ParamFlags
 from gi.repository.Gtk import Widget
 
 from skytemple.core.events.manager import EventManager
+from skytemple.core.frame_clock import FrameClock
 from skytemple.core.mapbg_util.drawer_plugin.grid import GridDrawerPlugin
 from skytemple.core.mapbg_util.drawer_plugin.selection import SelectionDrawerPlugin
+from skytemple.core.mapbg_util.visible_area import get_visible_cells
 from skytemple.core.mapbg_util.map_tileset_overlay import MapTilesetOverlay
-from skytemple.module.tiled_img.animation_context import AnimationContext
+from skytemple.module.tiled_img.animation_context import AnimationContext, AnimationTimeline
 from skytemple_files.graphics.bma.protocol import BmaProtocol
 import cairo
 
@@ -42,11 +45,119 @@ class DrawerInteraction(Enum):
     DAT = auto()
 
 
+class StaticLayerCache:
+    """
+    An offscreen surface with all chunks of one layer pre-composited, that don't have any animation frames.
+    The positions of animated chunks are collected in `animated` instead, those have to be drawn every frame.
+    The cache keeps a copy of the mappings it was built with and only re-renders positions that changed.
+    """
+    def __init__(self, width_in_chunks: int, height_in_chunks: int, chunk_width: int, chunk_height: int):
+        self.width_in_chunks = width_in_chunks
+        self.height_in_chunks = height_in_chunks
+        self.chunk_width = chunk_width
+        self.chunk_height = chunk_height
+        self.surface = cairo.ImageSurface(
+            cairo.FORMAT_ARGB32, width_in_chunks * chunk_width, height_in_chunks * chunk_height
+        )
+        self.mappings: List[int] = []
+        # position in mappings -> chunk index
+        self.animated: Dict[int, int] = {}
+
+    def update(self, mappings: Sequence[int], chunks: Sequence[Sequence[Sequence[cairo.Surface]]]):
+        """Re-render all positions where the chunk changed since the last update."""
+        if self.mappings == mappings:
+            return
+        ctx = cairo.Context(self.surface)
+        for i, chunk_at_pos in enumerate(mappings):
+            if i < len(self.mappings) and self.mappings[i] == chunk_at_pos:
+                continue
+            x, y = self.position(i)
+            ctx.set_operator(cairo.OPERATOR_CLEAR)
+            ctx.rectangle(x, y, self.chunk_width, self.chunk_height)
+            ctx.fill()
+            ctx.set_operator(cairo.OPERATOR_OVER)
+            self.animated.pop(i, None)
+            if 0 < chunk_at_pos < len(chunks):
+                pal_ani_frames = chunks[chunk_at_pos]
+                if len(pal_ani_frames) > 1 or len(pal_ani_frames[0]) > 1:
+                    self.animated[i] = chunk_at_pos
+                else:
+                    ctx.set_source_surface(pal_ani_frames[0][0], x, y)
+                    ctx.paint()
+        self.mappings = list(mappings)
+
+    def position(self, i: int):
+        return (i % self.width_in_chunks) * self.chunk_width, (i // self.width_in_chunks) * self.chunk_height
+
+
+def render_collision_tile(ctx: cairo.Context, x: int, y: int, col: int):
+    if col:
+        ctx.rectangle(x, y, BPC_TILE_DIM, BPC_TILE_DIM)
+        ctx.fill()
+
+
+def render_data_tile(ctx: cairo.Context, x: int, y: int, dat: int):
+    if dat > 0:
+        ctx.move_to(x, y + BPC_TILE_DIM - 2)
+        ctx.show_text(f"{dat:02x}")
+
+
+class TileMaskCache:
+    """
+    An A8 mask for a layer of per-tile values (collision, data layer), that is drawn with a single mask operation.
+    Like StaticLayerCache, the values the mask was rendered with are kept and only changed tiles are re-rendered.
+    """
+    def __init__(self, width_in_tiles: int, height_in_tiles: int,
+                 render_tile: Callable[[cairo.Context, int, int, int], None], scale: float = 1):
+        self.width_in_tiles = width_in_tiles
+        self.height_in_tiles = height_in_tiles
+        self.scale = scale
+        self.surface = cairo.ImageSurface(
+            cairo.FORMAT_A8,
+            math.ceil(width_in_tiles * BPC_TILE_DIM * scale), math.ceil(height_in_tiles * BPC_TILE_DIM * scale)
+        )
+        self.values: List[int] = []
+        self._render_tile = render_tile
+        self._pattern = cairo.SurfacePattern(self.surface)
+        self._pattern.set_filter(cairo.Filter.NEAREST)
+        self._pattern.set_matrix(cairo.Matrix(xx=scale, yy=scale))
+
+    def update(self, values: Sequence[int]):
+        """Re-render all tiles where the value changed since the last update."""
+        if self.values == values:
+            return
+        ctx = cairo.Context(self.surface)
+        ctx.set_antialias(cairo.Antialias.NONE)
+        ctx.scale(self.scale, self.scale)
+        ctx.select_font_face("monospace", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+        ctx.set_font_size(6)
+        for i, value in enumerate(values):
+            if i < len(self.values) and self.values[i] == value:
+                continue
+            x = (i % self.width_in_tiles) * BPC_TILE_DIM
+            y = (i // self.width_in_tiles) * BPC_TILE_DIM
+            ctx.set_operator(cairo.OPERATOR_CLEAR)
+            ctx.rectangle(x, y, BPC_TILE_DIM, BPC_TILE_DIM)
+            ctx.fill()
+            ctx.set_operator(cairo.OPERATOR_OVER)
+            self._render_tile(ctx, x, y, value)
+        self.surface.flush()
+        self.values = list(values)
+
+    def paint(self, ctx: cairo.Context):
+        """Paints the current source of the context through the mask."""
+        ctx.mask(self._pattern)
+
+
 class Drawer:
+    # Whether to draw the layers using StaticLayerCache. Only useful when drawing the full map.
+    _use_static_layer_caches = True
+
     def __init__(
             self, draw_area: Widget, bma: Union[BmaProtocol, None], bpa_durations: int, pal_ani_durations: int,
             # chunks_surfaces[layer_number][chunk_idx][palette_animation_frame][frame]
-            chunks_surfaces: Iterable[Iterable[Iterable[Iterable[cairo.Surface]]]]
+            chunks_surfaces: Iterable[Iterable[Iterable[Iterable[cairo.Surface]]]],
+            timeline: Optional[AnimationTimeline] = None
     ):
         """
         Initialize a drawer...
@@ -54,10 +165,13 @@ class Drawer:
         :param bma: Either a BMA with tile indexes or None, has to be set manually then for drawing
         :param bpa_durations: How many frames to hold a BPA animation tile
         :param chunks_surfaces: Bg controller format chunk surfaces
+        :param timeline: Animation speeds of the individual chunks. If not set, bpa_durations and
+                         pal_ani_durations are used for all chunks.
         """
         self.draw_area = draw_area
+        self.drawing_is_active = False
 
-        self.reset(bma, bpa_durations, pal_ani_durations, chunks_surfaces)
+        self.reset(bma, bpa_durations, pal_ani_durations, chunks_surfaces, timeline)
 
         self.draw_chunk_grid = False
         self.draw_tile_grid = False
@@ -88,7 +202,7 @@ class Drawer:
         self.scale = 1
 
         self.drawing_is_active = False
-    
+
     def reset_bma(self, bma):
         if isinstance(bma, BmaProtocol):
             self.tiling_width = bma.tiling_width
@@ -114,11 +228,17 @@ class Drawer:
             self.data_layer = None
 
     # noinspection PyAttributeOutsideInit
-    def reset(self, bma, bpa_durations, pal_ani_durations, chunks_surfaces):
+    def reset(self, bma, bpa_durations, pal_ani_durations, chunks_surfaces,
+              timeline: Optional[AnimationTimeline] = None):
         self.reset_bma(bma)
+        # Pre-composited layers, see StaticLayerCache. Only used when drawing the full map.
+        self._static_layer_caches: List[Optional[StaticLayerCache]] = [None, None]
+        # Masks for collision 1, collision 2 and the data layer, see TileMaskCache.
+        self._tile_masks: List[Optional[TileMaskCache]] = [None, None, None]
 
-        self.animation_context = AnimationContext(chunks_surfaces, bpa_durations, pal_ani_durations)
+        self.animation_context = AnimationContext(chunks_surfaces, bpa_durations, pal_ani_durations, timeline)
         self._tileset_drawer_overlay: Optional[MapTilesetOverlay] = None
+        self._update_frame_clock_subscription()
 
     def start(self):
         """Start drawing on the DrawingArea"""
@@ -126,10 +246,17 @@ class Drawer:
         if isinstance(self.draw_area, Gtk.DrawingArea):
             self.draw_area.connect('draw', self.draw)
         self.draw_area.queue_draw()
-        GLib.timeout_add(int(1000 / FPS), self._tick)
+        self._update_frame_clock_subscription()
 
     def stop(self):
         self.drawing_is_active = False
+        self._update_frame_clock_subscription()
+
+    def _update_frame_clock_subscription(self):
+        """Only receive ticks from the frame clock while drawing and if there is anything animated."""
+        FrameClock.instance().set_subscribed(
+            self, self.drawing_is_active and self.animation_context.is_animated, self.draw_area, self._tick, FPS
+        )
 
     def _tick(self):
         if self.draw_area is None:
@@ -139,10 +266,28 @@ class Drawer:
             self.draw_area.destroy()
             return False
         self.animation_context.advance()
-        if EventManager.instance().get_if_main_window_has_fous():
-            self.draw_area.queue_draw()
+        if EventManager.instance().get_if_main_window_has_fous() and self.animation_context.changed:
+            self._queue_draw_changed()
         return self.drawing_is_active
 
+    def _queue_draw_changed(self):
+        """Queues a redraw of all chunks that changed their animation frame during the last tick."""
+        if not self._use_static_layer_caches or all(c is None for c in self._static_layer_caches) or (
+            self._tileset_drawer_overlay is not None and self._tileset_drawer_overlay.enabled
+        ):
+            self.draw_area.queue_draw()
+            return
+        for layer_idx, cache in enumerate(self._static_layer_caches):
+            if cache is None:
+                continue
+            for i, chunk_at_pos in cache.animated.items():
+                if self.animation_context.has_changed(layer_idx, chunk_at_pos):
+                    x, y = cache.position(i)
+                    self.draw_area.queue_draw_area(
+                        int(x * self.scale), int(y * self.scale),
+                        math.ceil(cache.chunk_width * self.scale), math.ceil(cache.chunk_height * self.scale)
+                    )
+
     def draw(self, wdg, ctx: cairo.Context, do_translates=True):
         ctx.set_antialias(cairo.Antialias.NONE)
         ctx.scale(self.scale, self.scale)
@@ -160,6 +305,11 @@ class Drawer:
         )
         ctx.fill()
 
+        # Only the chunks inside the clip region are drawn
+        visible_chunks_x, visible_chunks_y = get_visible_cells(
+            ctx, chunk_width, chunk_height, self.width_in_chunks, self.height_in_chunks
+        )
+
         if self._tileset_drawer_overlay is not None and self._tileset_drawer_overlay.enabled:
             self._tileset_drawer_overlay.draw_full(ctx, self.mappings[0], self.width_in_chunks, self.height_in_chunks)
         else:
@@ -168,28 +318,26 @@ class Drawer:
                 if self.show_only_edited_layer and layer_idx != self.edited_layer:
                     continue
                 current_layer_mappings = self.mappings[layer_idx]
-                for i, chunk_at_pos in enumerate(current_layer_mappings):
-                    if 0 < chunk_at_pos < len(chunks_at_frame):
-                        chunk = chunks_at_frame[chunk_at_pos]
-                        ctx.set_source_surface(chunk, 0, 0)
-                        ctx.get_source().set_filter(cairo.Filter.NEAREST)
-                        if self.edited_layer != -1 and layer_idx > 0 and layer_idx != self.edited_layer:
-                            # For Layer 1 if not the current edited: Set an alpha mask
-                            ctx.paint_with_alpha(0.7)
-                        else:
-                            ctx.paint()
-                    if (i + 1) % self.width_in_chunks == 0:
-                        # Move to beginning of next line
-                        if do_translates:
-                            ctx.translate(-chunk_width * (self.width_in_chunks - 1), chunk_height)
-                    else:
-                        # Move to next tile in line
-                        if do_translates:
-                            ctx.translate(chunk_width, 0)
-
-                # Move back to beginning
-                if do_translates:
-                    ctx.translate(0, -chunk_height * self.height_in_chunks)
+                # For Layer 1 if not the current edited: Set an alpha mask
+                alpha = 0.7 if self.edited_layer != -1 and layer_idx > 0 and layer_idx != self.edited_layer else 1
+                if self._use_static_layer_caches and current_layer_mappings is not None:
+                    self._draw_layer_cached(ctx, layer_idx, current_layer_mappings, chunks_at_frame, alpha,
+                                            visible_chunks_x, visible_chunks_y)
+                else:
+                    for y in visible_chunks_y:
+                        for x in visible_chunks_x:
+                            i = y * self.width_in_chunks + x
+                            if i >= len(current_layer_mappings):
+                                break
+                            chunk_at_pos = current_layer_mappings[i]
+                            if 0 < chunk_at_pos < len(chunks_at_frame):
+                                chunk = chunks_at_frame[chunk_at_pos]
+                                if do_translates:
+                                    ctx.set_source_surface(chunk, x * chunk_width, y * chunk_height)
+                                else:
+                                    ctx.set_source_surface(chunk, 0, 0)
+                                ctx.get_source().set_filter(cairo.Filter.NEAREST)
+                                ctx.paint_with_alpha(alpha)
 
                 if (self.edited_layer != -1 and layer_idx < 1 and layer_idx != self.edited_layer) \
                     or (layer_idx == 1 and self.dim_layers) \
@@ -214,47 +362,13 @@ class Drawer:
                 else:
                     ctx.set_source_rgba(0, 1, 0, 0.4)
                     col = self.collision2
-
-                for i, col in enumerate(col):
-                    if col:
-                        ctx.rectangle(
-                            0, 0,
-                            BPC_TILE_DIM,
-                            BPC_TILE_DIM
-                        )
-                        ctx.fill()
-                    if (i + 1) % self.width_in_tiles == 0:
-                        # Move to beginning of next line
-                        if do_translates:
-                            ctx.translate(-BPC_TILE_DIM * (self.width_in_tiles - 1), BPC_TILE_DIM)
-                    else:
-                        # Move to next tile in line
-                        if do_translates:
-                            ctx.translate(BPC_TILE_DIM, 0)
-                # Move back to beginning
-                if do_translates:
-                    ctx.translate(0, -BPC_TILE_DIM * self.height_in_tiles)
+                self._get_tile_mask(col_index, col, render_collision_tile, 1).paint(ctx)
 
         # Data
         if self.draw_data_layer:
-            ctx.select_font_face("monospace", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
-            ctx.set_font_size(6)
             ctx.set_source_rgb(0, 0, 1)
-            for i, dat in enumerate(self.data_layer):
-                if dat > 0:
-                    ctx.move_to(0, BPC_TILE_DIM - 2)
-                    ctx.show_text(f"{dat:02x}")
-                if (i + 1) % self.width_in_tiles == 0:
-                    # Move to beginning of next line
-                    if do_translates:
-                        ctx.translate(-BPC_TILE_DIM * (self.width_in_tiles - 1), BPC_TILE_DIM)
-                else:
-                    # Move to next tile in line
-                    if do_translates:
-                        ctx.translate(BPC_TILE_DIM, 0)
-            # Move back to beginning
-            if do_translates:
-                ctx.translate(0, -BPC_TILE_DIM * self.height_in_tiles)
+            # The text is rendered at the current zoom level, to keep it sharp
+            self._get_tile_mask(2, self.data_layer, render_data_tile, self.scale).paint(ctx)
 
         size_w, size_h = self.draw_area.get_size_request()
         size_w /= self.scale
@@ -275,6 +389,42 @@ class Drawer:
             self.chunk_grid_plugin.draw(ctx, size_w, size_h, self.mouse_x, self.mouse_y)
         return True
 
+    def _draw_layer_cached(self, ctx: cairo.Context, layer_idx: int, mappings: Sequence[int],
+                           chunks_at_frame: Sequence[cairo.Surface], alpha: float,
+                           visible_chunks_x: range, visible_chunks_y: range):
+        """Draws the pre-composited static chunks of the layer and then only the animated chunks on top."""
+        cache = self._static_layer_caches[layer_idx]
+        dims = (self.width_in_chunks, self.height_in_chunks,
+                self.tiling_width * BPC_TILE_DIM, self.tiling_height * BPC_TILE_DIM)
+        if cache is None or (cache.width_in_chunks, cache.height_in_chunks,
+                             cache.chunk_width, cache.chunk_height) != dims:
+            cache = StaticLayerCache(*dims)
+            self._static_layer_caches[layer_idx] = cache
+        cache.update(mappings, self.animation_context.surfaces[layer_idx])
+
+        ctx.set_source_surface(cache.surface, 0, 0)
+        ctx.get_source().set_filter(cairo.Filter.NEAREST)
+        ctx.paint_with_alpha(alpha)
+        for i, chunk_at_pos in cache.animated.items():
+            if i % self.width_in_chunks not in visible_chunks_x or i // self.width_in_chunks not in visible_chunks_y:
+                continue
+            x, y = cache.position(i)
+            ctx.set_source_surface(chunks_at_frame[chunk_at_pos], x, y)
+            ctx.get_source().set_filter(cairo.Filter.NEAREST)
+            ctx.paint_with_alpha(alpha)
+
+    def _get_tile_mask(self, mask_idx: int, values: Sequence[int],
+                       render_tile: Callable[[cairo.Context, int, int, int], None], scale: float) -> 'TileMaskCache':
+        """Returns the mask for collision 1 (0), collision 2 (1) or the data layer (2), updated for the values."""
+        mask = self._tile_masks[mask_idx]
+        if mask is None or (mask.width_in_tiles, mask.height_in_tiles, mask.scale) != (
+            self.width_in_tiles, self.height_in_tiles, scale
+        ):
+            mask = TileMaskCache(self.width_in_tiles, self.height_in_tiles, render_tile, scale)
+            self._tile_masks[mask_idx] = mask
+        mask.update(values)
+        return mask
+
     def selection_draw_callback(self, ctx: cairo.Context, x: int, y: int):
         if self.interaction_mode == DrawerInteraction.CHUNKS:
             # Draw a chunk
@@ -383,6 +533,7 @@ class Drawer:
         self._tileset_drawer_overlay = tileset_drawer_overlay
 
     def unload(self):
+        self.stop()
         self.draw_area = None
         self.reset(None, None, None, None)
         self.draw_chunk_grid = False
@@ -409,14 +560,17 @@ class Drawer:
 
 
 class DrawerCellRenderer(Drawer, Gtk.CellRenderer):
+    _use_static_layer_caches = False
+
     __gproperties__ = {
         'chunkidx': (int, "", "", 0, 999999, 0, ParamFlags.READWRITE)
     }
 
     def __init__(self, icon_view, layer: int, bpa_durations: int, pal_ani_durations: int,
-                 chunks_surfaces: Iterable[Iterable[Iterable[Iterable[cairo.Surface]]]]):
+                 chunks_surfaces: Iterable[Iterable[Iterable[Iterable[cairo.Surface]]]],
+                 timeline: Optional[AnimationTimeline] = None):
 
-        super().__init__(icon_view, None, bpa_durations, pal_ani_durations, chunks_surfaces)
+        super().__init__(icon_view, None, bpa_durations, pal_ani_durations, chunks_surfaces, timeline)
         super(Gtk.CellRenderer, self).__init__()  # type: ignore
         self.layer = layer
 
@@ -0,0 +1,206 @@
+#  Copyright 2020-2021 Capypara and the SkyTemple Contributors
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import math
+import os
+from typing import Dict, List, Tuple, Optional, Set
+
+from PIL import Image, GifImagePlugin
+
+from skytemple.core.background_task import TaskProgress, TaskCancelled
+from skytemple.module.map_bg.chunk_surfaces import ChunkSurfaceCache
+from skytemple.module.tiled_img.animation_context import CLOCK_BPA, CLOCK_PAL
+from skytemple_files.graphics.bma import MASK_PAL
+from skytemple_files.graphics.bma.protocol import BmaProtocol
+from skytemple_files.graphics.bpa.protocol import BpaProtocol
+from skytemple_files.graphics.bpc import BPC_TILE_DIM
+from skytemple_files.graphics.bpc.protocol import BpcProtocol
+from skytemple_files.graphics.bpl.protocol import BplProtocol
+
+# Assuming the game runs 60 FPS.
+GAME_FPS = 60
+# Animations that take longer than this until they repeat are cut off.
+MAX_ANIMATION_TICKS = GAME_FPS * 60
+Bbox = Tuple[int, int, int, int]
+
+
+class MapGifRenderer:
+    """
+    Renders the frames of a map background, using the speeds of the individual BPAs and palette animations.
+    There is only one canvas image, that is updated in place: Only the chunks driven by a clock that advanced
+    are re-rendered.
+    """
+    def __init__(self, bma: BmaProtocol, bpc: BpcProtocol, bpl: BplProtocol, bpas: List[Optional[BpaProtocol]]):
+        self.chunks = ChunkSurfaceCache(bpc, bpl, bpas)
+        self.timeline = self.chunks.create_animation_timeline()
+        self.width_in_chunks = bma.map_width_chunks
+        self.chunk_width = bma.tiling_width * BPC_TILE_DIM
+        self.chunk_height = bma.tiling_height * BPC_TILE_DIM
+        self.layers = [bma.layer0]
+        if bma.number_of_layers > 1 and len(self.chunks) > 1:
+            self.layers.append(bma.layer1)
+        self.canvas = Image.new('P', (self.width_in_chunks * self.chunk_width,
+                                      bma.map_height_chunks * self.chunk_height), 0)
+
+        # (clock type, clock idx) -> Positions on the map that are driven by this clock
+        self.positions_for_clock: Dict[Tuple[int, int], Set[int]] = {}
+        # (clock type, clock idx) -> Number of different chunk frames of the chunks driven by this clock
+        self._frames_for_clock: Dict[Tuple[int, int], int] = {}
+        for layer_idx, mappings in enumerate(self.layers):
+            for i, chunk in enumerate(mappings):
+                if not 0 <= chunk < self.chunks.number_of_cells(layer_idx):
+                    continue
+                bpa_clock, pal_clocks = self.timeline.clocks_for(layer_idx, chunk)
+                clock_frames = [((CLOCK_PAL, pal_clock), 1) for pal_clock in pal_clocks]
+                if bpa_clock is not None:
+                    clock_frames.append(((CLOCK_BPA, bpa_clock), self.chunks.number_of_frames(layer_idx, chunk)))
+                for key, frames in clock_frames:
+                    self.positions_for_clock.setdefault(key, set()).add(i)
+                    prev = self._frames_for_clock.get(key, 1)
+                    self._frames_for_clock[key] = prev * frames // math.gcd(prev, frames)
+        self.clocks = {key: clock for key, clock in self.timeline.all_clocks() if key in self.positions_for_clock}
+        self.counters = {key: 0 for key in self.clocks.keys()}
+        self._masks: Dict[Tuple[int, int, int], Image.Image] = {}
+
+        for i in range(0, len(self.layers[0])):
+            self._render_position(i)
+        self.canvas.putpalette(self.palette())
+
+    def animation_length(self) -> int:
+        """Number of ticks until the animation repeats (or MAX_ANIMATION_TICKS), 0 if not animated."""
+        length = 0
+        for key, clock in self.clocks.items():
+            # The counter has to advance by a multiple of the number of frames of the chunks as well.
+            frames = self._frames_for_clock[key]
+            clock_length = clock.cycle_length * (frames // math.gcd(frames, clock.number_of_frames))
+            length = clock_length if length == 0 else length * clock_length // math.gcd(length, clock_length)
+            if length >= MAX_ANIMATION_TICKS:
+                return MAX_ANIMATION_TICKS
+        return length
+
+    def palette(self) -> List[int]:
+        return self.chunks.get_palette({idx: counter for (kind, idx), counter in self.counters.items()
+                                        if kind == CLOCK_PAL})
+
+    def advance_to(self, tick: int) -> Optional[Bbox]:
+        """
+        Updates the canvas for the tick. Returns the region that may have changed (including regions which
+        use animated palettes, if the palette changed), or None if nothing changed.
+        """
+        changed = [key for key, clock in self.clocks.items() if clock.changes_at(tick)]
+        if len(changed) < 1:
+            return None
+        positions: Set[int] = set()
+        for key in changed:
+            self.counters[key] = self.clocks[key].counter_at(tick)
+            positions.update(self.positions_for_clock[key])
+        for key in changed:
+            if key[0] == CLOCK_BPA:
+                for i in self.positions_for_clock[key]:
+                    self._render_position(i)
+        if any(kind == CLOCK_PAL for kind, _ in changed):
+            self.canvas.putpalette(self.palette())
+        return self._bbox(positions)
+
+    def _render_position(self, i: int):
+        x = (i % self.width_in_chunks) * self.chunk_width
+        y = (i // self.width_in_chunks) * self.chunk_height
+        for layer_idx, mappings in enumerate(self.layers):
+            chunk = mappings[i]
+            if not 0 <= chunk < self.chunks.number_of_cells(layer_idx):
+                continue
+            bpa_clock, _ = self.timeline.clocks_for(layer_idx, chunk)
+            images = self.chunks.get_images(layer_idx, chunk)
+            frame = self.counters[(CLOCK_BPA, bpa_clock)] % len(images) if bpa_clock is not None else 0
+            if layer_idx == 0:
+                self.canvas.paste(images[frame], (x, y))
+            else:
+                self.canvas.paste(images[frame], (x, y), mask=self._get_mask(layer_idx, chunk, frame))
+
+    def _get_mask(self, layer: int, chunk: int, frame: int) -> Image.Image:
+        key = (layer, chunk, frame)
+        if key not in self._masks:
+            mask = self.chunks.get_images(layer, chunk)[frame].copy()
+            mask.putpalette(MASK_PAL)
+            self._masks[key] = mask.convert('1')
+        return self._masks[key]
+
+    def _bbox(self, positions: Set[int]) -> Bbox:
+        xs = [i % self.width_in_chunks for i in positions]
+        ys = [i // self.width_in_chunks for i in positions]
+        return (min(xs) * self.chunk_width, min(ys) * self.chunk_height,
+                (max(xs) + 1) * self.chunk_width, (max(ys) + 1) * self.chunk_height)
+
+
+def export_map_gif(fn: str, bma: BmaProtocol, bpc: BpcProtocol, bpl: BplProtocol,
+                   bpas: List[Optional[BpaProtocol]], progress: TaskProgress):
+    """
+    Exports the map as an animated GIF. The frames are rendered and written one at a time. Frames only contain
+    the region that changed since the previous frame and frames without changes are merged into the previous one.
+    Must be run with copies of the models, if not on the main thread (see BackgroundTask).
+    """
+    renderer = MapGifRenderer(bma, bpc, bpl, bpas)
+    length = renderer.animation_length()
+    initial_palette = renderer.palette()
+    try:
+        with open(fn, 'wb') as fp:
+            header, _ = GifImagePlugin.getheader(renderer.canvas.copy(), None, {'loop': 0, 'optimize': False})
+            for data in header:
+                fp.write(data)
+
+            # The frame that is written, once its duration is known: (image, offset, include palette, start tick)
+            pending: Tuple[Image.Image, Tuple[int, int], bool, int] = (renderer.canvas.copy(), (0, 0), False, 0)
+            current_palette = initial_palette
+            for tick in range(1, length):
+                progress.check_cancelled()
+                progress.update(tick / length)
+                bbox = renderer.advance_to(tick)
+                if bbox is None:
+                    continue
+                palette = renderer.palette()
+                frame = renderer.canvas.crop(bbox)
+                if palette == current_palette and frame.tobytes() == _crop_of_previous(pending, bbox):
+                    # Identical to the previous frame, the previous frame is just shown longer.
+                    continue
+                _write_frame(fp, pending, tick)
+                pending = (frame, bbox[:2], palette != initial_palette, tick)
+                current_palette = palette
+            _write_frame(fp, pending, length)
+            fp.write(b';')
+    except TaskCancelled:
+        os.remove(fn)
+        raise
+    progress.update(1.0)
+
+
+def _crop_of_previous(pending: Tuple[Image.Image, Tuple[int, int], bool, int], bbox: Bbox) -> Optional[bytes]:
+    """Returns the pixel data of the previous frame in the region, if the previous frame covers the region."""
+    image, (x, y), _, _ = pending
+    if bbox[0] < x or bbox[1] < y or bbox[2] > x + image.width or bbox[3] > y + image.height:
+        return None
+    return image.crop((bbox[0] - x, bbox[1] - y, bbox[2] - x, bbox[3] - y)).tobytes()
+
+
+def _write_frame(fp, frame: Tuple[Image.Image, Tuple[int, int], bool, int], end_tick: int):
+    image, offset, include_palette, start_tick = frame
+    params = {}
+    if end_tick > start_tick:
+        # GIF frame durations are in centiseconds, round the start and end to not accumulate rounding errors.
+        params['duration'] = (round(end_tick * 100 / GAME_FPS) - round(start_tick * 100 / GAME_FPS)) * 10
+    if include_palette:
+        params['include_color_table'] = True
+    for data in GifImagePlugin.getdata(image, offset, **params):
+        fp.write(data)
@@ -16,17 +16,21 @@
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
 import logging
 import sys
-from typing import Union, List, Optional, Tuple
+from typing import Union, List, Optional, Tuple, Dict
 
+import cairo
 from gi.repository import Gtk
 from gi.repository.Gtk import TreeStore
 
 from skytemple.core.abstract_module import AbstractModule
 from skytemple.core.error_handler import display_error
+from skytemple.core.img_utils import pil_to_cairo_surface
 from skytemple.core.message_dialog import SkyTempleMessageDialog
 from skytemple.core.model_context import ModelContext
 from skytemple.core.open_request import OpenRequest, REQUEST_TYPE_MAP_BG
 from skytemple.core.rom_project import RomProject, BinaryName
+from skytemple.core.settings import SkyTempleSettingsStore
+from skytemple.core.surface_cache import SurfaceCache, SurfaceCacheStats, surface_size, DEFAULT_BUDGET_MB
 from skytemple.core.ui_utils import recursive_up_item_store_mark_as_modified, \
     recursive_generate_item_store_row_label
 from skytemple.module.map_bg.controller.bg import BgController
@@ -40,6 +44,7 @@ from skytemple_files.dungeon_data.mappa_bin.model import MappaBin
 from skytemple_files.graphics.bg_list_dat.protocol import BgListProtocol, BgListEntryProtocol
 from skytemple_files.graphics.bma.protocol import BmaProtocol
 from skytemple_files.graphics.bpa.protocol import BpaProtocol
+from skytemple_files.graphics.bpc import BPC_TILE_DIM
 from skytemple_files.graphics.bpc.protocol import BpcProtocol
 from skytemple_files.graphics.bpl.protocol import BplProtocol
 from skytemple_files.common.i18n_util import f, _
@@ -50,6 +55,8 @@ from skytemple_files.hardcoded.ground_dungeon_tilesets import GroundTilesetMappi
 MAP_BG_PATH = 'MAP_BG/'
 MAP_BG_LIST = MAP_BG_PATH + 'bg_list.dat'
 logger = logging.getLogger(__name__)
+# Surface of the rendered map background and its width and height (camera area) in pixels.
+RenderedMap = Tuple[cairo.ImageSurface, int, int]
 
 
 class MapBgModule(AbstractModule):
@@ -71,6 +78,14 @@ class MapBgModule(AbstractModule):
         self._sub_nodes: Optional[Gtk.TreeIter] = None
         self._other_node: Optional[Gtk.TreeIter] = None
 
+        # Rendered map backgrounds, keyed by item ID and the generation of the map's content.
+        self._rendered_maps: SurfaceCache[Tuple[int, int], RenderedMap] = SurfaceCache(
+            SkyTempleSettingsStore().get_surface_cache_budget(DEFAULT_BUDGET_MB) * 1024 * 1024,
+            lambda rendered: surface_size(rendered[0])
+        )
+        # item ID -> generation. Increased every time the map is modified.
+        self._generations: Dict[int, int] = {}
+
     def load_tree_items(self, item_store: TreeStore, root_node):
         root = item_store.append(root_node, [
             'skytemple-e-mapbg-symbolic', MAPBG_NAME, self, MainController, 0, False, '', True
@@ -168,8 +183,49 @@ class MapBgModule(AbstractModule):
         self.mark_as_modified(item_id)
         self.mark_level_list_as_modified()
 
+    def get_rendered_map(self, item_id, pin_owner: Optional[object] = None) -> RenderedMap:
+        """
+        Returns the first frame of the map background as a surface, with the width and height of the map in pixels.
+        Rendered maps are cached until the map is modified. If pin_owner is given, the map is not evicted from the
+        cache until release_rendered_maps is called with the owner.
+        """
+        key = (item_id, self._generations.get(item_id, 0))
+        if pin_owner is not None:
+            self._rendered_maps.release(pin_owner)
+            self._rendered_maps.pin(pin_owner, key)
+        rendered = self._rendered_maps.get(key)
+        if rendered is None:
+            bma = self.get_bma(item_id)
+            surface = pil_to_cairo_surface(
+                bma.to_pil(self.get_bpc(item_id), self.get_bpl(item_id), self.get_bpas(item_id),
+                           False, False, single_frame=True)[0].convert('RGBA')
+            )
+            rendered = (surface, bma.map_width_camera * BPC_TILE_DIM, bma.map_height_camera * BPC_TILE_DIM)
+            self._rendered_maps.put(key, rendered)
+        return rendered
+
+    def release_rendered_maps(self, owner: object):
+        """Releases the rendered maps pinned by owner."""
+        self._rendered_maps.release(owner)
+
+    def get_rendered_map_cache_stats(self) -> SurfaceCacheStats:
+        return self._rendered_maps.stats()
+
+    def _invalidate_rendered_map(self, item_id):
+        """Invalidates the renders of this map and of all other maps that use one of its files."""
+        l = self.bgs.level[item_id]
+        xref_index = self.project.get_xref_index()
+        affected = {item_id}
+        for name in [l.bma_name, l.bpc_name, l.bpl_name] + list(l.bpa_names):
+            if name is not None:
+                affected.update(xref_index.get_map_bgs_using_file(name))
+        for bg_id in affected:
+            self._generations[bg_id] = self._generations.get(bg_id, 0) + 1
+        self._rendered_maps.remove_where(lambda key: key[0] in affected)
+
     def mark_as_modified(self, item_id):
         """Mark a specific map as modified"""
+        self._invalidate_rendered_map(item_id)
         l = self.bgs.level[item_id]
         self.project.mark_as_modified(f'{MAP_BG_PATH}{l.bma_name.lower()}.bma')
         self.project.mark_as_modified(f'{MAP_BG_PATH}{l.bpc_name.lower()}.bpc')
@@ -203,6 +259,7 @@ class MapBgModule(AbstractModule):
                     item_id = i
                     break
             if item_id != -1:
+                self._invalidate_rendered_map(item_id)
                 row = self._tree_model[self._tree_level_iter[item_id]]
                 recursive_up_item_store_mark_as_modified(row)
         except BaseException as err:
@@ -221,18 +278,14 @@ class MapBgModule(AbstractModule):
 
     def get_associated_script_map(self, item_id):
         """Returns the script map that is associated to this map bg item ID, or None if not found"""
-        for level in self.project.get_rom_module().get_static_data().script_data.level_list__by_id.values():
-            if level.mapid == item_id:
-                return level
+        levels = self.project.get_xref_index().get_levels_for_map_bg(item_id)
+        if len(levels) > 0:
+            return levels[0]
         return None
 
     def get_all_associated_script_maps(self, item_id):
         """Returns all script maps that are associated to this map bg item ID, or empty list if not found"""
-        maps = []
-        for level in self.project.get_rom_module().get_static_data().script_data.level_list__by_id.values():
-            if level.mapid == item_id:
-                maps.append(level)
-        return maps
+        return self.project.get_xref_index().get_levels_for_map_bg(item_id).copy()
 
     def remove_bpa_upper_layer(self, item_id):
         """
@@ -241,6 +294,7 @@ class MapBgModule(AbstractModule):
         """
         l = self.bgs.level[item_id]
         l.bpa_names = l.bpa_names[4:8] + [None, None, None, None]
+        self._invalidate_rendered_map(item_id)
         self.mark_level_list_as_modified()
 
     def get_mapping_dungeon_assets(
@@ -0,0 +1,59 @@
+#  Copyright 2020-2021 Capypara and the SkyTemple Contributors
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+from typing import List, NamedTuple
+
+from skytemple_files.graphics.bpc.protocol import BpcProtocol
+from skytemple_files.graphics.bpl import BPL_NORMAL_MAX_PAL
+from skytemple_files.graphics.bpl.protocol import BplProtocol
+
+
+class InvalidPaletteUse(NamedTuple):
+    # Layer as used by the BgController (0 = "Layer 1")
+    layer: int
+    chunk_idx: int
+    # Index of the tile in the chunk
+    tile_idx: int
+    pal_idx: int
+
+
+def find_invalid_palette_uses(bpc: BpcProtocol, bpl: BplProtocol) -> List[InvalidPaletteUse]:
+    """
+    Returns all tiles in all chunks of the BPC that use a palette that doesn't exist in the BPL or that
+    is not one of the palettes normally usable by map backgrounds. The game will not render these tiles the same
+    way SkyTemple does.
+
+    This works on the tile mappings only: The palette index of every pixel of a tile is the palette index of the
+    tile mapping.
+    """
+    max_pal = min(bpl.number_palettes, BPL_NORMAL_MAX_PAL)
+    # Lookup table: 1 for invalid palette indices, 0 for valid ones.
+    invalid_table = bytes(0 if i < max_pal else 1 for i in range(0, 256))
+    layer_idxs_bpc = [1, 0] if bpc.number_of_layers > 1 else [0]
+
+    invalid = []
+    for layer, layer_idx_bpc in enumerate(layer_idxs_bpc):
+        bpc_layer = bpc.layers[layer_idx_bpc]
+        if bpc_layer.chunk_tilemap_len < 1:
+            continue
+        tiles_per_chunk = len(bpc.get_chunk(layer_idx_bpc, 0))
+        mappings = bpc_layer.tilemap[:bpc_layer.chunk_tilemap_len * tiles_per_chunk]
+        flags = bytes(m.pal_idx & 0xFF for m in mappings).translate(invalid_table)
+        pos = flags.find(1)
+        while pos != -1:
+            invalid.append(InvalidPaletteUse(layer, pos // tiles_per_chunk, pos % tiles_per_chunk, mappings[pos].pal_idx))
+            pos = flags.find(1, pos + 1)
+    return invalid
@@ -389,7 +389,7 @@ class LevelUpController(AbstractController):
 
     def _init_move_names(self):
         move_names_store: Gtk.ListStore = self.builder.get_object('move_names_store')
-        for idx, name in enumerate(self._string_provider.get_all(StringType.MOVE_NAMES)):
+        for idx, name in enumerate(self._string_provider.get_all_view(StringType.MOVE_NAMES)):
             self._move_names[idx] = f'{name} ({idx:03})'
             move_names_store.append([idx, self._move_names[idx]])
 
@@ -29,6 +29,7 @@ from skytemple.core.error_handler import display_error
 from skytemple.controller.main import MainController
 from skytemple.core.message_dialog import SkyTempleMessageDialog
 from skytemple.core.module_controller import AbstractController
+from skytemple.core.name_stores import NAME_KIND_ITEM, NAME_KIND_MONSTER
 from skytemple.core.string_provider import StringType
 from skytemple.core.ui_utils import add_dialog_xml_filter
 from skytemple.module.monster.controller.level_up import LevelUpController
@@ -67,14 +68,15 @@ class MonsterController(AbstractController):
         self._sprite_provider = module.project.get_sprite_provider()
         self._portrait_provider = module.project.get_module('portrait').get_portrait_provider()
         self._level_up_controller: Optional[LevelUpController] = None
+        self._portrait_controller: Optional[AbstractController] = None
         self._cached_sprite_page = None
 
         self._render_graph_on_tab_change = True
 
-        self.item_names = {}
-        for i in range(0, MAX_ITEMS):
-            name = self.module.project.get_string_provider().get_value(StringType.ITEM_NAMES, i)
-            self.item_names[i] = f'{name} (#{i:04})'
+        self._item_name_store = module.project.get_name_stores().get(
+            NAME_KIND_ITEM, '{name} (#{id:04})', range(0, MAX_ITEMS)
+        )
+        self.item_names = self._item_name_store.names
 
     def get_view(self) -> Gtk.Widget:
         self.builder = self._get_builder(__file__, 'monster.glade')
@@ -89,10 +91,8 @@ class MonsterController(AbstractController):
         self._init_sub_pages()
 
         # Init Items Completion
-        store: Gtk.ListStore = self.builder.get_object('store_completion_items')
-
-        for item in self.item_names.values():
-            store.append([item])
+        for completion_name in ('completion_items', 'completion_items1', 'completion_items2', 'completion_items3'):
+            self.builder.get_object(completion_name).set_model(self._item_name_store.store)
 
         self._is_loading = True
         self._init_values()
@@ -111,8 +111,6 @@ class MonsterController(AbstractController):
             self.builder.get_object('lbl_unk_17').set_text(_("Sprite Size"))
             self.builder.get_object('lbl_unk_18').set_text(_("Sprite File Size"))
 
-        self._ent_names: Dict[int, str] = {}
-        
         self._init_monster_store()
 
         stack: Gtk.Stack = self.builder.get_object('evo_stack')
@@ -138,6 +136,10 @@ class MonsterController(AbstractController):
         # We need to destroy this first.
         # GTK is an enigma sometimes.
         self.builder.get_object('export_dialog').destroy()
+        self._sprite_provider.release_pins(self)
+        self._portrait_provider.release_pins(self)
+        if self._portrait_controller is not None:
+            self._portrait_controller.unload()
         super().unload()
         self.module = None
         self.item_id = None
@@ -151,6 +153,7 @@ class MonsterController(AbstractController):
         self._sprite_provider = None
         self._portrait_provider = None
         self._level_up_controller: Optional[LevelUpController] = None
+        self._portrait_controller = None
         self._cached_sprite_page = None
         self._render_graph_on_tab_change = True
         self.item_names = {}
@@ -169,7 +172,7 @@ class MonsterController(AbstractController):
     def on_draw_portrait_draw(self, widget: Gtk.DrawingArea, ctx: cairo.Context):
         scale = 2
         portrait = self._portrait_provider.get(self.entry.md_index - 1, 0,
-                                               lambda: GLib.idle_add(widget.queue_draw), True)
+                                               lambda: GLib.idle_add(widget.queue_draw), True, pin_owner=self)
         ctx.scale(scale, scale)
         ctx.set_source_surface(portrait)
         ctx.get_source().set_filter(cairo.Filter.NEAREST)
@@ -182,7 +185,8 @@ class MonsterController(AbstractController):
     def on_draw_sprite_draw(self, widget: Gtk.DrawingArea, ctx: cairo.Context):
         if self.entry.entid > 0:
             sprite, x, y, w, h = self._sprite_provider.get_monster(self.entry.md_index, 0,
-                                                                   lambda: GLib.idle_add(widget.queue_draw))
+                                                                   lambda: GLib.idle_add(widget.queue_draw),
+                                                                   pin_owner=self)
         else:
             sprite, x, y, w, h = self._sprite_provider.get_error()
         ctx.set_source_surface(sprite)
@@ -1110,7 +1114,8 @@ Each drop type x has a chance of (x rate)/(sum of all the rates) to be selected.
         level_up_view, self._level_up_controller = self.module.get_level_up_view(self.item_id)
         notebook.append_page(level_up_view, tab_label)
         tab_label: Gtk.Label = Gtk.Label.new(_('Portraits'))
-        notebook.append_page(self.module.get_portrait_view(self.item_id), tab_label)
+        portrait_view, self._portrait_controller = self.module.get_portrait_view(self.item_id)
+        notebook.append_page(portrait_view, tab_label)
         self._reload_sprite_page()
 
     def _reload_sprite_page(self):
@@ -1298,18 +1303,11 @@ Each drop type x has a chance of (x rate)/(sum of all the rates) to be selected.
 
     # Relative to the new evolution system
     def _init_monster_store(self):
-        monster_md = self.module.monster_md
-        monster_store: Gtk.ListStore = self.builder.get_object('monster_store')
-        for idx, entry in enumerate(monster_md.entries):
-            if idx == 0:
-                continue
-            if not self.module.project.is_patch_applied('ExpandPokeList'):
-                sidx = entry.md_index_base
-            else:
-                sidx = entry.md_index
-            name = self.module.project.get_string_provider().get_value(StringType.POKEMON_NAMES, sidx)
-            self._ent_names[idx] = f'{name} ({entry.gender.print_name}) (#{idx:04})'
-            monster_store.append([self._ent_names[idx]])
+        monster_name_store = self.module.project.get_name_stores().get(
+            NAME_KIND_MONSTER, '{name} ({gender}) (#{id:04})'
+        )
+        self._ent_names: Dict[int, str] = monster_name_store.names
+        self.builder.get_object('completion_entities').set_model(monster_name_store.store)
     
     def on_cr_entity_editing_started(self, renderer, editable, path):
         editable.set_completion(self.builder.get_object('completion_entities'))
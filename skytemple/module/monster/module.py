@@ -22,6 +22,7 @@ from gi.repository import Gtk
 from gi.repository.Gtk import TreeStore
 
 from skytemple.core.abstract_module import AbstractModule
+from skytemple.core.open_request import OpenRequest, REQUEST_TYPE_MONSTER
 from skytemple.core.rom_project import RomProject, BinaryName
 from skytemple.core.string_provider import StringType
 from skytemple.core.ui_utils import recursive_generate_item_store_row_label, recursive_up_item_store_mark_as_modified
@@ -105,6 +106,11 @@ class MonsterModule(AbstractModule):
 
         recursive_generate_item_store_row_label(self._tree_model[self._root])
 
+    def handle_request(self, request: OpenRequest) -> Optional[Gtk.TreeIter]:
+        if request.type == REQUEST_TYPE_MONSTER:
+            return self._tree_iter__entity_roots.get(request.identifier)
+        return None
+
     def refresh(self, item_id):
         b_attr = self.effective_base_attr
 
@@ -178,7 +184,7 @@ class MonsterModule(AbstractModule):
 
     def get_portrait_view(self, item_id):
         if item_id == 0:
-            return Gtk.Label.new(_("This entry has no portraits."))
+            return Gtk.Label.new(_("This entry has no portraits.")), None
         return self.project.get_module('portrait').get_editor(item_id - 1, lambda: self.mark_md_as_modified(item_id))
 
     def get_sprite_view(self, sprite_id, item_id):
@@ -25,7 +25,7 @@ from math import gcd
 from skytemple.core.error_handler import display_error
 from skytemple.controller.main import MainController
 from skytemple.core.list_icon_renderer import ListIconRenderer
-from skytemple.core.string_provider import StringType
+from skytemple.core.name_stores import NAME_KIND_ITEM
 from skytemple.core.ui_utils import glib_async
 from skytemple.module.dungeon.controller.floor import POKE_CATEGORY_ID, LINKBOX_CATEGORY_ID
 from skytemple_files.common.ppmdu_config.dungeon_data import Pmd2DungeonItem, Pmd2DungeonItemCategory
@@ -527,32 +527,26 @@ class ItemListsController(AbstractController):
         return out_items
 
     def _init_item_completion_store(self):
-        completion_item_thrown_pierce_store: Gtk.ListStore = self.builder.get_object('completion_item_thrown_pierce_store')
-        completion_item_thrown_rock_store: Gtk.ListStore = self.builder.get_object('completion_item_thrown_rock_store')
-        completion_item_berries_store: Gtk.ListStore = self.builder.get_object('completion_item_berries_store')
-        completion_item_foods_store: Gtk.ListStore = self.builder.get_object('completion_item_foods_store')
-        completion_item_hold_store: Gtk.ListStore = self.builder.get_object('completion_item_hold_store')
-        completion_item_tms_store: Gtk.ListStore = self.builder.get_object('completion_item_tms_store')
-        completion_item_orbs_store: Gtk.ListStore = self.builder.get_object('completion_item_orbs_store')
-        completion_item_others_store: Gtk.ListStore = self.builder.get_object('completion_item_others_store')
-        completion_stores = {
-            self.item_categories[0]: completion_item_thrown_pierce_store,
-            self.item_categories[1]: completion_item_thrown_rock_store,
-            self.item_categories[2]: completion_item_berries_store,
-            self.item_categories[3]: completion_item_foods_store,
-            self.item_categories[4]: completion_item_hold_store,
-            self.item_categories[5]: completion_item_tms_store,
-            self.item_categories[9]: completion_item_orbs_store,
-            self.item_categories[8]: completion_item_others_store
+        name_stores = self.module.project.get_name_stores()
+        item_format = '{name} (#{id:03})'
+        completions = {
+            self.item_categories[0]: 'completion_item_thrown_pierce',
+            self.item_categories[1]: 'completion_item_thrown_rock',
+            self.item_categories[2]: 'completion_item_berries',
+            self.item_categories[3]: 'completion_item_foods',
+            self.item_categories[4]: 'completion_item_hold',
+            self.item_categories[5]: 'completion_item_tms',
+            self.item_categories[9]: 'completion_item_orbs',
+            self.item_categories[8]: 'completion_item_others'
         }
 
-        for i in range(0, MAX_ITEM_ID):
-            name = self.module.project.get_string_provider().get_value(StringType.ITEM_NAMES, i)
-            self._item_names[i] = f'{name} (#{i:03})'
+        self._item_names = name_stores.get(NAME_KIND_ITEM, item_format, range(0, MAX_ITEM_ID)).names
 
-        for category, store in completion_stores.items():
-            for item in category.item_ids():
-                store.append([self._item_names[item]])
+        for category, completion_name in completions.items():
+            category_store = name_stores.get(
+                NAME_KIND_ITEM, item_format, [item for item in category.item_ids() if item < MAX_ITEM_ID]
+            )
+            self.builder.get_object(completion_name).set_model(category_store.store)
 
     def _calculate_relative_weights(self, list_of_weights: List[int]) -> List[int]:
         weights = []
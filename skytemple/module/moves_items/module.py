@@ -20,6 +20,7 @@ from gi.repository import Gtk
 from gi.repository.Gtk import TreeStore, TreeIter
 
 from skytemple.core.abstract_module import AbstractModule
+from skytemple.core.open_request import OpenRequest, REQUEST_TYPE_ITEM, REQUEST_TYPE_MOVE
 from skytemple.core.rom_project import RomProject
 from skytemple.core.string_provider import StringType
 from skytemple.core.ui_utils import recursive_up_item_store_mark_as_modified, generate_item_store_row_label, \
@@ -111,6 +112,13 @@ class MovesItemsModule(AbstractModule):
         recursive_generate_item_store_row_label(item_store[root_moves])
         self._tree_model = item_store
 
+    def handle_request(self, request: OpenRequest) -> Optional[TreeIter]:
+        if request.type == REQUEST_TYPE_ITEM:
+            return self.item_iters.get(request.identifier)
+        if request.type == REQUEST_TYPE_MOVE:
+            return self.move_iters.get(request.identifier)
+        return None
+
     def has_item_effects(self):
         return self.project.file_exists(ITEM_EFFECTS)
 
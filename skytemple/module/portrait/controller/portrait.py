@@ -73,10 +73,15 @@ class PortraitController(AbstractController):
 
         return self.builder.get_object('box_main')
 
+    def unload(self):
+        self._portrait_provider.release_pins(self)
+        super().unload()
+        self._draws = []
+
     def on_draw(self, subindex: int, widget: Gtk.DrawingArea, ctx: cairo.Context):
         scale = 2
         portrait = self._portrait_provider.get(self.item_id, subindex,
-                                               lambda: GLib.idle_add(widget.queue_draw), False)
+                                               lambda: GLib.idle_add(widget.queue_draw), False, pin_owner=self)
         ctx.set_source_rgb(1, 1, 1)
         ctx.rectangle(0, 0, *widget.get_size_request())
         ctx.fill()
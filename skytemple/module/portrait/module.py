@@ -14,6 +14,8 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+from typing import Tuple
+
 from gi.repository import Gtk
 from gi.repository.Gtk import TreeStore
 
@@ -49,10 +51,13 @@ class PortraitModule(AbstractModule):
         """This module does not have main views."""
         pass
 
-    def get_editor(self, item_id: int, modified_callback) -> Gtk.Widget:
-        """Returns the view for one portrait slots"""
+    def get_editor(self, item_id: int, modified_callback) -> Tuple[Gtk.Widget, PortraitController]:
+        """
+        Returns the view for one portrait slots and its controller.
+        The controller must be unloaded when the view is closed.
+        """
         controller = PortraitController(self, item_id, modified_callback)
-        return controller.get_view()
+        return controller.get_view(), controller
 
     def get_portrait_provider(self) -> PortraitProvider:
         if not self._portrait_provider__was_init:
@@ -15,13 +15,15 @@
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
 import threading
-from typing import List, Dict, Tuple, Optional
+from typing import List, Tuple, Optional
 
 import cairo
 from gi.repository import Gdk, GdkPixbuf, Gtk
 
 from skytemple.core.img_utils import pil_to_cairo_surface
 from skytemple.core.async_tasks.delegator import AsyncTaskDelegator
+from skytemple.core.settings import SkyTempleSettingsStore
+from skytemple.core.surface_cache import SurfaceCache, SurfaceCacheStats, surface_size, DEFAULT_BUDGET_MB
 from skytemple_files.data.md.model import MdProperties
 from skytemple_files.graphics.kao import KAO_IMG_METAPIXELS_DIM, KAO_IMG_IMG_DIM
 from skytemple_files.graphics.kao.protocol import KaoProtocol
@@ -34,14 +36,19 @@ class PortraitProvider:
     """
     PortraitProvider. This class renders portraits using Threads. If a portrait is requested, a loading icon
     is returned instead, until it is loaded by the AsyncTaskDelegator.
+
+    Loaded portraits are kept in a LRU cache with a memory budget. Views can pass a pin_owner to get,
+    to make sure the portraits they display are not evicted, and must call release_pins when they are unloaded.
     """
     def __init__(self, kao: KaoProtocol):
         self._kao = kao
         self._loader_surface: Optional[cairo.ImageSurface] = None
         self._error_surface: Optional[cairo.ImageSurface] = None
 
-        self._loaded: Dict[Tuple[int, int], cairo.Surface] = {}
-        self._loaded__is_fallback: Dict[Tuple[int, int], bool] = {}
+        # Values are (surface, is_fallback)
+        self._loaded: SurfaceCache[Tuple[int, int], Tuple[cairo.Surface, bool]] = SurfaceCache(
+            SkyTempleSettingsStore().get_surface_cache_budget(DEFAULT_BUDGET_MB) * 1024 * 1024, self._portrait_size
+        )
 
         self._requests: List[Tuple[int, int]] = []
 
@@ -68,20 +75,23 @@ class PortraitProvider:
 
     def reset(self):
         with portrait_provider_lock:
-            self._loaded = {}
-            self._loaded__is_fallback = {}
+            self._loaded.clear()
             self._requests = []
 
-    def get(self, entry_id: int, sub_id: int, after_load_cb=lambda: None, allow_fallback=True) -> cairo.Surface:
+    def get(self, entry_id: int, sub_id: int, after_load_cb=lambda: None, allow_fallback=True, pin_owner=None) -> cairo.Surface:
         """
         Returns a portrait.
         As long as the portrait is being loaded, the loader portrait is returned instead.
         If allow_fallback is set, the base form entry is loaded (% 600), when the portrait doesn't exist.
         """
         with portrait_provider_lock:
-            if (entry_id, sub_id) in self._loaded:
-                if allow_fallback or (not allow_fallback and not self._loaded__is_fallback[(entry_id, sub_id)]):
-                    return self._loaded[(entry_id, sub_id)]
+            if pin_owner is not None:
+                self._loaded.pin(pin_owner, (entry_id, sub_id))
+            loaded = self._loaded.get((entry_id, sub_id))
+            if loaded is not None:
+                surface, is_fallback = loaded
+                if allow_fallback or (not allow_fallback and not is_fallback):
+                    return surface
                 else:
                     return self.get_error()
             if (entry_id, sub_id) not in self._requests:
@@ -110,11 +120,27 @@ class PortraitProvider:
         except (RuntimeError, ValueError, OverflowError):
             loaded = self.get_error()
         with portrait_provider_lock:
-            self._loaded[(entry_id, sub_id)] = loaded
-            self._loaded__is_fallback[(entry_id, sub_id)] = is_fallback
+            self._loaded.put((entry_id, sub_id), (loaded, is_fallback))
             self._requests.remove((entry_id, sub_id))
         after_load_cb()
 
+    def release_pins(self, owner: object):
+        """Releases all portraits pinned by owner. They may be evicted from the cache afterwards."""
+        self._loaded.release(owner)
+
+    def get_cache_stats(self) -> SurfaceCacheStats:
+        """Returns hit, miss and eviction statistics and the current memory usage of the portrait cache."""
+        return self._loaded.stats()
+
+    def set_cache_budget(self, budget_mb: int):
+        self._loaded.set_budget(budget_mb * 1024 * 1024)
+
+    def _portrait_size(self, portrait: Tuple[cairo.Surface, bool]) -> int:
+        # The loader and error icons are shared and never evicted.
+        if portrait[0] is self._error_surface or portrait[0] is self._loader_surface:
+            return 0
+        return surface_size(portrait[0])
+
     def get_loader(self) -> cairo.Surface:
         """
         Returns the loader sprite. A "loading" icon with the size ~24x24px.
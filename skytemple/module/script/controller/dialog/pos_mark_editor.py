@@ -132,6 +132,7 @@ class PosMarkEditorController:
                         self._currently_selected_mark.y_offset = 2
                     else:
                         self._currently_selected_mark.y_offset = 0
+                    self.drawer.entity_changed(self._currently_selected_mark)
         self._bg_draw_is_clicked__location = None
         self._bg_draw_is_clicked__drag_active = False
         self._w_ssa_draw.queue_draw()
@@ -24,7 +24,6 @@ from gi.repository import Gtk, Gdk
 from gi.repository.Gtk import TreeViewColumn
 
 from skytemple.controller.main import MainController
-from skytemple.core.img_utils import pil_to_cairo_surface
 from skytemple.core.mapbg_util.map_tileset_overlay import MapTilesetOverlay
 from skytemple.core.message_dialog import SkyTempleMessageDialog
 from skytemple.core.module_controller import AbstractController
@@ -86,9 +85,6 @@ class SsaController(AbstractController):
     _last_open_tab = None
     _paned_pos = None
     _last_scale_factor = None
-    # Cache for map backgrounds, for faster scene view transitions in the same map context
-    # Should be set to (None, ) when loading a map BG context.
-    map_bg_surface_cache = (None, )
 
     def __init__(self, module: 'ScriptModule', item: dict):
         self.module = module
@@ -141,8 +137,13 @@ class SsaController(AbstractController):
 
         self._tileset_drawer_overlay: Optional[MapTilesetOverlay] = None
 
+    async def async_init(self):
+        sprite_provider = self.module.get_sprite_provider()
+        sprite_provider.reset()
+        self._init_ssa()
+        await self._prefetch_sprites()
+
     def get_view(self) -> Gtk.Widget:
-        self.module.get_sprite_provider().reset()
         self.builder = self._get_builder(__file__, 'ssa.glade')
         self._w_ssa_draw = self.builder.get_object('ssa_draw')
         self._w_po_actors = self.builder.get_object('po_actor')
@@ -170,6 +171,8 @@ class SsaController(AbstractController):
 
     def unload(self):
         super().unload()
+        self.map_bg_module.release_rendered_maps(self)
+        self.module.get_sprite_provider().release_pins(self)
         self.module = None
         self.map_bg_module = None
         self.static_data = None
@@ -261,6 +264,7 @@ class SsaController(AbstractController):
                 )
                 self.ssa.layer_list[place_layer].events.append(new_entity)
             if new_entity is not None:
+                self.drawer.entity_added(new_entity, place_layer)
                 # Switch back to move/select mode
                 self.builder.get_object('tool_scene_move').set_active(True)  # type: ignore
                 self._select(new_entity, place_layer)
@@ -295,6 +299,7 @@ class SsaController(AbstractController):
                         self._currently_selected_entity.pos.y_offset = 2
                     else:
                         self._currently_selected_entity.pos.y_offset = 0
+                    self.drawer.entity_changed(self._currently_selected_entity, self._currently_selected_entity_layer)
                     self._bg_draw_is_clicked__drag_active = False
                     self._bg_draw_is_clicked__location = None
         self._bg_draw_is_clicked__location = None
@@ -374,19 +379,8 @@ class SsaController(AbstractController):
                 self._map_bg_surface = self._tileset_drawer_overlay.create(bma.layer0, bma.map_width_chunks, bma.map_height_chunks)
                 bma_width = bma.map_width_camera * BPC_TILE_DIM
                 bma_height = bma.map_height_camera * BPC_TILE_DIM
-            elif self.__class__.map_bg_surface_cache[0] == item_id:
-                self._map_bg_surface, bma_width, bma_height = self.__class__.map_bg_surface_cache[1:]  # type: ignore
             else:
-                bma = self.map_bg_module.get_bma(item_id)
-                bpl = self.map_bg_module.get_bpl(item_id)
-                bpc = self.map_bg_module.get_bpc(item_id)
-                bpas = self.map_bg_module.get_bpas(item_id)
-                self._map_bg_surface = pil_to_cairo_surface(
-                    bma.to_pil(bpc, bpl, bpas, False, False, single_frame=True)[0].convert('RGBA')
-                )
-                bma_width = bma.map_width_camera * BPC_TILE_DIM
-                bma_height = bma.map_height_camera * BPC_TILE_DIM
-                self.__class__.map_bg_surface_cache = (item_id, self._map_bg_surface, bma_width, bma_height)  # type: ignore
+                self._map_bg_surface, bma_width, bma_height = self.map_bg_module.get_rendered_map(item_id, pin_owner=self)
             if self.drawer:
                 self._set_drawer_bg(self._map_bg_surface, bma_width, bma_height)  # type: ignore
 
@@ -449,6 +443,7 @@ class SsaController(AbstractController):
                     elif trigger.trigger_id > trigger_id:
                         trigger.trigger_id -= 1
                     self._refresh_list_entry_for(trigger, layer_id)
+                    self.drawer.entity_changed(trigger, layer_id)
             # Mark as modified
             self.module.mark_as_modified(self.mapname, self.type, self.filename)
 
@@ -488,6 +483,7 @@ class SsaController(AbstractController):
                 for layer_id, layer in enumerate(self.ssa.layer_list):
                     for trigger in layer.events:
                         self._refresh_list_entry_for(trigger, layer_id)
+                        self.drawer.entity_changed(trigger, layer_id)
                 # Update event list
                 l_iter = model.get_iter_first()
                 while l_iter:
@@ -763,6 +759,7 @@ class SsaController(AbstractController):
         tree.get_model().remove(l_iter)
         # Remove from model
         self.ssa.layer_list[self._currently_selected_entity_layer].actors.remove(self._currently_selected_entity)  # type: ignore
+        self.drawer.entity_removed(self._currently_selected_entity, self._currently_selected_entity_layer)  # type: ignore
         # Remove now invalid references:
         self._currently_selected_entity = None
         self._bg_draw_is_clicked__drag_active = False
@@ -824,6 +821,7 @@ class SsaController(AbstractController):
         tree.get_model().remove(l_iter)
         # Remove from model
         self.ssa.layer_list[self._currently_selected_entity_layer].objects.remove(self._currently_selected_entity)  # type: ignore
+        self.drawer.entity_removed(self._currently_selected_entity, self._currently_selected_entity_layer)  # type: ignore
         # Remove now invalid references:
         self._currently_selected_entity = None
         self._bg_draw_is_clicked__drag_active = False
@@ -878,6 +876,7 @@ class SsaController(AbstractController):
         tree.get_model().remove(l_iter)
         # Remove from model
         self.ssa.layer_list[self._currently_selected_entity_layer].performers.remove(self._currently_selected_entity)  # type: ignore
+        self.drawer.entity_removed(self._currently_selected_entity, self._currently_selected_entity_layer)  # type: ignore
         # Remove now invalid references:
         self._currently_selected_entity = None
         self._bg_draw_is_clicked__drag_active = False
@@ -926,6 +925,7 @@ class SsaController(AbstractController):
         tree.get_model().remove(l_iter)
         # Remove from model
         self.ssa.layer_list[self._currently_selected_entity_layer].events.remove(self._currently_selected_entity)  # type: ignore
+        self.drawer.entity_removed(self._currently_selected_entity, self._currently_selected_entity_layer)  # type: ignore
         # Remove now invalid references:
         self._currently_selected_entity = None
         self._bg_draw_is_clicked__drag_active = False
@@ -983,6 +983,7 @@ class SsaController(AbstractController):
 
     def _refresh_for_selected(self):
         # Refresh drawing
+        self.drawer.entity_changed(self._currently_selected_entity, self._currently_selected_entity_layer)  # type: ignore
         self._w_ssa_draw.queue_draw()
         # Refresh list entries
         self._refresh_list_entry_for(self._currently_selected_entity, self._currently_selected_entity_layer)
@@ -1239,6 +1240,24 @@ class SsaController(AbstractController):
     def _init_ssa(self):
         self.ssa = self.module.get_ssa(self.filename)
 
+    async def _prefetch_sprites(self):
+        """Loads the sprites of all actors and objects in all layers in one batch, before the first draw."""
+        assert self.ssa is not None
+        monsters = []
+        actor_placeholders = []
+        objects = []
+        for layer in self.ssa.layer_list:
+            for actor in layer.actors:
+                # See Drawer.get_bb_actor and Drawer._draw_actor_sprite
+                if actor.actor.entid <= 0:
+                    actor_placeholders.append((actor.actor.id, actor.pos.direction.id))
+                if actor.actor.entid != 0:
+                    monsters.append((actor.actor.entid, actor.pos.direction.id))
+            for obj in layer.objects:
+                if obj.object.name != 'NULL':
+                    objects.append(obj.object.name)
+        await self.module.get_sprite_provider().prefetch(monsters, actor_placeholders, objects, pin_owner=self)
+
     def _init_all_the_stores(self):
         self._suppress_events = True
         # MAP BGS
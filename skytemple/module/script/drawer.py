@@ -14,6 +14,7 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import itertools
 from enum import auto, Enum
 from typing import Tuple, Union, Callable, Optional, List
 
@@ -23,6 +24,7 @@ from gi.repository import Gtk, GLib
 from explorerscript.source_map import SourceMapPositionMark
 from skytemple.core.mapbg_util.drawer_plugin.grid import GridDrawerPlugin
 from skytemple.core.mapbg_util.drawer_plugin.selection import SelectionDrawerPlugin
+from skytemple.core.spatial_index import SpatialIndex
 from skytemple.core.sprite_provider import SpriteProvider
 from skytemple_files.common.ppmdu_config.script_data import Pmd2ScriptDirection
 from skytemple_files.graphics.bpc import BPC_TILE_DIM
@@ -45,6 +47,10 @@ COLOR_POS_MARKS = (0, 1.0, 0)
 COLOR_LAYER_HIGHLIGHT = (0.7, 0.7, 1, 0.7)
 Num = Union[int, float]
 Color = Tuple[Num, Num, Num]
+# Grid cell size of the hit-testing indices
+HIT_INDEX_CELL_SIZE = BPC_TILE_DIM * 4
+# Order in which entities of a layer are hit-tested (highest first, reverse drawing order)
+HIT_RANK = {SsaPerformer: 3, SsaEvent: 2, SsaObject: 1, SsaActor: 0}
 
 
 class InteractionMode(Enum):
@@ -96,6 +102,22 @@ class Drawer:
 
         self.drawing_is_active = False
 
+        # Bounding boxes of all entities, for get_under_mouse. Built on first use and updated by the
+        # entity_* methods.
+        self._hit_index: SpatialIndex[Union[SsaActor, SsaObject, SsaPerformer, SsaEvent]] = SpatialIndex(HIT_INDEX_CELL_SIZE)
+        self._pos_mark_hit_index: SpatialIndex[SourceMapPositionMark] = SpatialIndex(HIT_INDEX_CELL_SIZE)
+        self._hit_index_valid = False
+        # Insertion counter; the newest entity of a kind in a layer is drawn on top.
+        self._hit_index_seq = 0
+        # Entities whose sprite was still loading when they were indexed. Their bounding boxes change once it is.
+        self._hit_index_loading: List[Union[SsaActor, SsaObject]] = []
+
+        # Recorded drawings of the entities of each layer and of the position marks. They are replayed when drawing
+        # and only re-recorded after the entity_* methods were called for them, the selection, drag or highlighted
+        # layer changed or a sprite finished loading.
+        self._layer_surfaces: List[Optional[cairo.RecordingSurface]] = [None for _ in range(0, len(self.ssa.layer_list))]
+        self._pos_marks_surface: Optional[cairo.RecordingSurface] = None
+
     def start(self):
         """Start drawing on the DrawingArea"""
         self.drawing_is_active = True
@@ -127,37 +149,11 @@ class Drawer:
             self.tile_grid_plugin.draw(ctx, size_w, size_h, self.mouse_x, self.mouse_y)
 
         # RENDER ENTITIES
-        for layer_i, layer in enumerate(self.ssa.layer_list):
+        for layer_i in range(0, len(self.ssa.layer_list)):
             if not self._is_layer_visible(layer_i):
                 continue
-
-            for actor in layer.actors:
-                if not self._is_dragged(actor):
-                    bb = self.get_bb_actor(actor)
-                    if actor != self._selected:
-                        self._handle_layer_highlight(ctx, layer_i, *bb)
-                    self._draw_actor(ctx, actor, *bb)
-                    self._draw_hitbox_actor(ctx, actor)
-            for obj in layer.objects:
-                if not self._is_dragged(obj):
-                    bb = self.get_bb_object(obj)
-                    if obj != self._selected:
-                        self._handle_layer_highlight(ctx, layer_i, *bb)
-                    self._draw_object(ctx, obj, *bb)
-                    self._draw_hitbox_object(ctx, obj)
-            for trigger in layer.events:
-                if not self._is_dragged(trigger):
-                    bb = self.get_bb_trigger(trigger)
-                    if trigger != self._selected:
-                        self._handle_layer_highlight(ctx, layer_i, *bb)
-                    self._draw_trigger(ctx, trigger, *bb)
-            for performer in layer.performers:
-                if not self._is_dragged(performer):
-                    bb = self.get_bb_performer(performer)
-                    if performer != self._selected:
-                        self._handle_layer_highlight(ctx, layer_i, *bb)
-                    self._draw_hitbox_performer(ctx, performer)
-                    self._draw_performer(ctx, performer, *bb)
+            ctx.set_source_surface(self._get_layer_surface(layer_i))
+            ctx.paint()
 
         # Black out bg a bit
         if self._edit_pos_marks:
@@ -166,9 +162,9 @@ class Drawer:
             ctx.fill()
 
         # RENDER POSITION MARKS
-        for pos_mark in self.position_marks:
-            bb = self.get_bb_pos_mark(pos_mark)
-            self._draw_pos_mark(ctx, pos_mark, *bb)
+        if len(self.position_marks) > 0:
+            ctx.set_source_surface(self._get_pos_marks_surface())
+            ctx.paint()
 
         # Cursor / Active selected / Place mode
         self._handle_selection(ctx)
@@ -202,6 +198,58 @@ class Drawer:
 
         return True
 
+    def _get_layer_surface(self, layer_i: int) -> cairo.RecordingSurface:
+        """Returns the recorded drawing of all entities of the layer, except the one currently dragged."""
+        if self._layer_surfaces[layer_i] is None:
+            surface = cairo.RecordingSurface(cairo.Content.COLOR_ALPHA, None)
+            ctx = cairo.Context(surface)
+            ctx.set_antialias(cairo.Antialias.NONE)
+            layer = self.ssa.layer_list[layer_i]
+            for actor in layer.actors:
+                if not self._is_dragged(actor):
+                    bb = self.get_bb_actor(actor)
+                    if actor != self._selected:
+                        self._handle_layer_highlight(ctx, layer_i, *bb)
+                    self._draw_actor(ctx, actor, *bb)
+                    self._draw_hitbox_actor(ctx, actor)
+            for obj in layer.objects:
+                if not self._is_dragged(obj):
+                    bb = self.get_bb_object(obj)
+                    if obj != self._selected:
+                        self._handle_layer_highlight(ctx, layer_i, *bb)
+                    self._draw_object(ctx, obj, *bb)
+                    self._draw_hitbox_object(ctx, obj)
+            for trigger in layer.events:
+                if not self._is_dragged(trigger):
+                    bb = self.get_bb_trigger(trigger)
+                    if trigger != self._selected:
+                        self._handle_layer_highlight(ctx, layer_i, *bb)
+                    self._draw_trigger(ctx, trigger, *bb)
+            for performer in layer.performers:
+                if not self._is_dragged(performer):
+                    bb = self.get_bb_performer(performer)
+                    if performer != self._selected:
+                        self._handle_layer_highlight(ctx, layer_i, *bb)
+                    self._draw_hitbox_performer(ctx, performer)
+                    self._draw_performer(ctx, performer, *bb)
+            if any(self._is_sprite_loading(entity) for entity in itertools.chain(layer.actors, layer.objects)):
+                # Recorded with the loader sprite, record again next time.
+                return surface
+            self._layer_surfaces[layer_i] = surface
+        return self._layer_surfaces[layer_i]  # type: ignore
+
+    def _get_pos_marks_surface(self) -> cairo.RecordingSurface:
+        """Returns the recorded drawing of all position marks."""
+        if self._pos_marks_surface is None:
+            surface = cairo.RecordingSurface(cairo.Content.COLOR_ALPHA, None)
+            ctx = cairo.Context(surface)
+            ctx.set_antialias(cairo.Antialias.NONE)
+            for pos_mark in self.position_marks:
+                bb = self.get_bb_pos_mark(pos_mark)
+                self._draw_pos_mark(ctx, pos_mark, *bb)
+            self._pos_marks_surface = surface
+        return self._pos_marks_surface
+
     def selection_draw_callback(self, ctx: cairo.Context, x: int, y: int):
         if self.interaction_mode == InteractionMode.SELECT:
             if self._selected is not None and self._selected__drag is not None:
@@ -244,27 +292,11 @@ class Drawer:
         Elements are searched in reversed drawing order (so what's drawn on top is also taken).
         Does not return positon marks under the mouse.
         """
-        for layer_i, layer in enumerate(reversed(self.ssa.layer_list)):
-            layer_i = len(self.ssa.layer_list) - layer_i - 1
-            if not self._is_layer_visible(layer_i):
-                continue
-
-            for performer in reversed(layer.performers):
-                bb = self.get_bb_performer(performer)
-                if self._is_in_bb(*bb, self.mouse_x, self.mouse_y):
-                    return layer_i, performer
-            for trigger in reversed(layer.events):
-                bb = self.get_bb_trigger(trigger)
-                if self._is_in_bb(*bb, self.mouse_x, self.mouse_y):
-                    return layer_i, trigger
-            for obj in reversed(layer.objects):
-                bb = self.get_bb_object(obj)
-                if self._is_in_bb(*bb, self.mouse_x, self.mouse_y):
-                    return layer_i, obj
-            for actor in reversed(layer.actors):
-                bb = self.get_bb_actor(actor)
-                if self._is_in_bb(*bb, self.mouse_x, self.mouse_y):
-                    return layer_i, actor
+        self._ensure_hit_index()
+        for entity in self._hit_index.query(self.mouse_x, self.mouse_y):
+            layer_i = self._hit_index.get_priority(entity)[0]
+            if self._is_layer_visible(layer_i):
+                return layer_i, entity
         return None, None
 
     def get_pos_mark_under_mouse(self) -> Optional[SourceMapPositionMark]:
@@ -272,12 +304,128 @@ class Drawer:
         Returns the first position mark under the mouse position, if any.
         Elements are searched in reversed drawing order (so what's drawn on top is also taken).
         """
-        for pos_mark in reversed(self.position_marks):
-            bb = self.get_bb_pos_mark(pos_mark)
-            if self._is_in_bb(*bb, self.mouse_x, self.mouse_y):
-                return pos_mark
+        self._ensure_hit_index()
+        for pos_mark in self._pos_mark_hit_index.query(self.mouse_x, self.mouse_y):
+            return pos_mark
         return None
 
+    def entity_added(self, entity: Union[SsaActor, SsaObject, SsaPerformer, SsaEvent, SourceMapPositionMark],
+                     layer: Optional[int] = None):
+        """Must be called after an entity was added to the end of its list in the given layer of the scene."""
+        self._invalidate_entity_surface(entity, layer)
+        if not self._hit_index_valid:
+            return
+        if isinstance(entity, SourceMapPositionMark):
+            self._hit_index_seq += 1
+            self._pos_mark_hit_index.insert(entity, self.get_bb_pos_mark(entity), self._hit_index_seq)
+            return
+        assert layer is not None
+        self._hit_index_seq += 1
+        self._index_entity(entity, (layer, HIT_RANK[type(entity)], self._hit_index_seq))
+
+    def entity_changed(self, entity: Union[SsaActor, SsaObject, SsaPerformer, SsaEvent, SourceMapPositionMark],
+                       layer: Optional[int] = None):
+        """
+        Must be called after an entity was moved, resized or otherwise changed in a way that may change how it is
+        drawn. If it was moved to another layer, it must have been added to the end of its list there.
+        """
+        self._invalidate_entity_surface(entity, layer)
+        if not self._hit_index_valid:
+            # The previous layer is unknown
+            self._invalidate_layer_surfaces()
+            return
+        if isinstance(entity, SourceMapPositionMark):
+            if entity in self._pos_mark_hit_index:
+                self._pos_mark_hit_index.insert(
+                    entity, self.get_bb_pos_mark(entity), self._pos_mark_hit_index.get_priority(entity)
+                )
+            return
+        if entity in self._hit_index and self._hit_index.get_priority(entity)[0] == layer:
+            self._index_entity(entity, self._hit_index.get_priority(entity))
+        else:
+            if entity in self._hit_index:
+                self._invalidate_layer_surface(self._hit_index.get_priority(entity)[0])
+            self.entity_added(entity, layer)
+
+    def entity_removed(self, entity: Union[SsaActor, SsaObject, SsaPerformer, SsaEvent, SourceMapPositionMark],
+                       layer: Optional[int] = None):
+        """Must be called after an entity was removed from the given layer of the scene."""
+        self._invalidate_entity_surface(entity, layer)
+        if isinstance(entity, SourceMapPositionMark):
+            self._pos_mark_hit_index.remove(entity)
+        else:
+            self._hit_index.remove(entity)
+
+    def _ensure_hit_index(self):
+        if self._hit_index_valid:
+            loading = self._hit_index_loading
+            self._hit_index_loading = []
+            for entity in loading:
+                if entity in self._hit_index:
+                    self._index_entity(entity, self._hit_index.get_priority(entity))
+            return
+        self._hit_index.clear()
+        self._pos_mark_hit_index.clear()
+        self._hit_index_loading = []
+        self._hit_index_valid = True
+        for layer_i, layer in enumerate(self.ssa.layer_list):
+            for entities in (layer.actors, layer.objects, layer.events, layer.performers):
+                for entity in entities:
+                    self.entity_added(entity, layer_i)
+        for pos_mark in self.position_marks:
+            self.entity_added(pos_mark)
+
+    def _invalidate_hit_index(self):
+        self._hit_index_valid = False
+
+    def _invalidate_entity_surface(
+            self, entity: Optional[Union[SsaActor, SsaObject, SsaPerformer, SsaEvent, SourceMapPositionMark]],
+            layer: Optional[int] = None
+    ):
+        """Invalidates the recorded drawing containing the entity. If layer is not given, it's looked up."""
+        if entity is None:
+            return
+        if isinstance(entity, SourceMapPositionMark):
+            self._pos_marks_surface = None
+            return
+        if layer is None and self._hit_index_valid and entity in self._hit_index:
+            layer = self._hit_index.get_priority(entity)[0]
+        if layer is None:
+            self._invalidate_layer_surfaces()
+        else:
+            self._invalidate_layer_surface(layer)
+
+    def _invalidate_layer_surface(self, layer_i: Optional[int]):
+        if layer_i is not None and 0 <= layer_i < len(self._layer_surfaces):
+            self._layer_surfaces[layer_i] = None
+
+    def _invalidate_layer_surfaces(self):
+        self._layer_surfaces = [None for _ in range(0, len(self._layer_surfaces))]
+
+    def _index_entity(self, entity: Union[SsaActor, SsaObject, SsaPerformer, SsaEvent], priority: Tuple[int, int, int]):
+        self._hit_index.insert(entity, self._get_bb(entity), priority)
+        if self._is_sprite_loading(entity):
+            self._hit_index_loading.append(entity)  # type: ignore
+
+    def _is_sprite_loading(self, entity: Union[SsaActor, SsaObject, SsaPerformer, SsaEvent]) -> bool:
+        loader = self.sprite_provider.get_loader()[0]
+        if isinstance(entity, SsaActor):
+            if entity.actor.entid <= 0:
+                return self.sprite_provider.get_actor_placeholder(entity.actor.id, entity.pos.direction.id)[0] is loader  # type: ignore
+            return self.sprite_provider.get_monster(entity.actor.entid, entity.pos.direction.id)[0] is loader  # type: ignore
+        if isinstance(entity, SsaObject) and entity.object.name != 'NULL':
+            return self.sprite_provider.get_for_object(entity.object.name)[0] is loader
+        return False
+
+    def _get_bb(self, entity: Union[SsaActor, SsaObject, SsaPerformer, SsaEvent]) -> Tuple[int, int, int, int]:
+        if isinstance(entity, SsaActor):
+            return self.get_bb_actor(entity)
+        if isinstance(entity, SsaObject):
+            return self.get_bb_object(entity)
+        if isinstance(entity, SsaPerformer):
+            return self.get_bb_performer(entity)
+        return self.get_bb_trigger(entity)
+
     def set_draw_tile_grid(self, v):
         self.draw_tile_grid = v
 
@@ -290,9 +438,9 @@ class Drawer:
         if y is None:
             y = actor.pos.y_absolute
         if actor.actor.entid <= 0:
-            _, cx, cy, w, h = self.sprite_provider.get_actor_placeholder(actor.actor.id, actor.pos.direction.id, lambda: GLib.idle_add(self._redraw))  # type: ignore
+            _, cx, cy, w, h = self.sprite_provider.get_actor_placeholder(actor.actor.id, actor.pos.direction.id, lambda: GLib.idle_add(self._on_sprite_loaded))  # type: ignore
         else:
-            _, cx, cy, w, h = self.sprite_provider.get_monster(actor.actor.entid, actor.pos.direction.id, lambda: GLib.idle_add(self._redraw))  # type: ignore
+            _, cx, cy, w, h = self.sprite_provider.get_monster(actor.actor.entid, actor.pos.direction.id, lambda: GLib.idle_add(self._on_sprite_loaded))  # type: ignore
         return x - cx, y - cy, w, h
 
     def _draw_hitbox_actor(self, ctx: cairo.Context, actor: SsaActor):
@@ -312,7 +460,7 @@ class Drawer:
             y = object.pos.y_absolute
         if object.object.name != 'NULL':
             # Load sprite to get dims.
-            _, cx, cy, w, h = self.sprite_provider.get_for_object(object.object.name, lambda: GLib.idle_add(self._redraw))
+            _, cx, cy, w, h = self.sprite_provider.get_for_object(object.object.name, lambda: GLib.idle_add(self._on_sprite_loaded))
             return x - cx, y - cy, w, h
         return self._get_pmd_bounding_box(
             x, y, object.hitbox_w * BPC_TILE_DIM, object.hitbox_h * BPC_TILE_DIM
@@ -547,11 +695,11 @@ class Drawer:
         """Draws the sprite for an actor"""
         if actor.actor.entid == 0:
             sprite = self.sprite_provider.get_actor_placeholder(
-                actor.actor.id, actor.pos.direction.id, self._redraw  # type: ignore
+                actor.actor.id, actor.pos.direction.id, lambda: GLib.idle_add(self._on_sprite_loaded), pin_owner=self  # type: ignore
             )[0]
         else:
             sprite = self.sprite_provider.get_monster(
-                actor.actor.entid, actor.pos.direction.id, lambda: GLib.idle_add(self._redraw)  # type: ignore
+                actor.actor.entid, actor.pos.direction.id, lambda: GLib.idle_add(self._on_sprite_loaded), pin_owner=self  # type: ignore
             )[0]
         ctx.translate(x, y)
         ctx.set_source_surface(sprite)
@@ -561,7 +709,7 @@ class Drawer:
 
     def _draw_object_sprite(self, ctx: cairo.Context, obj: SsaObject, x, y):
         """Draws the sprite for an object"""
-        sprite = self.sprite_provider.get_for_object(obj.object.name, lambda: GLib.idle_add(self._redraw))[0]
+        sprite = self.sprite_provider.get_for_object(obj.object.name, lambda: GLib.idle_add(self._on_sprite_loaded), pin_owner=self)[0]
         ctx.translate(x, y)
         ctx.set_source_surface(sprite)
         ctx.get_source().set_filter(cairo.Filter.NEAREST)
@@ -675,6 +823,8 @@ class Drawer:
         self.draw_area.queue_draw()
 
     def set_sector_highlighted(self, sector_id):
+        self._invalidate_layer_surface(self._sector_highlighted)
+        self._invalidate_layer_surface(sector_id)
         self._sector_highlighted = sector_id
         self.draw_area.queue_draw()
 
@@ -682,26 +832,42 @@ class Drawer:
         return self._sector_highlighted
 
     def set_selected(self, entity: Optional[Union[SsaActor, SsaObject, SsaPerformer, SsaEvent, SourceMapPositionMark]]):
+        # The selected entity is drawn without layer highlight
+        self._invalidate_layer_surface(self._sector_highlighted)
+        if self._selected__drag is not None:
+            self._invalidate_entity_surface(self._selected)
+            self._invalidate_entity_surface(entity)
         self._selected = entity
         self.draw_area.queue_draw()
 
     def add_position_marks(self, pos_marks):
         self.position_marks += pos_marks
+        self._pos_marks_surface = None
+        for pos_mark in pos_marks:
+            self.entity_added(pos_mark)
 
     def set_drag_position(self, x: int, y: int):
         """Start dragging. x/y is the offset on the entity, where the dragging was started."""
+        # The dragged entity is drawn separately
+        self._invalidate_entity_surface(self._selected)
         self._selected__drag = (x, y)
 
     def end_drag(self):
+        if self._selected__drag is not None:
+            self._invalidate_entity_surface(self._selected)
         self._selected__drag = None
 
     def sector_added(self):
         self._sectors_solo.append(False)
         self._sectors_visible.append(True)
+        self._layer_surfaces.append(None)
 
     def sector_removed(self, id):
         del self._sectors_solo[id]
         del self._sectors_visible[id]
+        del self._layer_surfaces[id]
+        self._invalidate_layer_surfaces()
+        self._invalidate_hit_index()
         if self._sector_highlighted == id:
             self._sector_highlighted = None
         elif self._sector_highlighted > id:
@@ -714,6 +880,8 @@ class Drawer:
         )
 
     def unload(self):
+        if self.sprite_provider is not None:
+            self.sprite_provider.release_pins(self)
         self.draw_area = None
         self.ssa = None
         self.map_bg = None
@@ -734,12 +902,24 @@ class Drawer:
         self.tile_grid_plugin = None
         self.scale = 1
         self.drawing_is_active = False
+        self._hit_index.clear()
+        self._pos_mark_hit_index.clear()
+        self._hit_index_loading = []
+        self._hit_index_valid = False
+        self._layer_surfaces = []
+        self._pos_marks_surface = None
 
     def _redraw(self):
         if self.draw_area is None or self.draw_area.get_parent() is None:
             return
         self.draw_area.queue_draw()
 
+    def _on_sprite_loaded(self):
+        if self.draw_area is None:
+            return
+        self._invalidate_layer_surfaces()
+        self._redraw()
+
     def edit_position_marks(self):
         self._edit_pos_marks = True
 
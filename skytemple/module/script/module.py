@@ -24,7 +24,7 @@ from explorerscript.source_map import SourceMapPositionMark
 from skytemple.core.abstract_module import AbstractModule
 from skytemple.core.model_context import ModelContext
 from skytemple.core.open_request import OpenRequest, REQUEST_TYPE_SCENE, REQUEST_TYPE_SCENE_SSE, REQUEST_TYPE_SCENE_SSA, \
-    REQUEST_TYPE_SCENE_SSS
+    REQUEST_TYPE_SCENE_SSS, REQUEST_TYPE_SCRIPT
 from skytemple.core.rom_project import RomProject, BinaryName
 from skytemple.core.sprite_provider import SpriteProvider
 from skytemple.core.ssb_debugger.ssb_loaded_file_handler import SsbLoadedFileHandler
@@ -39,7 +39,8 @@ from skytemple.module.script.controller.ssb import SsbController, SCRIPT_SCRIPTS
 from skytemple.module.script.controller.lsd import LsdController
 from skytemple.module.script.controller.main import MainController, SCRIPT_SCENES
 from skytemple.module.script.controller.sub import SubController
-from skytemple_files.common.script_util import load_script_files, SCRIPT_DIR, SSA_EXT, SSS_EXT, LSD_EXT
+from skytemple.module.script.script_catalog import ScriptCatalog
+from skytemple_files.common.script_util import SCRIPT_DIR, SSA_EXT, SSS_EXT, LSD_EXT, SSE_EXT
 from skytemple_files.common.types.file_types import FileType
 from skytemple_files.common.i18n_util import f, _
 from skytemple_files.container.dungeon_bin.model import DungeonBinPack
@@ -69,8 +70,10 @@ class ScriptModule(AbstractModule):
         """Loads the list of backgrounds for the ROM."""
         self.project = rom_project
 
-        # Load all scripts
-        self.script_engine_file_tree = load_script_files(self.project.get_rom_folder(SCRIPT_DIR), self.get_level_list() if self.has_level_list() else None)
+        # Load the index of all scripts
+        self.script_catalog = ScriptCatalog.load(
+            self.project, lambda: self.get_level_list() if self.has_level_list() else None
+        )
 
         # Tree iters for handle_request:
         self._map_scene_root: Dict[str, Gtk.TreeIter] = {}
@@ -79,6 +82,8 @@ class ScriptModule(AbstractModule):
         self._map_ssas: Dict[str, Dict[str, Gtk.TreeIter]] = {}
         self._map_sse: Dict[str, Gtk.TreeIter] = {}
         self._map_ssss: Dict[str, Dict[str, Gtk.TreeIter]] = {}
+        # Placeholder rows of the maps, whose scenes are not in the tree yet (see _load_map_tree_items)
+        self._map_placeholders: Dict[str, Gtk.TreeIter] = {}
 
         self._tree_model: Optional[TreeStore] = None
         self._root = None
@@ -129,70 +134,112 @@ class ScriptModule(AbstractModule):
         self._other_node = other
         self._sub_nodes = sub_nodes
 
-        for i, map_obj in enumerate(self.script_engine_file_tree['maps'].values()):
+        for map_obj in self.script_catalog.maps.values():
             parent = other
             if map_obj['name'][0] in sub_nodes.keys():
                 parent = sub_nodes[map_obj['name'][0]]
-            self._map_ssas[map_obj['name']] = {}
-            self._map_ssss[map_obj['name']] = {}
             #    -> (Map Name) [map]
             map_root = item_store.append(parent, [
                 'skytemple-folder-symbolic', map_obj['name'], self,  MapController, map_obj['name'], False, '', True
             ])
             self._map_scene_root[map_obj['name']] = map_root
+            # The scenes are added when the map is expanded, until then the placeholder makes it expandable.
+            self._map_placeholders[map_obj['name']] = item_store.append(map_root, [
+                '', '', self,  MapController, map_obj['name'], False, '', True
+            ])
+
+        recursive_generate_item_store_row_label(self._tree_model[root])
 
-            if map_obj['enter_sse'] is not None:
-                #          -> Enter [sse]
-                self._map_sse[map_obj['name']] = item_store.append(map_root, [
-                    'skytemple-e-ground-symbolic', _('Enter (sse)'), self,  SsaController, {
-                        'map': map_obj['name'],
-                        'file': f"{SCRIPT_DIR}/{map_obj['name']}/{map_obj['enter_sse']}",
-                        'type': 'sse',
-                        'scripts': map_obj['enter_ssbs'].copy()
-                    }, False, '', True
-                ])
-
-            #       -> Acting Scripts [lsd]
-            acting_root = item_store.append(map_root, [
-                'skytemple-folder-open-symbolic', _('Acting (ssa)'), self,  LsdController, map_obj['name'], False, '', True
+    def load_deferred_tree_items(self, item_store: TreeStore, treeiter: Gtk.TreeIter):
+        if item_store[treeiter][3] == MapController:
+            self._load_map_tree_items(item_store[treeiter][4])
+
+    def load_deferred_tree_items_matching(self, item_store: TreeStore, search_text: str):
+        # Only scene names are matched: the map rows are always in the tree and the fixed labels of the
+        # scene rows would match every map. Maps matching by name load their scenes when expanded.
+        for mapname in list(self._map_placeholders.keys()):
+            if any(search_text in stem.lower() for stem in self.script_catalog.iter_scene_stems(mapname)):
+                self._load_map_tree_items(mapname)
+
+    def _load_map_tree_items(self, mapname):
+        """Adds the scene rows of a map to the tree, if they weren't added yet."""
+        if mapname not in self._map_placeholders:
+            return
+        item_store = self._tree_model
+        map_obj = self.script_catalog.maps[mapname]
+        map_root = self._map_scene_root[mapname]
+        self._map_ssas[mapname] = {}
+        self._map_ssss[mapname] = {}
+
+        if map_obj['enter_sse'] is not None:
+            #          -> Enter [sse]
+            self._map_sse[mapname] = item_store.append(map_root, [
+                'skytemple-e-ground-symbolic', _('Enter (sse)'), self,  SsaController, {
+                    'map': mapname,
+                    'file': f"{SCRIPT_DIR}/{mapname}/{map_obj['enter_sse']}",
+                    'type': 'sse',
+                    'scripts': map_obj['enter_ssbs'].copy()
+                }, False, '', True
             ])
-            self._acting_roots[map_obj['name']] = acting_root
-            for ssa, ssb in map_obj['ssas']:
-                stem = ssa[:-len(SSA_EXT)]
-                #             -> Scene [ssa]
-                filename = f"{SCRIPT_DIR}/{map_obj['name']}/{ssa}"
-                self._map_ssas[map_obj['name']][filename] = item_store.append(acting_root, [
-                    'skytemple-e-ground-symbolic', stem,
-                    self, SsaController, {
-                        'map': map_obj['name'],
-                        'file': filename,
-                        'type': 'ssa',
-                        'scripts': [ssb]
-                    }, False, '', True
-                ])
-
-            #       -> Sub Scripts [sub]
-            sub_root = item_store.append(map_root, [
-                'skytemple-folder-open-symbolic', _('Sub (sss)'), self,  SubController, map_obj['name'], False, '', True
+
+        #       -> Acting Scripts [lsd]
+        acting_root = item_store.append(map_root, [
+            'skytemple-folder-open-symbolic', _('Acting (ssa)'), self,  LsdController, mapname, False, '', True
+        ])
+        self._acting_roots[mapname] = acting_root
+        for ssa, ssb in map_obj['ssas']:
+            stem = ssa[:-len(SSA_EXT)]
+            #             -> Scene [ssa]
+            filename = f"{SCRIPT_DIR}/{mapname}/{ssa}"
+            self._map_ssas[mapname][filename] = item_store.append(acting_root, [
+                'skytemple-e-ground-symbolic', stem,
+                self, SsaController, {
+                    'map': mapname,
+                    'file': filename,
+                    'type': 'ssa',
+                    'scripts': [ssb]
+                }, False, '', True
             ])
-            self._sub_roots[map_obj['name']] = sub_root
-            for sss, ssbs in map_obj['subscripts'].items():
-                stem = sss[:-len(SSS_EXT)]
-                #             -> Scene [sss]
-                filename = f"{SCRIPT_DIR}/{map_obj['name']}/{sss}"
-                self._map_ssss[map_obj['name']][filename] = item_store.append(sub_root, [
-                    'skytemple-e-ground-symbolic', stem,
-                    self, SsaController, {
-                        'map': map_obj['name'],
-                        'file': filename,
-                        'type': 'sss',
-                        'scripts': ssbs.copy()
-                    }, False, '', True
-                ])
 
-        recursive_generate_item_store_row_label(self._tree_model[root])
+        #       -> Sub Scripts [sub]
+        sub_root = item_store.append(map_root, [
+            'skytemple-folder-open-symbolic', _('Sub (sss)'), self,  SubController, mapname, False, '', True
+        ])
+        self._sub_roots[mapname] = sub_root
+        for sss, ssbs in map_obj['subscripts'].items():
+            stem = sss[:-len(SSS_EXT)]
+            #             -> Scene [sss]
+            filename = f"{SCRIPT_DIR}/{mapname}/{sss}"
+            self._map_ssss[mapname][filename] = item_store.append(sub_root, [
+                'skytemple-e-ground-symbolic', stem,
+                self, SsaController, {
+                    'map': mapname,
+                    'file': filename,
+                    'type': 'sss',
+                    'scripts': ssbs.copy()
+                }, False, '', True
+            ])
+
+        item_store.remove(self._map_placeholders.pop(mapname))
+        recursive_generate_item_store_row_label(item_store[map_root])
 
     def handle_request(self, request: OpenRequest) -> Optional[Gtk.TreeIter]:
+        if request.type == REQUEST_TYPE_SCRIPT:
+            # Scripts are edited in the debugger; the scene they belong to is opened in the main window.
+            SkyTempleMainController.debugger_manager().open_ssb(request.identifier, SkyTempleMainController.window())
+            scene = self.project.get_xref_index().get_scene_for_script(request.identifier)
+            if scene is None:
+                return None
+            mapname, scene_name = scene.split('/')[-2:]
+            if scene_name.endswith(SSE_EXT):
+                return self.handle_request(OpenRequest(REQUEST_TYPE_SCENE_SSE, mapname))
+            if scene_name.endswith(SSA_EXT):
+                return self.handle_request(OpenRequest(REQUEST_TYPE_SCENE_SSA, (mapname, scene_name)))
+            return self.handle_request(OpenRequest(REQUEST_TYPE_SCENE_SSS, (mapname, scene_name)))
+        if request.type == REQUEST_TYPE_SCENE or request.type == REQUEST_TYPE_SCENE_SSE:
+            self._load_map_tree_items(request.identifier)
+        elif request.type == REQUEST_TYPE_SCENE_SSA or request.type == REQUEST_TYPE_SCENE_SSS:
+            self._load_map_tree_items(request.identifier[0])
         if request.type == REQUEST_TYPE_SCENE:
             # if we have an enter scene, open it directly.
             if request.identifier in self._map_sse:
@@ -225,23 +272,12 @@ class ScriptModule(AbstractModule):
 
     def get_scenes_for_map(self, mapname):
         """Returns the filenames (not including paths) of all SSE/SSA/SSS files for this map."""
-        if mapname not in self.script_engine_file_tree['maps']:
-            return []
-        map_obj = self.script_engine_file_tree['maps'][mapname]
-
-        scenes = []
-        if map_obj['enter_sse'] is not None:
-            scenes.append(map_obj['enter_sse'])
-        for ssa, _ in map_obj['ssas']:
-            scenes.append(ssa)
-        for sss in map_obj['subscripts'].keys():
-            scenes.append(sss)
-
-        return scenes
+        return self.script_catalog.get_scenes_for_map(mapname)
 
     def mark_as_modified(self, mapname, type, filename):
         """Mark a specific scene as modified"""
         self.project.mark_as_modified(filename)
+        self._load_map_tree_items(mapname)
 
         treeiter = None
         if type == 'ssa':
@@ -317,6 +353,7 @@ class ScriptModule(AbstractModule):
         parent = self._other_node
         if new_name[0] in self._sub_nodes.keys():
             parent = self._sub_nodes[new_name[0]]
+        self.script_catalog.add_map(new_name)
         self._map_ssas[new_name] = {}
         self._map_ssss[new_name] = {}
         map_root = self._tree_model.append(parent, [
@@ -337,6 +374,7 @@ class ScriptModule(AbstractModule):
         enter = None
         acting = None
         sub = None
+        self._load_map_tree_items(name)
         child = self._tree_model.iter_children(self._map_scene_root[name])
         while child is not None:
             controller = self._tree_model[child][3]
@@ -355,7 +393,9 @@ class ScriptModule(AbstractModule):
 
     def add_scene_enter(self, level_name):
         scene_name = 'enter'
+        self._load_map_tree_items(level_name)
         file_name, ssb_file_name = self._create_scene_file(level_name, scene_name, 'sse', matching_ssb='00')
+        self.script_catalog.add_scene(level_name, 'sse', file_name.split('/')[-1], ssb_file_name.split('/')[-1])
         self._map_sse[level_name] = self._tree_model.append(self._map_scene_root[level_name], [
             'skytemple-e-ground-symbolic', _('Enter (sse)'), self, SsaController, {
                 'map': level_name,
@@ -368,7 +408,9 @@ class ScriptModule(AbstractModule):
         self.mark_as_modified(level_name, 'sse', file_name)
 
     def add_scene_acting(self, level_name, scene_name):
+        self._load_map_tree_items(level_name)
         file_name, ssb_file_name = self._create_scene_file(level_name, scene_name, 'ssa', matching_ssb='')
+        self.script_catalog.add_scene(level_name, 'ssa', file_name.split('/')[-1], ssb_file_name.split('/')[-1])
         lsd_path = f'{SCRIPT_DIR}/{level_name}/{level_name.lower()}{LSD_EXT}'
         if not self.project.file_exists(lsd_path):
             self.project.create_new_file(lsd_path, FileType.LSD.new(), FileType.LSD)
@@ -387,7 +429,9 @@ class ScriptModule(AbstractModule):
         self.mark_as_modified(level_name, 'ssa', file_name)
 
     def add_scene_sub(self, level_name, scene_name):
+        self._load_map_tree_items(level_name)
         file_name, ssb_file_name = self._create_scene_file(level_name, scene_name, 'sss', matching_ssb='00')
+        self.script_catalog.add_scene(level_name, 'sss', file_name.split('/')[-1], ssb_file_name.split('/')[-1])
         self._map_ssss[level_name][file_name] = self._tree_model.append(self._sub_roots[level_name], [
             'skytemple-e-ground-symbolic', scene_name,
             self, SsaController, {
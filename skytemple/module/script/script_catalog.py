@@ -0,0 +1,141 @@
+"""Index of the script engine files of a ROM, persisted in the project directory."""
+#  Copyright 2020-2021 Capypara and the SkyTemple Contributors
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Optional, Callable, List, Iterator
+
+from skytemple.core.rom_project import RomProject
+from skytemple_files.common.script_util import load_script_files, SCRIPT_DIR, SSA_EXT, SSS_EXT
+from skytemple_files.list.level.model import LevelListBin
+
+logger = logging.getLogger(__name__)
+
+# Increase when the format of the cache file changes.
+CATALOG_VERSION = 1
+CACHE_DIR = 'cache'
+CACHE_FILE = 'script_catalog.json'
+
+
+class ScriptCatalog:
+    """
+    The script engine files of all maps of a ROM, in the format returned by load_script_files.
+
+    Building the catalog requires a pass over the file name table and the level list of the ROM,
+    so it is stored in the project directory and only rebuilt if the ROM file changed.
+    Scenes and levels added in SkyTemple are added to the loaded catalog, the stored catalog is
+    rebuilt after the ROM is saved.
+    """
+    def __init__(self, script_files: dict):
+        self.script_files = script_files
+
+    @classmethod
+    def load(cls, project: RomProject, get_level_list: Callable[[], Optional[LevelListBin]]) -> 'ScriptCatalog':
+        """
+        Loads the catalog for the ROM of the project from the project directory or builds it,
+        if it is missing or outdated.
+        """
+        cache_path = os.path.join(project.get_project_file_manager().dir(CACHE_DIR), CACHE_FILE)
+        rom_key = cls._rom_key(project.filename)
+        script_files = cls._read(cache_path, rom_key)
+        if script_files is None:
+            logger.debug("Building the script catalog.")
+            script_files = load_script_files(project.get_rom_folder(SCRIPT_DIR), get_level_list())
+            cls._write(cache_path, rom_key, script_files)
+        return cls(script_files)
+
+    @property
+    def maps(self) -> 'OrderedDict[str, dict]':
+        return self.script_files['maps']
+
+    def get_scenes_for_map(self, mapname) -> List[str]:
+        """Returns the filenames (not including paths) of all SSE/SSA/SSS files for this map."""
+        if mapname not in self.maps:
+            return []
+        map_obj = self.maps[mapname]
+
+        scenes = []
+        if map_obj['enter_sse'] is not None:
+            scenes.append(map_obj['enter_sse'])
+        for ssa, _ in map_obj['ssas']:
+            scenes.append(ssa)
+        for sss in map_obj['subscripts'].keys():
+            scenes.append(sss)
+
+        return scenes
+
+    def iter_scene_stems(self, mapname) -> Iterator[str]:
+        """Returns the names of all SSA and SSS scenes of this map, without file extension."""
+        map_obj = self.maps[mapname]
+        for ssa, _ in map_obj['ssas']:
+            yield ssa[:-len(SSA_EXT)]
+        for sss in map_obj['subscripts'].keys():
+            yield sss[:-len(SSS_EXT)]
+
+    def add_map(self, mapname):
+        self.maps[mapname] = {
+            'name': mapname,
+            'enter_sse': None,
+            'enter_ssbs': [],
+            'subscripts': OrderedDict(),
+            'lsd': None,
+            'ssas': []
+        }
+
+    def add_scene(self, mapname, type, scene_filename, ssb_filename):
+        """Adds a new scene (filenames not including paths) to this map."""
+        map_obj = self.maps[mapname]
+        if type == 'sse':
+            map_obj['enter_sse'] = scene_filename
+            map_obj['enter_ssbs'].append(ssb_filename)
+        elif type == 'ssa':
+            map_obj['ssas'].append((scene_filename, ssb_filename))
+        elif type == 'sss':
+            map_obj['subscripts'][scene_filename] = [ssb_filename]
+
+    @staticmethod
+    def _rom_key(rom_filename) -> list:
+        stat = os.stat(rom_filename)
+        return [CATALOG_VERSION, stat.st_size, stat.st_mtime_ns]
+
+    @staticmethod
+    def _read(cache_path, rom_key) -> Optional[dict]:
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, 'r') as f:
+                data = json.load(f, object_pairs_hook=OrderedDict)
+            if data['key'] != rom_key:
+                return None
+            script_files = data['script_files']
+            for map_obj in script_files['maps'].values():
+                map_obj['ssas'] = [tuple(entry) for entry in map_obj['ssas']]
+            return script_files
+        except (OSError, ValueError, KeyError, TypeError) as ex:
+            logger.warning("Failed to read the script catalog, rebuilding it.", exc_info=ex)
+            return None
+
+    @staticmethod
+    def _write(cache_path, rom_key, script_files):
+        try:
+            with open(cache_path + '.tmp', 'w') as f:
+                json.dump({'key': rom_key, 'script_files': script_files}, f)
+            os.replace(cache_path + '.tmp', cache_path)
+        except OSError as ex:
+            logger.warning("Failed to store the script catalog.", exc_info=ex)
@@ -26,6 +26,7 @@ import cairo
 from skytemple.controller.main import MainController
 from skytemple.core.error_handler import display_error
 from skytemple.core.events.manager import EventManager
+from skytemple.core.frame_clock import FrameClock
 from skytemple.core.img_utils import pil_to_cairo_surface
 from skytemple.core.message_dialog import SkyTempleMessageDialog
 from skytemple.core.model_context import ModelContext
@@ -36,7 +37,7 @@ from skytemple_files.graphics.wan_wat.model import Wan
 from skytemple_files.common.i18n_util import f, _
 
 from PIL import Image
-from gi.repository import Gtk, GLib
+from gi.repository import Gtk
 
 from skytemple.core.module_controller import AbstractController
 
@@ -60,6 +61,7 @@ class MonsterSpriteController(AbstractController):
         self._anim_counter = 0
         self._drawing_is_active = 0
         self._draw_area = None
+        self._frame_clock_subscription: Optional[int] = None
         self._monster_bin: ModelContext[BinPack] = self.module.get_monster_bin_ctx()
         self._rendered_frame_info: List[Tuple[int, Tuple[cairo.Surface, int, int, int, int]]] = []
 
@@ -88,10 +90,13 @@ Warning: SkyTemple does not validate the files you import."""))
         """Start drawing on the DrawingArea"""
         self._drawing_is_active = True
         self._draw_area.queue_draw()
-        GLib.timeout_add(int(1000 / FPS), self._tick)
+        if self._frame_clock_subscription is None:
+            self._frame_clock_subscription = FrameClock.instance().subscribe(self._draw_area, self._tick, FPS)
 
     def stop_sprite_drawing(self):
         self._drawing_is_active = False
+        FrameClock.instance().unsubscribe(self._frame_clock_subscription)
+        self._frame_clock_subscription = None
 
     def _tick(self):
         if self._draw_area is None:
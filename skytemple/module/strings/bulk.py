@@ -0,0 +1,362 @@
+"""Streaming bulk import and export of the text strings of all languages as CSV or gettext PO files."""
+#  Copyright 2020-2021 Capypara and the SkyTemple Contributors
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import argparse
+import csv
+import os
+import re
+import sys
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, TextIO, Tuple
+
+from skytemple_files.common.ppmdu_config.data import Pmd2Language, Pmd2StringBlock
+from skytemple_files.data.str.model import Str, open_utf8
+
+# This module must not use Gtk, so that it can be used headless, see main.
+CSV_COL_BLOCK = 'block'
+CSV_COL_INDEX = 'index'
+PO_EXT = '.po'
+PATTERN_PO_ESCAPE = re.compile(r'\\(.)')
+PO_UNESCAPE = {'n': '\n', 't': '\t', 'r': '\r', '"': '"', '\\': '\\'}
+PO_ESCAPE = {'\n': '\\n', '\t': '\\t', '\r': '\\r', '"': '\\"', '\\': '\\\\'}
+PATTERN_PO_SPECIAL = re.compile(r'[\n\t\r"\\]')
+# Index of a string in a Str model -> new value, per language file name.
+StringChanges = Dict[str, Dict[int, str]]
+
+
+class StringSection(NamedTuple):
+    """A range of strings belonging to a string block. Strings are keyed by block name and index in the block."""
+    block: Pmd2StringBlock
+    start: int
+    end: int
+
+
+def string_sections(string_blocks: Dict[str, Pmd2StringBlock], number_of_strings: int) -> List[StringSection]:
+    """
+    Splits all strings into sections of the string blocks, in order. Every string belongs to exactly one section:
+    Strings not in any block get a placeholder block (like the categories of the strings editor) and strings
+    in more than one block belong to the block that starts first.
+    """
+    sections = []
+    current_index = 0
+    for block in sorted(string_blocks.values(), key=lambda b: b.begin):
+        if block.begin > current_index:
+            sections.append(_placeholder_section(current_index, block.begin))
+            current_index = block.begin
+        end = min(block.end, number_of_strings)
+        if end > current_index:
+            sections.append(StringSection(block, current_index, end))
+            current_index = end
+    if number_of_strings > current_index:
+        sections.append(_placeholder_section(current_index, number_of_strings))
+    return sections
+
+
+def export_csv(
+        file: TextIO, languages: Sequence[Pmd2Language], models: Dict[str, Str],
+        string_blocks: Dict[str, Pmd2StringBlock]
+):
+    """
+    Writes the strings of all languages (models are keyed by the file names of the languages) as CSV, one row
+    per string. The columns are the string block, the index in the block and the string of each language
+    (the header contains the locales of the languages).
+    """
+    writer = csv.writer(file)
+    writer.writerow([CSV_COL_BLOCK, CSV_COL_INDEX] + [lang.locale for lang in languages])
+    lang_strings = [models[lang.filename].strings for lang in languages]
+    for section in string_sections(string_blocks, max(len(strings) for strings in lang_strings)):
+        for idx in range(section.start, section.end):
+            writer.writerow(
+                [section.block.name, idx - section.block.begin] +
+                [strings[idx] if idx < len(strings) else '' for strings in lang_strings]
+            )
+
+
+def read_csv(
+        file: TextIO, languages: Sequence[Pmd2Language], models: Dict[str, Str],
+        string_blocks: Dict[str, Pmd2StringBlock]
+) -> StringChanges:
+    """
+    Reads a CSV file in the format of export_csv row by row and returns the strings that differ from the models.
+    The language columns are identified by locale, name or file name; languages without a column are not changed.
+    Raises a ValueError for invalid files.
+    """
+    reader = csv.reader(file)
+    header = next(reader, None)
+    if header is None or header[:2] != [CSV_COL_BLOCK, CSV_COL_INDEX]:
+        raise ValueError(f"The CSV file must start with a header row with the columns '{CSV_COL_BLOCK}', "
+                         f"'{CSV_COL_INDEX}' and one column for each language.")
+    columns = [_find_language(languages, name) for name in header[2:]]
+    changes: StringChanges = {lang.filename: {} for lang in columns}
+    blocks = _blocks_by_name(languages, models, string_blocks)
+    for row in reader:
+        if len(row) < 1:
+            continue
+        if len(row) != len(header):
+            raise ValueError(f"Line {reader.line_num}: Expected {len(header)} columns, got {len(row)}.")
+        idx = _resolve_index(blocks, row[0], row[1], f"Line {reader.line_num}")
+        for lang, value in zip(columns, row[2:]):
+            _add_change(changes, models[lang.filename], lang.filename, idx, value)
+    return changes
+
+
+def export_po(
+        file: TextIO, language: Pmd2Language, model: Str, source_model: Str,
+        string_blocks: Dict[str, Pmd2StringBlock]
+):
+    """
+    Writes the strings of a language as a gettext PO file. Each string is keyed by its string block and index
+    (the message context, "<block>:<index>"). The message IDs are the strings of source_model.
+    """
+    file.write('msgid ""\n')
+    file.write('msgstr ""\n')
+    file.write('"Content-Type: text/plain; charset=UTF-8\\n"\n')
+    file.write(f'"Language: {_po_escape(language.locale)}\\n"\n')
+    for section in string_sections(string_blocks, len(model.strings)):
+        for idx in range(section.start, section.end):
+            source = source_model.strings[idx] if idx < len(source_model.strings) else ''
+            file.write('\n')
+            file.write(f'msgctxt "{_po_escape(section.block.name)}:{idx - section.block.begin}"\n')
+            _write_po_string(file, 'msgid', source)
+            _write_po_string(file, 'msgstr', model.strings[idx])
+
+
+def read_po(
+        file: TextIO, language: Pmd2Language, model: Str, string_blocks: Dict[str, Pmd2StringBlock]
+) -> StringChanges:
+    """
+    Reads a PO file in the format of export_po entry by entry and returns the strings that differ from the model.
+    Untranslated (empty) and fuzzy entries are ignored. Raises a ValueError for invalid files.
+    """
+    changes: StringChanges = {language.filename: {}}
+    blocks = _blocks_by_name([language], {language.filename: model}, string_blocks)
+    for line_num, context, value, fuzzy in _parse_po(file):
+        if context is None or value == '' or fuzzy:
+            # Header, untranslated or fuzzy
+            continue
+        block_name, _sep, index = context.rpartition(':')
+        idx = _resolve_index(blocks, block_name, index, f"Entry in line {line_num}")
+        _add_change(changes, model, language.filename, idx, value)
+    return changes
+
+
+def export_po_dir(
+        directory: str, languages: Sequence[Pmd2Language], models: Dict[str, Str],
+        string_blocks: Dict[str, Pmd2StringBlock], source_language: Pmd2Language
+):
+    """Writes one PO file (see export_po) per language into directory, named after the locales."""
+    os.makedirs(directory, exist_ok=True)
+    for lang in languages:
+        with open_utf8(os.path.join(directory, lang.locale + PO_EXT), 'w') as file:
+            export_po(file, lang, models[lang.filename], models[source_language.filename], string_blocks)
+
+
+def read_po_dir(
+        directory: str, languages: Sequence[Pmd2Language], models: Dict[str, Str],
+        string_blocks: Dict[str, Pmd2StringBlock]
+) -> StringChanges:
+    """Reads the PO files (see read_po) for all languages in directory, that exist."""
+    changes: StringChanges = {}
+    for lang in languages:
+        path = os.path.join(directory, lang.locale + PO_EXT)
+        if os.path.exists(path):
+            with open_utf8(path) as file:
+                changes.update(read_po(file, lang, models[lang.filename], string_blocks))
+    return changes
+
+
+def apply_changes(changes: StringChanges, models: Dict[str, Str]) -> List[str]:
+    """Applies changes to the models and returns the file names of the languages that were changed."""
+    changed = []
+    for lang_filename, lang_changes in changes.items():
+        if len(lang_changes) > 0:
+            strings = models[lang_filename].strings
+            for idx, value in lang_changes.items():
+                strings[idx] = value
+            changed.append(lang_filename)
+    return changed
+
+
+def _placeholder_section(begin: int, end: int) -> StringSection:
+    name = f"({begin} - {end - 1})"
+    return StringSection(Pmd2StringBlock(name, name, begin, end), begin, end)
+
+
+def _blocks_by_name(
+        languages: Sequence[Pmd2Language], models: Dict[str, Str], string_blocks: Dict[str, Pmd2StringBlock]
+) -> Dict[str, StringSection]:
+    number_of_strings = max(len(models[lang.filename].strings) for lang in languages)
+    return {section.block.name: section for section in string_sections(string_blocks, number_of_strings)}
+
+
+def _find_language(languages: Sequence[Pmd2Language], name: str) -> Pmd2Language:
+    for lang in languages:
+        if name in (lang.locale, lang.name, lang.filename):
+            return lang
+    raise ValueError(f"Unknown language '{name}'.")
+
+
+def _resolve_index(blocks: Dict[str, StringSection], block_name: str, index: str, location: str) -> int:
+    if block_name not in blocks:
+        raise ValueError(f"{location}: Unknown string block '{block_name}'.")
+    section = blocks[block_name]
+    try:
+        idx = section.block.begin + int(index)
+    except ValueError:
+        raise ValueError(f"{location}: Invalid index '{index}'.")
+    if not section.start <= idx < section.end:
+        raise ValueError(f"{location}: Index {index} is out of range for the string block '{block_name}'.")
+    return idx
+
+
+def _add_change(changes: StringChanges, model: Str, lang_filename: str, idx: int, value: str):
+    if idx >= len(model.strings):
+        if value == '':
+            # export_csv leaves the cells of strings that don't exist in this language empty.
+            return
+        raise ValueError(f"String {idx} doesn't exist in {lang_filename}.")
+    if model.strings[idx] != value:
+        changes[lang_filename][idx] = value
+
+
+def _po_escape(value: str) -> str:
+    return PATTERN_PO_SPECIAL.sub(lambda m: PO_ESCAPE[m.group(0)], value)
+
+
+def _po_unescape(value: str) -> str:
+    return PATTERN_PO_ESCAPE.sub(lambda m: PO_UNESCAPE.get(m.group(1), m.group(1)), value)
+
+
+def _write_po_string(file: TextIO, keyword: str, value: str):
+    if '\n' not in value:
+        file.write(f'{keyword} "{_po_escape(value)}"\n')
+        return
+    file.write(f'{keyword} ""\n')
+    for line in value.splitlines(keepends=True):
+        file.write(f'"{_po_escape(line)}"\n')
+
+
+def _parse_po(file: TextIO) -> Iterator[Tuple[int, Optional[str], str, bool]]:
+    """Yields the line number, message context, translated string and fuzzy flag of each entry of a PO file."""
+    entry: Dict[str, str] = {}
+    entry_line = 0
+    fuzzy = False
+    keyword: Optional[str] = None
+    for line_num, line in enumerate(file, start=1):
+        line = line.strip()
+        if line.startswith('#'):
+            if 'msgid' in entry:
+                # Comments start the next entry
+                yield entry_line, entry.get('msgctxt'), entry.get('msgstr', ''), fuzzy
+                entry, fuzzy, keyword = {}, False, None
+            if line.startswith('#,') and 'fuzzy' in line:
+                fuzzy = True
+            continue
+        if line == '':
+            continue
+        if line.startswith('"'):
+            if keyword is None:
+                raise ValueError(f"Line {line_num}: Unexpected string continuation.")
+            entry[keyword] += _parse_po_string(line, line_num)
+            continue
+        kw, _sep, rest = line.partition(' ')
+        if kw == 'msgstr[0]':
+            kw = 'msgstr'
+        elif kw.startswith('msgstr[') or kw == 'msgid_plural':
+            # Plural forms are not used, only the first form is read.
+            keyword = kw
+            entry[kw] = _parse_po_string(rest, line_num)
+            continue
+        if kw not in ('msgctxt', 'msgid', 'msgstr'):
+            raise ValueError(f"Line {line_num}: Unknown keyword '{kw}'.")
+        if kw in ('msgctxt', 'msgid') and 'msgid' in entry and 'msgstr' in entry:
+            # A new entry starts
+            yield entry_line, entry.get('msgctxt'), entry.get('msgstr', ''), fuzzy
+            entry, fuzzy = {}, False
+        if len(entry) < 1:
+            entry_line = line_num
+        keyword = kw
+        entry[kw] = _parse_po_string(rest, line_num)
+    if 'msgid' in entry:
+        yield entry_line, entry.get('msgctxt'), entry.get('msgstr', ''), fuzzy
+
+
+def _parse_po_string(value: str, line_num: int) -> str:
+    value = value.strip()
+    if len(value) < 2 or not value.startswith('"') or not value.endswith('"'):
+        raise ValueError(f"Line {line_num}: Invalid string.")
+    return _po_unescape(value[1:-1])
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Command line interface to export or import the strings of a ROM without the UI:
+
+    python -m skytemple.module.strings.bulk {export,import} {csv,po} ROM PATH [--output ROM] [--source-locale LOCALE]
+
+    For PO, PATH is a directory with one file per language. Imports only write the string files of
+    languages that were changed.
+    """
+    from ndspy.rom import NintendoDSRom
+    from skytemple_files.common.types.file_types import FileType
+    from skytemple_files.common.util import get_ppmdu_config_for_rom
+
+    parser = argparse.ArgumentParser(description="Bulk import or export the text strings of all languages of a ROM.")
+    parser.add_argument('action', choices=['export', 'import'])
+    parser.add_argument('format', choices=['csv', 'po'])
+    parser.add_argument('rom', help="The ROM to read the strings from.")
+    parser.add_argument('path', help="The CSV file or the directory of PO files.")
+    parser.add_argument('--output', help="The ROM to write an import to. Defaults to the input ROM.")
+    parser.add_argument('--source-locale', help="The locale of the language used as message IDs in PO files. "
+                                                "Defaults to the first language of the ROM.")
+    args = parser.parse_args(argv)
+
+    rom = NintendoDSRom.fromFile(args.rom)
+    string_index_data = get_ppmdu_config_for_rom(rom).string_index_data
+    languages = string_index_data.languages
+    string_blocks = string_index_data.string_blocks
+    models = {
+        lang.filename: FileType.STR.deserialize(rom.getFileByName(f'MESSAGE/{lang.filename}')) for lang in languages
+    }
+
+    if args.action == 'export':
+        if args.format == 'csv':
+            with open_utf8(args.path, 'w') as file:
+                export_csv(file, languages, models, string_blocks)
+        else:
+            source_language = languages[0]
+            if args.source_locale is not None:
+                source_language = _find_language(languages, args.source_locale)
+            export_po_dir(args.path, languages, models, string_blocks, source_language)
+        return
+
+    if args.format == 'csv':
+        with open_utf8(args.path) as file:
+            changes = read_csv(file, languages, models, string_blocks)
+    else:
+        changes = read_po_dir(args.path, languages, models, string_blocks)
+    changed = apply_changes(changes, models)
+    for lang_filename in changed:
+        print(f"{lang_filename}: {len(changes[lang_filename])} strings changed.")
+        rom.setFileByName(f'MESSAGE/{lang_filename}', FileType.STR.serialize(models[lang_filename]))
+    if len(changed) > 0:
+        rom.saveToFile(args.output if args.output is not None else args.rom)
+    else:
+        print("No strings changed.")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
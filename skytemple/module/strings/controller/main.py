@@ -14,28 +14,127 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import sys
+from typing import TYPE_CHECKING, Optional
+
 from gi.repository import Gtk
 
-from skytemple.core.abstract_module import AbstractModule
+from skytemple.controller.main import MainController as SkyTempleMainController
+from skytemple.core.error_handler import display_error
+from skytemple.core.message_dialog import SkyTempleMessageDialog
 from skytemple.core.module_controller import SimpleController
+from skytemple.core.ui_utils import add_dialog_csv_filter
+from skytemple.module.strings.bulk import export_csv, read_csv, export_po_dir, read_po_dir, apply_changes, \
+    StringChanges
+from skytemple_files.data.str.model import open_utf8
 from skytemple_files.common.i18n_util import f, _
 
+if TYPE_CHECKING:
+    from skytemple.module.strings.module import StringsModule
+
 TEXT_STRINGS = _('Text Strings')
 
 
 class MainController(SimpleController):
-    def __init__(self, module: AbstractModule, item_id: int):
-        pass
+    def __init__(self, module: 'StringsModule', item_id: int):
+        self.module = module
 
     def get_title(self) -> str:
         return TEXT_STRINGS
 
     def get_content(self) -> Gtk.Widget:
-        return self.generate_content_label(
+        box: Gtk.Box = Gtk.Box.new(Gtk.Orientation.VERTICAL, 20)
+        label = self.generate_content_label(
             _("This section lets you edit the text strings in the game. Please note that some of these strings "
               "can also be edited in other places in the UI (eg. the Pokémon names under Pokémon).\n"
-              "Not included are the strings of the game's scripts.")
+              "Not included are the strings of the game's scripts.\n\n"
+              "The strings of all languages can be exported and imported at once, either as one CSV file "
+              "(one row per string, one column per language) or as a directory of gettext PO files "
+              "(one file per language).")
         )
+        button_box = Gtk.ButtonBox.new(Gtk.Orientation.VERTICAL)
+        for label_text, handler in (
+                (_('Export all languages as CSV...'), self.on_btn_export_csv_clicked),
+                (_('Import all languages from CSV...'), self.on_btn_import_csv_clicked),
+                (_('Export all languages as PO files...'), self.on_btn_export_po_clicked),
+                (_('Import all languages from PO files...'), self.on_btn_import_po_clicked),
+        ):
+            button: Gtk.Button = Gtk.Button.new_with_label(label_text)
+            button.connect('clicked', handler)
+            button_box.pack_start(button, False, False, 0)
+
+        box.pack_start(label, False, False, 0)
+        box.pack_start(button_box, False, False, 0)
+        return box
 
     def get_icon(self) -> str:
         return 'skytemple-illust-text'
+
+    def on_btn_export_csv_clicked(self, *args):
+        fn = self._choose_file(_("Export strings as..."), Gtk.FileChooserAction.SAVE)
+        if fn is not None:
+            if '.' not in fn:
+                fn += '.csv'
+            try:
+                with open_utf8(fn, 'w') as csv_file:
+                    export_csv(csv_file, self.module.get_languages(), self.module.get_string_files(),
+                               self.module.get_string_blocks())
+            except BaseException as err:
+                display_error(sys.exc_info(), str(err), _("Error exporting the strings."))
+
+    def on_btn_import_csv_clicked(self, *args):
+        fn = self._choose_file(_("Import strings from..."), Gtk.FileChooserAction.OPEN)
+        if fn is not None:
+            try:
+                with open_utf8(fn) as csv_file:
+                    changes = read_csv(csv_file, self.module.get_languages(), self.module.get_string_files(),
+                                       self.module.get_string_blocks())
+                self._apply(changes)
+            except BaseException as err:
+                display_error(sys.exc_info(), str(err), _("Error importing the strings."))
+
+    def on_btn_export_po_clicked(self, *args):
+        directory = self._choose_file(_("Export PO files to..."), Gtk.FileChooserAction.SELECT_FOLDER)
+        if directory is not None:
+            languages = self.module.get_languages()
+            try:
+                # The message IDs are the strings of the first language of the ROM.
+                export_po_dir(directory, languages, self.module.get_string_files(),
+                              self.module.get_string_blocks(), languages[0])
+            except BaseException as err:
+                display_error(sys.exc_info(), str(err), _("Error exporting the strings."))
+
+    def on_btn_import_po_clicked(self, *args):
+        directory = self._choose_file(_("Import PO files from..."), Gtk.FileChooserAction.SELECT_FOLDER)
+        if directory is not None:
+            try:
+                self._apply(read_po_dir(directory, self.module.get_languages(), self.module.get_string_files(),
+                                        self.module.get_string_blocks()))
+            except BaseException as err:
+                display_error(sys.exc_info(), str(err), _("Error importing the strings."))
+
+    def _apply(self, changes: StringChanges):
+        changed = apply_changes(changes, self.module.get_string_files())
+        for lang_filename in changed:
+            self.module.mark_as_modified(lang_filename)
+        number_of_changes = sum(len(lang_changes) for lang_changes in changes.values())
+        md = SkyTempleMessageDialog(
+            SkyTempleMainController.window(),
+            Gtk.DialogFlags.MODAL, Gtk.MessageType.INFO,
+            Gtk.ButtonsType.OK,
+            f(_("{number_of_changes} strings in {len(changed)} languages were changed."))
+        )
+        md.run()
+        md.destroy()
+
+    @staticmethod
+    def _choose_file(title: str, action: Gtk.FileChooserAction) -> Optional[str]:
+        dialog = Gtk.FileChooserNative.new(title, SkyTempleMainController.window(), action, None, None)
+        if action != Gtk.FileChooserAction.SELECT_FOLDER:
+            add_dialog_csv_filter(dialog)
+        response = dialog.run()
+        fn = dialog.get_filename()
+        dialog.destroy()
+        if response == Gtk.ResponseType.ACCEPT:
+            return fn
+        return None
@@ -18,7 +18,7 @@ import csv
 import logging
 import re
 import sys
-from typing import TYPE_CHECKING, Optional, Dict
+from typing import TYPE_CHECKING, Optional, Dict, List, Tuple, Sequence
 
 from gi.repository import Gtk
 from gi.repository.Gtk import TreeModelFilter, TreeSelection
@@ -39,10 +39,16 @@ if TYPE_CHECKING:
 ORANGE = 'orange'
 ORANGE_RGB = (1, 0.65, 0)
 PATTERN_MD_ENTRY = re.compile(r'.*\(\$(\d+)\).*')
+COL_VISIBLE = 4
+# If the visibility of more rows than this changes at once, the view is detached from the model while updating.
+DETACH_VIEW_THRESHOLD = 500
 logger = logging.getLogger(__name__)
 
 
 class StringsController(AbstractController):
+    # If set, the string with this index will be focused on first load
+    focus_string_on_open: Optional[int] = None
+
     def __init__(self, module: 'StringsModule', lang: Pmd2Language):
         self.module = module
         self.langname = lang.name_localized
@@ -56,6 +62,11 @@ class StringsController(AbstractController):
         self._filter: Optional[TreeModelFilter] = None
         self._active_category: Optional[Pmd2StringBlock] = None
         self._search_text = ""
+        # Lowercase copies of all strings for searching, the indices of the currently shown strings
+        # and the category and search text they were filtered with.
+        self._strings_lower: List[str] = []
+        self._visible_idxs: List[int] = []
+        self._last_filter: Tuple[Optional[Pmd2StringBlock], str] = (None, "")
 
     def get_view(self) -> Gtk.Widget:
         self.builder = self._get_builder(__file__, 'strings.glade')
@@ -67,6 +78,9 @@ class StringsController(AbstractController):
 
         self.refresh_cats()
         self.refresh_list()
+        if self.__class__.focus_string_on_open is not None:
+            self._focus_string(self.__class__.focus_string_on_open)
+            self.__class__.focus_string_on_open = None
 
         self.builder.connect_signals(self)
         return self.builder.get_object('main_box')
@@ -84,12 +98,20 @@ class StringsController(AbstractController):
         self._filter = None
         self._active_category = None
         self._search_text = ""
+        self._strings_lower = []
+        self._visible_idxs = []
+        self._last_filter = (None, "")
 
     def on_cr_string_edited(self, widget, path, text):
         idx = self._filter[path][0] - 1
         logger.debug(f'String edited - {idx} - {path} - {self._str.strings[idx]} -> {text}')
         self._filter[path][1] = text
         self._str.strings[idx] = text
+        self._strings_lower[idx] = text.lower()
+        # The edited string may not match the search anymore, so the shown strings can't be narrowed down.
+        self._last_filter = (None, "")
+        if self._search_text != "":
+            self._apply_filter()
         self.module.mark_as_modified(self.filename)
 
     def refresh_cats(self):
@@ -113,26 +135,40 @@ class StringsController(AbstractController):
         renderer_editabletext.connect('edited', self.on_cr_string_edited)
 
         self._list_store: Gtk.ListStore = tree.get_model()
+        # Fill the store with the view detached, so that it doesn't have to process every single row.
+        tree.set_model(None)
         self._list_store.clear()
-        # Iterate strings
+        self._tree_iters_by_idx = {}
         for idx, entry in enumerate(self._str.strings):
-            self._list_store.append([idx + 1, entry, True, None])
+            self._tree_iters_by_idx[idx] = self._list_store.append([idx + 1, entry, True, None, True])
+        self._strings_lower = [entry.lower() for entry in self._str.strings]
+        self._visible_idxs = list(range(0, len(self._str.strings)))
+        self._last_filter = (None, "")
 
         # Apply filter
         self._filter: TreeModelFilter = self._list_store.filter_new()
+        self._filter.set_visible_column(COL_VISIBLE)
         tree.set_model(self._filter)
-        self._filter.set_visible_func(self._visibility_func)
+
+    def _focus_string(self, idx: int):
+        if idx >= len(self._str.strings):  # type: ignore
+            return
+        tree: Gtk.TreeView = self.builder.get_object('string_tree')  # type: ignore
+        path = self._filter.convert_child_path_to_path(Gtk.TreePath.new_from_indices([idx]))  # type: ignore
+        if path is not None:
+            tree.get_selection().select_path(path)
+            tree.scroll_to_cell(path, None, True, 0.5, 0.0)
 
     def on_category_tree_selection_changed(self, selection: TreeSelection):
         """Open a file selected in a tree"""
         model, treeiter = selection.get_selected()
         if treeiter is not None and model is not None:
             self._active_category = model[treeiter][1]
-            self._filter.refilter()  # type: ignore
+            self._apply_filter()
 
     def on_search_search_changed(self, search: Gtk.SearchEntry):
         self._search_text = search.get_text()
-        self._filter.refilter()  # type: ignore
+        self._apply_filter()
 
     def on_btn_import_clicked(self, *args):
         md = SkyTempleMessageDialog(
@@ -209,14 +245,38 @@ class StringsController(AbstractController):
                 wr = csv.writer(result_file)
                 wr.writerows([[x] for x in self._str.strings])
 
-    def _visibility_func(self, model, iter, *args):
-        if self._active_category is not None:
-            if not (self._active_category.begin <= model[iter][0] - 1 < self._active_category.end):
-                return False
-        if self._search_text != "":
-            if self._search_text.lower() not in model[iter][1].lower():
-                return False
-        return True
+    def _apply_filter(self):
+        category = self._active_category
+        search_text = self._search_text.lower()
+        last_category, last_search_text = self._last_filter
+        if category is last_category and last_search_text != "" and search_text.startswith(last_search_text):
+            # The search was narrowed down, only the strings that are currently shown can still match.
+            candidates: Sequence[int] = self._visible_idxs
+        elif category is not None:
+            candidates = range(category.begin, min(category.end, len(self._strings_lower)))
+        else:
+            candidates = range(0, len(self._strings_lower))
+        if search_text != "":
+            strings_lower = self._strings_lower
+            visible_idxs = [idx for idx in candidates if search_text in strings_lower[idx]]
+        else:
+            visible_idxs = list(candidates)
+        self._set_visible(visible_idxs)
+        self._last_filter = (category, search_text)
+
+    def _set_visible(self, visible_idxs: List[int]):
+        """Shows exactly the strings with the given indices, only updating the rows whose visibility changed."""
+        now_visible = set(visible_idxs)
+        changed = now_visible.symmetric_difference(self._visible_idxs)
+        tree: Gtk.TreeView = self.builder.get_object('string_tree')  # type: ignore
+        detach = len(changed) > DETACH_VIEW_THRESHOLD
+        if detach:
+            tree.set_model(None)
+        for idx in changed:
+            self._list_store.set_value(self._tree_iters_by_idx[idx], COL_VISIBLE, idx in now_visible)  # type: ignore
+        if detach:
+            tree.set_model(self._filter)
+        self._visible_idxs = visible_idxs
 
     def _collect_categories(self):
         current_index = 0
@@ -16,15 +16,17 @@
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
 from gi.repository import Gtk
 from gi.repository.Gtk import TreeStore
-from typing import Dict, Optional
+from typing import Dict, Optional, List
 
 from skytemple.core.abstract_module import AbstractModule
+from skytemple.core.open_request import OpenRequest, REQUEST_TYPE_STRING
 from skytemple.core.rom_project import RomProject
 from skytemple.core.ui_utils import recursive_up_item_store_mark_as_modified, generate_item_store_row_label, \
     recursive_generate_item_store_row_label
 from skytemple.module.strings.controller.main import MainController, TEXT_STRINGS
 from skytemple.module.strings.controller.strings import StringsController
 
+from skytemple_files.common.ppmdu_config.data import Pmd2Language, Pmd2StringBlock
 from skytemple_files.common.types.file_types import FileType
 from skytemple_files.data.str.model import Str
 
@@ -57,9 +59,27 @@ class StringsModule(AbstractModule):
         self._tree_model = item_store
         recursive_generate_item_store_row_label(self._tree_model[root])
 
+    def handle_request(self, request: OpenRequest) -> Optional[Gtk.TreeIter]:
+        if request.type == REQUEST_TYPE_STRING:
+            filename, index = request.identifier
+            if filename in self._tree_iters:
+                StringsController.focus_string_on_open = index
+                return self._tree_iters[filename]
+        return None
+
     def get_string_file(self, filename: str) -> Str:
         return self.project.open_file_in_rom(f"MESSAGE/{filename}", FileType.STR)
 
+    def get_languages(self) -> List[Pmd2Language]:
+        return self.project.get_rom_module().get_static_data().string_index_data.languages
+
+    def get_string_blocks(self) -> Dict[str, Pmd2StringBlock]:
+        return self.project.get_rom_module().get_static_data().string_index_data.string_blocks
+
+    def get_string_files(self) -> Dict[str, Str]:
+        """Returns the string files of all languages, by the file names of the languages."""
+        return {lang.filename: self.get_string_file(lang.filename) for lang in self.get_languages()}
+
     def mark_as_modified(self, filename: str):
         """Mark as modified"""
         self.project.mark_as_modified(f"MESSAGE/{filename}")
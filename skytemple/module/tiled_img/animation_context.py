@@ -14,38 +14,162 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
-from typing import List, Iterable, Optional, Tuple
+from bisect import bisect_right
+from typing import List, Optional, Tuple, Sequence, Dict, Iterator, Callable, Set
 
 import cairo
 FRAME_COUNTER_MAX = 1000000
+# (BPA clock, palette animation clocks) that drive a tile or chunk. None or empty if it's not animated by either.
+CellClocks = Tuple[Optional[int], Tuple[int, ...]]
+CLOCK_BPA = 0
+CLOCK_PAL = 1
+
+
+class AnimationClock:
+    """
+    The frame schedule of a single animation (eg. one BPA or the palette animation of one palette).
+    The schedule is made of the durations of all frames of one cycle, in ticks.
+    """
+    def __init__(self, durations: Sequence[int]):
+        # A duration of 0 would never advance, treat it as one tick.
+        self.durations = [max(1, d) for d in durations] if len(durations) > 0 else [1]
+        self.cycle_length = sum(self.durations)
+        # Tick (relative to the start of a cycle) at which each frame starts.
+        self._frame_starts = [0]
+        for d in self.durations[:-1]:
+            self._frame_starts.append(self._frame_starts[-1] + d)
+        self._frame_starts_set = set(self._frame_starts)
+
+    @property
+    def number_of_frames(self) -> int:
+        return len(self.durations)
+
+    def counter_at(self, tick: int) -> int:
+        """
+        Returns how many frames have passed at this tick. Use the % operator to get the current element
+        in the list of frames.
+        """
+        cycles, in_cycle = divmod(tick, self.cycle_length)
+        return cycles * len(self.durations) + bisect_right(self._frame_starts, in_cycle) - 1
+
+    def changes_at(self, tick: int) -> bool:
+        """Whether a new frame starts at this tick."""
+        return tick % self.cycle_length in self._frame_starts_set
+
+
+class AnimationTimeline:
+    """
+    Describes which clocks drive the tiles or chunks of the collections of an AnimationContext.
+    Each tile or chunk can be driven by one BPA clock and any number of palette animation clocks. The timeline
+    itself is stateless, so it can be shared between multiple animation contexts (eg. a map and its chunk icon views).
+
+    If a tile or chunk is driven by multiple palette animation clocks, its palette animation frames are all
+    combinations of the frames of these clocks: The frame index is a mixed radix number, with one digit per clock
+    (in the order of the clocks, the last clock is the least significant digit).
+    """
+    def __init__(
+        self, bpa_clocks: Dict[int, AnimationClock], pal_clocks: Dict[int, AnimationClock],
+        # (collection_idx, cell_idx) -> clocks
+        cell_clocks: Callable[[int, int], CellClocks]
+    ):
+        self.bpa_clocks = bpa_clocks
+        self.pal_clocks = pal_clocks
+        self._cell_clocks = cell_clocks
+        self._cell_clocks_cache: Dict[Tuple[int, int], CellClocks] = {}
+
+    @classmethod
+    def uniform(cls, bpa_durations: int, pal_ani_durations: int) -> 'AnimationTimeline':
+        """A timeline that animates all cells with one BPA speed and one palette animation speed."""
+        bpa_animated = bpa_durations is not None and bpa_durations > 0
+        pal_animated = pal_ani_durations is not None and pal_ani_durations > 0
+        bpa_clocks = {0: AnimationClock([bpa_durations])} if bpa_animated else {}
+        pal_clocks = {0: AnimationClock([pal_ani_durations])} if pal_animated else {}
+        clocks = (0 if bpa_animated else None, (0,) if pal_animated else ())
+        return cls(bpa_clocks, pal_clocks, lambda collection_idx, cell_idx: clocks)
+
+    def clocks_for(self, collection_idx: int, cell_idx: int) -> CellClocks:
+        key = (collection_idx, cell_idx)
+        if key not in self._cell_clocks_cache:
+            self._cell_clocks_cache[key] = self._cell_clocks(collection_idx, cell_idx)
+        return self._cell_clocks_cache[key]
+
+    def all_clocks(self) -> Iterator[Tuple[Tuple[int, int], AnimationClock]]:
+        for idx, clock in self.bpa_clocks.items():
+            yield (CLOCK_BPA, idx), clock
+        for idx, clock in self.pal_clocks.items():
+            yield (CLOCK_PAL, idx), clock
+
+
+class FrameSurfaces(Sequence[cairo.Surface]):
+    """
+    The surfaces of one collection for one frame. The surface for a tile or chunk is only looked up when it is
+    accessed, so collections that generate their surfaces on demand only need to produce what is actually drawn.
+    """
+    def __init__(self, collection: Sequence[Sequence[Sequence[cairo.Surface]]], collection_idx: int,
+                 timeline: AnimationTimeline, counters: Dict[Tuple[int, int], int]):
+        self._collection = collection
+        self._collection_idx = collection_idx
+        self._timeline = timeline
+        self._counters = counters
+        self._cache: Dict[int, cairo.Surface] = {}
+
+    def __len__(self) -> int:
+        return len(self._collection)
+
+    def __getitem__(self, idx):  # type: ignore
+        if idx not in self._cache:
+            bpa_clock, pal_clocks = self._timeline.clocks_for(self._collection_idx, idx)
+            bpa_counter = self._counters[(CLOCK_BPA, bpa_clock)] if bpa_clock is not None else 0
+            pal_counter = self._pal_counter(pal_clocks)
+            pal_ani_frames = self._collection[idx]
+            bpa_ani_frames = pal_ani_frames[pal_counter % len(pal_ani_frames)]
+            self._cache[idx] = bpa_ani_frames[bpa_counter % len(bpa_ani_frames)]
+        return self._cache[idx]
+
+    def __iter__(self) -> Iterator[cairo.Surface]:
+        for idx in range(0, len(self)):
+            yield self[idx]
+
+    def _pal_counter(self, pal_clocks: Tuple[int, ...]) -> int:
+        if len(pal_clocks) == 1:
+            return self._counters[(CLOCK_PAL, pal_clocks[0])]
+        pal_counter = 0
+        for pal_clock in pal_clocks:
+            number_of_frames = self._timeline.pal_clocks[pal_clock].number_of_frames
+            pal_counter = pal_counter * number_of_frames + self._counters[(CLOCK_PAL, pal_clock)] % number_of_frames
+        return pal_counter
 
 
 class AnimationContext:
-    """This class can draw animated backgrounds using palette and frame animations."""
-    # TODO: No BPAs at different speeds supported at the moment
-    # TODO: No BPL animations at different speeds supported at the moment
+    """
+    This class can draw animated backgrounds using palette and frame animations.
+    The speed of the animations is described by an AnimationTimeline. If none is given, all tiles or chunks
+    are animated with the given BPA and palette animation durations.
+    """
     def __init__(
         self,
         # [collection_idx][tile_or_chunk_idx][palette_animation_frame][frame]
         surfaces: List[List[List[List[cairo.Surface]]]],
         bpa_durations: int,
-        pal_ani_durations: int
+        pal_ani_durations: int,
+        timeline: Optional[AnimationTimeline] = None
     ):
         self.surfaces = surfaces
         self.bpa_durations = bpa_durations
         self.pal_ani_durations = pal_ani_durations
+        if timeline is None:
+            timeline = AnimationTimeline.uniform(bpa_durations, pal_ani_durations)
+        self.timeline = timeline
 
-        # This counts up the current frame index for BPA and PAL animations, up to FRAME_COUNTER_MAX,
-        # then it resets to 0. Use the % operator to get the current element in the nested lists, as
+        # The frame counters of all clocks. Use the % operator to get the current element in the nested lists, as
         # their sub-list lengths may vary (eg. not all tiles have the same frame number for
         # BPA animation or palette animation)
-        self._bpa_counter = 0
-        self._pal_counter = 0
+        self._counters: Dict[Tuple[int, int], int] = {key: 0 for key, _ in self.timeline.all_clocks()}
+        # The clocks that advanced to a new frame during the last tick.
+        self._changed_clocks: Set[Tuple[int, int]] = set()
 
-        # The current pal_ani/bpa_ani frame numbers as tuple. This is the current cache "hash"!
-        self._current_cache_hash: Tuple[Optional[int], Optional[int]] = (None, None)
-        # The current cached surfaces for each collection:
-        self._current_cache: List[List[cairo.Surface]] = []
+        # The current cached surfaces for each collection, None if they need to be rebuilt.
+        self._current_cache: Optional[List[FrameSurfaces]] = None
 
         self.frame_counter = 0
 
@@ -53,37 +177,43 @@ class AnimationContext:
     def num_layers(self) -> int:
         return len(self.surfaces)
 
-    def current(self) -> List[List[cairo.Surface]]:
-        """Returns the surfaces for this frame"""
-        if (self._pal_counter, self._bpa_counter) == self._current_cache_hash:
-            return self._current_cache
-
-        self._current_cache = []
-        for collection_idx, collection in enumerate(self.surfaces):
-            # The surfaces for this collection, for this frame:
-            collection_surfaces: List[cairo.Surface] = []
-            for tile_idx, pal_ani_frames in enumerate(collection):
-                bpa_ani_frames = pal_ani_frames[self._pal_counter % len(pal_ani_frames)]
-                surf = bpa_ani_frames[self._bpa_counter % len(bpa_ani_frames)]
-                collection_surfaces.append(surf)
-            self._current_cache.append(collection_surfaces)
-        self._current_cache_hash = (self._pal_counter, self._bpa_counter)
-        return self._current_cache
+    @property
+    def changed(self) -> bool:
+        """Whether any tile or chunk may have changed its frame during the last tick."""
+        return len(self._changed_clocks) > 0
 
-    def advance(self):
-        # Advance frame if enough time passed
-        if self.bpa_durations > 0:
-            if self.frame_counter % self.bpa_durations == 0:
-                self._bpa_counter += 1
-                if self._bpa_counter > FRAME_COUNTER_MAX:
-                    self._bpa_counter = 0
+    @property
+    def is_animated(self) -> bool:
+        return any(True for _ in self.timeline.all_clocks())
 
-        if self.pal_ani_durations > 0:
-            if self.frame_counter % self.pal_ani_durations == 0:
-                self._pal_counter += 1
-                if self._pal_counter > FRAME_COUNTER_MAX:
-                    self._pal_counter = 0
+    def has_changed(self, collection_idx: int, idx: int) -> bool:
+        """Whether the tile or chunk changed its frame during the last tick."""
+        if not self._changed_clocks:
+            return False
+        bpa_clock, pal_clocks = self.timeline.clocks_for(collection_idx, idx)
+        return (CLOCK_BPA, bpa_clock) in self._changed_clocks or any(
+            (CLOCK_PAL, pal_clock) in self._changed_clocks for pal_clock in pal_clocks
+        )
 
+    def current(self) -> List[FrameSurfaces]:
+        """Returns the surfaces for this frame"""
+        if self._current_cache is None:
+            self._current_cache = [
+                FrameSurfaces(collection, i, self.timeline, self._counters) for i, collection in enumerate(self.surfaces)
+            ]
+        return self._current_cache
+
+    def advance(self) -> bool:
+        """Advances all clocks by one tick. Returns whether any tile or chunk changed its frame."""
         self.frame_counter += 1
         if self.frame_counter > FRAME_COUNTER_MAX:
             self.frame_counter = 0
+
+        self._changed_clocks = set()
+        for key, clock in self.timeline.all_clocks():
+            if clock.changes_at(self.frame_counter):
+                self._changed_clocks.add(key)
+                self._counters[key] = clock.counter_at(self.frame_counter)
+        if self._changed_clocks:
+            self._current_cache = None
+        return self.changed
@@ -15,19 +15,17 @@
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
 
-import itertools
 import os
 from typing import Union, List, Optional
 
-import cairo
 from gi.repository import Gtk
 from gi.repository.Gtk import ResponseType, IconView, ScrolledWindow
 
-from skytemple.core.img_utils import pil_to_cairo_surface
 from skytemple.core.ui_utils import APP, make_builder
 from skytemple.module.tiled_img.chunk_editor_data_provider.tile_graphics_provider import AbstractTileGraphicsProvider
 from skytemple.module.tiled_img.chunk_editor_data_provider.tile_palettes_provider import AbstractTilePalettesProvider
 from skytemple.module.tiled_img.drawer_tiled import DrawerTiledCellRenderer, DrawerTiled
+from skytemple.module.tiled_img.tile_surfaces import TileSurfaceCache
 from skytemple_files.common.protocol import TilemapEntryProtocol
 from skytemple_files.common.tiled_image import TilemapEntry
 from skytemple_files.common.i18n_util import f, _
@@ -69,85 +67,35 @@ class ChunkEditorController:
         for mapping in incoming_mappings:
             self.edited_mappings.append(TilemapEntry.from_int(mapping.to_int()))
 
-        self.tile_surfaces = []
-        # For each palette
-        for pal in range(0, len(self.palettes.get())):
-            all_bpc_tiles_for_current_pal = self.tile_graphics.get_pil(self.palettes.get(), pal)
-            tiles_current_pal: List[List[List[cairo.Surface]]] = []
-            self.tile_surfaces.append(tiles_current_pal)
-
-            has_pal_ani = self.palettes.is_palette_affected_by_animation(pal)
-            len_pal_ani = self.palettes.animation_length() if has_pal_ani else 1
-
-            # BPC tiles
-            # For each tile...
-            for tile_idx in range(0, self.tile_graphics.count()):
-                # For each frame of palette animation...
-                pal_ani_tile: List[List[cairo.Surface]] = []
-                tiles_current_pal.append(pal_ani_tile)
-                for pal_ani in range(0, len_pal_ani):
-                    # Switch out the palette with that from the palette animation
-                    if has_pal_ani:
-                        pal_for_frame = itertools.chain.from_iterable(self.palettes.apply_palette_animations(pal_ani))
-                        all_bpc_tiles_for_current_pal.putpalette(pal_for_frame)
-                    pal_ani_tile.append([pil_to_cairo_surface(
-                        all_bpc_tiles_for_current_pal.crop(
-                            (0, tile_idx * TILE_DIM, TILE_DIM, tile_idx * TILE_DIM + TILE_DIM)
-                        ).convert('RGBA')
-                    )])
-            # BPA tiles
-            # For each BPA...
-            if self.animated_tile_graphics is not None:
-                for ani_tile_g in self.animated_tile_graphics:
-                    if ani_tile_g is not None:
-                        all_bpa_tiles_for_current_pal = ani_tile_g.get_pil(self.palettes.get(), pal)
-                        # For each tile...
-                        for tile_idx in range(0, ani_tile_g.count()):
-                            pal_ani_tile = []
-                            tiles_current_pal.append(pal_ani_tile)
-                            # For each frame of palette animation...
-                            for pal_ani in range(0, len_pal_ani):
-                                bpa_ani_tile: List[cairo.Surface] = []
-                                pal_ani_tile.append(bpa_ani_tile)
-                                # For each frame of BPA animation...
-                                for frame in all_bpa_tiles_for_current_pal:
-                                    # Switch out the palette with that from the palette animation
-                                    if has_pal_ani:
-                                        pal_for_frame = itertools.chain.from_iterable(self.palettes.apply_palette_animations(pal_ani))
-                                        all_bpc_tiles_for_current_pal.putpalette(pal_for_frame)
-                                    bpa_ani_tile.append(pil_to_cairo_surface(
-                                        frame.crop(
-                                            (0, tile_idx * TILE_DIM, TILE_DIM, tile_idx * TILE_DIM + TILE_DIM)
-                                        ).convert('RGBA')
-                                    ))
-
-            self.builder.connect_signals(self)
-
-            self.dummy_tile_map = []
-            self.current_tile_picker_palette = 0
-            for i in range(0, self.tile_graphics.count()):
-                self.dummy_tile_map.append(TilemapEntry(
-                    idx=i,
-                    pal_idx=self.current_tile_picker_palette,
-                    flip_x=False,
-                    flip_y=False
-                ))
-
-            if self.animated_tile_graphics:
-                self.bpa_starts_cursor = len(self.dummy_tile_map)
-                self.bpa_starts: List[Optional[int]] = [None, None, None, None]
-                for i, ani_tile_g in enumerate(self.animated_tile_graphics):
-                    if ani_tile_g is not None:
-                        self.bpa_starts[i] = self.bpa_starts_cursor
-                        self.current_tile_picker_palette = 0
-                        for j in range(0, ani_tile_g.count()):
-                            self.dummy_tile_map.append(TilemapEntry(
-                                idx=self.bpa_starts_cursor + j,
-                                pal_idx=self.current_tile_picker_palette,
-                                flip_x=False,
-                                flip_y=False
-                            ))
-                        self.bpa_starts_cursor += ani_tile_g.count()
+        self.tile_surfaces = TileSurfaceCache(self.tile_graphics, self.palettes, self.animated_tile_graphics)
+
+        self.builder.connect_signals(self)
+
+        self.dummy_tile_map = []
+        self.current_tile_picker_palette = 0
+        for i in range(0, self.tile_graphics.count()):
+            self.dummy_tile_map.append(TilemapEntry(
+                idx=i,
+                pal_idx=self.current_tile_picker_palette,
+                flip_x=False,
+                flip_y=False
+            ))
+
+        if self.animated_tile_graphics:
+            self.bpa_starts_cursor = len(self.dummy_tile_map)
+            self.bpa_starts: List[Optional[int]] = [None, None, None, None]
+            for i, ani_tile_g in enumerate(self.animated_tile_graphics):
+                if ani_tile_g is not None:
+                    self.bpa_starts[i] = self.bpa_starts_cursor
+                    self.current_tile_picker_palette = 0
+                    for j in range(0, ani_tile_g.count()):
+                        self.dummy_tile_map.append(TilemapEntry(
+                            idx=self.bpa_starts_cursor + j,
+                            pal_idx=self.current_tile_picker_palette,
+                            flip_x=False,
+                            flip_y=False
+                        ))
+                    self.bpa_starts_cursor += ani_tile_g.count()
 
     def show(self):
 
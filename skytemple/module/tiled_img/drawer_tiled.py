@@ -21,11 +21,13 @@ Tile based instead of chunk based.
 
 from typing import List, Union
 
-from gi.repository import GLib, Gtk
+from gi.repository import Gtk
 from gi.repository.GObject import ParamFlags
 from gi.repository.Gtk import Widget
 
 from skytemple.core.events.manager import EventManager
+from skytemple.core.frame_clock import FrameClock
+from skytemple.core.mapbg_util.visible_area import get_visible_cells
 from skytemple.module.tiled_img.animation_context import AnimationContext
 from skytemple_files.common.tiled_image import TilemapEntry
 import cairo
@@ -84,10 +86,17 @@ class DrawerTiled:
         if isinstance(self.draw_area, Gtk.DrawingArea):
             self.draw_area.connect('draw', self.draw)
         self.draw_area.queue_draw()
-        GLib.timeout_add(int(1000 / FPS), self._tick)
+        self._update_frame_clock_subscription()
 
     def stop(self):
         self.drawing_is_active = False
+        self._update_frame_clock_subscription()
+
+    def _update_frame_clock_subscription(self):
+        """Only receive ticks from the frame clock while drawing and if there is anything animated."""
+        FrameClock.instance().set_subscribed(
+            self, self.drawing_is_active and self.animation_context.is_animated, self.draw_area, self._tick, FPS
+        )
 
     def _tick(self):
         if self.draw_area is None:
@@ -96,8 +105,7 @@ class DrawerTiled:
             # XXX: Gtk doesn't remove the widget on switch sometimes...
             self.draw_area.destroy()
             return False
-        self.animation_context.advance()
-        if EventManager.instance().get_if_main_window_has_fous():
+        if self.animation_context.advance() and EventManager.instance().get_if_main_window_has_fous():
             self.draw_area.queue_draw()
         return self.drawing_is_active
 
@@ -116,28 +124,28 @@ class DrawerTiled:
         matrix_x_flip = cairo.Matrix(-1, 0, 0, 1, BPC_TILE_DIM, 0)
         matrix_y_flip = cairo.Matrix(1, 0, 0, -1, 0, BPC_TILE_DIM)
         tiles_for_pals = self.animation_context.current()
-        for i, mapping in enumerate(self.tile_mappings):  # type: ignore
-            tiles_for_frame = tiles_for_pals[mapping.pal_idx]
-            tile_at_pos = mapping.idx
-            if 0 < tile_at_pos < len(tiles_for_frame):
-                tile = tiles_for_frame[tile_at_pos]
-                if mapping.flip_x:
-                    ctx.transform(matrix_x_flip)
-                if mapping.flip_y:
-                    ctx.transform(matrix_y_flip)
-                ctx.set_source_surface(tile, 0, 0)
-                ctx.get_source().set_filter(cairo.Filter.NEAREST)
-                ctx.paint()
-                if mapping.flip_x:
-                    ctx.transform(matrix_x_flip)
-                if mapping.flip_y:
-                    ctx.transform(matrix_y_flip)
-            if (i + 1) % self.tiling_width == 0:
-                # Move to beginning of next line
-                ctx.translate(-BPC_TILE_DIM * (self.tiling_width - 1), BPC_TILE_DIM)
-            else:
-                # Move to next tile in line
-                ctx.translate(BPC_TILE_DIM, 0)
+        # Only the tiles inside the clip region are drawn
+        width_in_tiles = self.width // BPC_TILE_DIM
+        visible_tiles_x, visible_tiles_y = get_visible_cells(
+            ctx, BPC_TILE_DIM, BPC_TILE_DIM, width_in_tiles, self.height // BPC_TILE_DIM
+        )
+        for y in visible_tiles_y:
+            for x in visible_tiles_x:
+                mapping = self.tile_mappings[y * width_in_tiles + x]  # type: ignore
+                tiles_for_frame = tiles_for_pals[mapping.pal_idx]
+                tile_at_pos = mapping.idx
+                if 0 < tile_at_pos < len(tiles_for_frame):
+                    tile = tiles_for_frame[tile_at_pos]
+                    ctx.save()
+                    ctx.translate(x * BPC_TILE_DIM, y * BPC_TILE_DIM)
+                    if mapping.flip_x:
+                        ctx.transform(matrix_x_flip)
+                    if mapping.flip_y:
+                        ctx.transform(matrix_y_flip)
+                    ctx.set_source_surface(tile, 0, 0)
+                    ctx.get_source().set_filter(cairo.Filter.NEAREST)
+                    ctx.paint()
+                    ctx.restore()
 
 
 class DrawerTiledCellRenderer(DrawerTiled, Gtk.CellRenderer):
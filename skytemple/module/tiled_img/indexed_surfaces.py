@@ -0,0 +1,224 @@
+#  Copyright 2020-2021 Capypara and the SkyTemple Contributors
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import itertools
+import logging
+from abc import ABC, abstractmethod
+from typing import List, Optional, Dict, Tuple, Iterable, Iterator, Sequence, Hashable
+
+import cairo
+from PIL import Image
+from gi.repository import GLib
+
+from skytemple.core.img_utils import palette_to_bgra_luts, pil_indexed_to_cairo_surface_with_luts
+
+# Number of surfaces to render per idle callback when filling the cache in the background.
+BACKGROUND_FILL_BATCH_SIZE = 16
+# (collection, tile or chunk index, palette animation frame, frame)
+IndexedSurfaceKey = Tuple[int, int, int, int]
+logger = logging.getLogger(__name__)
+
+
+class IndexedSurfaceCache(Sequence['IndexedSurfaceCollection'], ABC):
+    """
+    Renders the cairo surfaces of tiles or chunks on demand and caches them.
+
+    Behaves like the nested list format expected by AnimationContext and the tile and chunk drawers:
+    surfaces[collection_idx][idx][palette_animation_frame][frame]
+    Only surfaces that are actually accessed are rendered. fill_in_background can be used to render the
+    remaining surfaces when the UI is idle.
+
+    The tiles and chunks are only rendered once as indexed images, for all palette animation frames.
+    Each palette (and each frame of a palette animation) is turned into lookup tables once, which are then used
+    to convert the indexed images directly into surfaces.
+
+    Subclasses describe the tiles or chunks of their format (eg. BPC chunks or DPCI tiles) and their palettes.
+    """
+    # Color indices that are rendered fully transparent.
+    transparent_indices: Sequence[int] = ()
+
+    def __init__(self):
+        self._surfaces: Dict[IndexedSurfaceKey, cairo.ImageSurface] = {}
+        # (collection, idx) -> One image per frame
+        self._images: Dict[Tuple[int, int], List[Image.Image]] = {}
+        # (collection, idx) -> Number of palette animation frames (0 if not animated)
+        self._pal_ani_frames: Dict[Tuple[int, int], int] = {}
+        # Palette key -> Lookup tables
+        self._luts: Dict[Hashable, Tuple[bytes, bytes, bytes, bytes]] = {}
+        self._collections: Optional[List[IndexedSurfaceCollection]] = None
+        self._fill_source_id: Optional[int] = None
+
+    @abstractmethod
+    def number_of_collections(self) -> int:
+        """Number of collections (eg. layers or palettes)."""
+
+    @abstractmethod
+    def number_of_cells(self, collection: int) -> int:
+        """Number of tiles or chunks in the collection."""
+
+    @abstractmethod
+    def _render_images(self, collection: int, idx: int) -> List[Image.Image]:
+        """Renders the indexed (mode 'P' or 'L') images of a tile or chunk, one for each frame of tile animation."""
+
+    @abstractmethod
+    def _count_pal_ani_frames(self, collection: int, idx: int) -> int:
+        """Number of palette animation frames of the tile or chunk, 0 if it doesn't use any animated palette."""
+
+    @abstractmethod
+    def _get_palette_key(self, collection: int, idx: int, pal_frame: Optional[int]) -> Hashable:
+        """
+        Returns the key of the palette the tile or chunk is rendered with. pal_frame is None,
+        if it is not affected by palette animation. Tiles and chunks with the same key share the lookup tables.
+        """
+
+    @abstractmethod
+    def _build_palette(self, key: Hashable) -> Sequence[int]:
+        """Returns the flat RGB palette for a key returned by _get_palette_key."""
+
+    def __len__(self) -> int:
+        return self.number_of_collections()
+
+    def __getitem__(self, collection):  # type: ignore
+        if self._collections is None:
+            self._collections = [IndexedSurfaceCollection(self, i) for i in range(0, self.number_of_collections())]
+        return self._collections[collection]
+
+    def get_images(self, collection: int, idx: int) -> List[Image.Image]:
+        """Returns the indexed images of a tile or chunk, one for each frame of tile animation."""
+        if (collection, idx) not in self._images:
+            self._images[(collection, idx)] = self._render_images(collection, idx)
+        return self._images[(collection, idx)]
+
+    def number_of_frames(self, collection: int, idx: int) -> int:
+        return len(self.get_images(collection, idx))
+
+    def number_of_pal_ani_frames(self, collection: int, idx: int) -> int:
+        return max(1, self._get_pal_ani_frames(collection, idx))
+
+    def _get_pal_ani_frames(self, collection: int, idx: int) -> int:
+        if (collection, idx) not in self._pal_ani_frames:
+            self._pal_ani_frames[(collection, idx)] = self._count_pal_ani_frames(collection, idx)
+        return self._pal_ani_frames[(collection, idx)]
+
+    def get_surface(self, collection: int, idx: int, pal_frame: int, frame: int) -> cairo.ImageSurface:
+        key = (collection, idx, pal_frame, frame)
+        if key not in self._surfaces:
+            img = self.get_images(collection, idx)[frame]
+            animated = self._get_pal_ani_frames(collection, idx) > 0
+            luts = self._get_luts(self._get_palette_key(collection, idx, pal_frame if animated else None))
+            self._surfaces[key] = pil_indexed_to_cairo_surface_with_luts(img, luts)
+        return self._surfaces[key]
+
+    def _get_luts(self, palette_key: Hashable) -> Tuple[bytes, bytes, bytes, bytes]:
+        if palette_key not in self._luts:
+            self._luts[palette_key] = palette_to_bgra_luts(self._build_palette(palette_key), self.transparent_indices)
+        return self._luts[palette_key]
+
+    def fill_in_background(self, priority: Iterable[Iterable[int]] = ()):
+        """
+        Renders all remaining surfaces in small batches, whenever the GLib main loop is idle.
+        The tiles or chunks in priority (one iterable of indices per collection, eg. the chunks used by a map)
+        are rendered first.
+        """
+        self.stop_background_fill()
+        keys = self._iter_all_keys(priority)
+
+        def fill_step():
+            rendered = 0
+            try:
+                for key in itertools.islice(keys, BACKGROUND_FILL_BATCH_SIZE):
+                    self.get_surface(*key)
+                    rendered += 1
+            except BaseException as ex:
+                logger.error("Error rendering surfaces in the background.", exc_info=ex)
+                rendered = 0
+            if rendered < BACKGROUND_FILL_BATCH_SIZE:
+                # Done (or failed).
+                self._fill_source_id = None
+                return False
+            return True
+
+        self._fill_source_id = GLib.idle_add(fill_step, priority=GLib.PRIORITY_LOW)
+
+    def stop_background_fill(self):
+        if self._fill_source_id is not None:
+            GLib.source_remove(self._fill_source_id)
+            self._fill_source_id = None
+
+    def _iter_all_keys(self, priority: Iterable[Iterable[int]]) -> Iterator[IndexedSurfaceKey]:
+        priority_sorted = [sorted(set(indices)) for indices in priority]
+        for collection, indices in enumerate(priority_sorted):
+            if collection < len(self):
+                yield from self._iter_cell_keys(
+                    collection, (i for i in indices if 0 <= i < self.number_of_cells(collection))
+                )
+        for collection in range(0, len(self)):
+            yield from self._iter_cell_keys(collection, range(0, self.number_of_cells(collection)))
+
+    def _iter_cell_keys(self, collection: int, indices: Iterable[int]) -> Iterator[IndexedSurfaceKey]:
+        for idx in indices:
+            for pal in range(0, self.number_of_pal_ani_frames(collection, idx)):
+                for frame in range(0, self.number_of_frames(collection, idx)):
+                    if (collection, idx, pal, frame) not in self._surfaces:
+                        yield collection, idx, pal, frame
+
+
+class IndexedSurfaceCollection(Sequence['IndexedSurfacePalFrames']):
+    """surfaces[collection_idx]: All tiles or chunks of a collection."""
+    def __init__(self, cache: IndexedSurfaceCache, collection: int):
+        self._cache = cache
+        self._collection = collection
+
+    def __len__(self) -> int:
+        return self._cache.number_of_cells(self._collection)
+
+    def __getitem__(self, idx):  # type: ignore
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        return IndexedSurfacePalFrames(self._cache, self._collection, idx)
+
+
+class IndexedSurfacePalFrames(Sequence['IndexedSurfaceFrames']):
+    """surfaces[collection_idx][idx]: The palette animation frames of a tile or chunk."""
+    def __init__(self, cache: IndexedSurfaceCache, collection: int, idx: int):
+        self._cache = cache
+        self._collection = collection
+        self._idx = idx
+
+    def __len__(self) -> int:
+        return self._cache.number_of_pal_ani_frames(self._collection, self._idx)
+
+    def __getitem__(self, pal_frame):  # type: ignore
+        if not 0 <= pal_frame < len(self):
+            raise IndexError(pal_frame)
+        return IndexedSurfaceFrames(self._cache, self._collection, self._idx, pal_frame)
+
+
+class IndexedSurfaceFrames(Sequence[cairo.ImageSurface]):
+    """surfaces[collection_idx][idx][palette_animation_frame]: The animation frames of a tile or chunk."""
+    def __init__(self, cache: IndexedSurfaceCache, collection: int, idx: int, pal_frame: int):
+        self._cache = cache
+        self._collection = collection
+        self._idx = idx
+        self._pal_frame = pal_frame
+
+    def __len__(self) -> int:
+        return self._cache.number_of_frames(self._collection, self._idx)
+
+    def __getitem__(self, frame):  # type: ignore
+        if not 0 <= frame < len(self):
+            raise IndexError(frame)
+        return self._cache.get_surface(self._collection, self._idx, self._pal_frame, frame)
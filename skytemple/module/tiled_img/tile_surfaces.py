@@ -0,0 +1,101 @@
+#  Copyright 2020-2021 Capypara and the SkyTemple Contributors
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import itertools
+from typing import List, Optional, Dict, Tuple, Hashable, Sequence
+
+from PIL import Image
+
+from skytemple.module.tiled_img.chunk_editor_data_provider.tile_graphics_provider import AbstractTileGraphicsProvider
+from skytemple.module.tiled_img.chunk_editor_data_provider.tile_palettes_provider import AbstractTilePalettesProvider
+from skytemple.module.tiled_img.indexed_surfaces import IndexedSurfaceCache
+
+TILE_DIM = 8
+
+
+class TileSurfaceCache(IndexedSurfaceCache):
+    """
+    Renders the cairo surfaces for all tiles of the chunk editor on demand, in all palettes:
+    tile_surfaces[pal][tile_idx][pal_frame][frame]
+    The static tiles come first, followed by the tiles of each set of animated tiles.
+    """
+    def __init__(
+            self, tile_graphics: AbstractTileGraphicsProvider, palettes: AbstractTilePalettesProvider,
+            animated_tile_graphics: Optional[List[Optional[AbstractTileGraphicsProvider]]] = None
+    ):
+        super().__init__()
+        self._tile_graphics = tile_graphics
+        self._palettes = palettes
+        self._animated_tile_graphics = [g for g in animated_tile_graphics or [] if g is not None]
+        # The index of the first tile of each set of animated tiles.
+        self._animated_starts = []
+        start = tile_graphics.count()
+        for ani_tile_g in self._animated_tile_graphics:
+            self._animated_starts.append(start)
+            start += ani_tile_g.count()
+        self._number_of_tiles = start
+        # (set of animated tiles or None for static tiles, pal) -> All tiles of the set (one image per frame)
+        self._sheets: Dict[Tuple[Optional[int], int], List[Image.Image]] = {}
+
+    def number_of_collections(self) -> int:
+        return len(self._palettes.get())
+
+    def number_of_cells(self, pal: int) -> int:
+        return self._number_of_tiles
+
+    def _render_images(self, pal: int, tile_idx: int) -> List[Image.Image]:
+        ani_set, local_idx = self._locate(tile_idx)
+        crop_box = (0, local_idx * TILE_DIM, TILE_DIM, local_idx * TILE_DIM + TILE_DIM)
+        return [sheet.crop(crop_box) for sheet in self._get_sheets(ani_set, pal)]
+
+    def _count_pal_ani_frames(self, pal: int, tile_idx: int) -> int:
+        if not self._palettes.is_palette_affected_by_animation(pal):
+            return 0
+        return self._palettes.animation_length()
+
+    def _get_palette_key(self, pal: int, tile_idx: int, pal_frame: Optional[int]) -> Hashable:
+        ani_set, _ = self._locate(tile_idx)
+        if ani_set is None:
+            # The static tiles are colored with the palette at its place in the palettes merged together.
+            return None, pal_frame
+        # Animated tiles only use the colors of their own palette.
+        return pal, pal_frame
+
+    def _build_palette(self, key: Tuple[Optional[int], Optional[int]]) -> Sequence[int]:  # type: ignore
+        pal, pal_frame = key
+        if pal_frame is None:
+            palettes = self._palettes.get()
+        else:
+            # Switch out the palette with that from the palette animation
+            palettes = self._palettes.apply_palette_animations(pal_frame)
+        if pal is None:
+            return list(itertools.chain.from_iterable(palettes))
+        return palettes[pal]
+
+    def _locate(self, tile_idx: int) -> Tuple[Optional[int], int]:
+        """Returns the set of animated tiles (None for static tiles) and the index of the tile in it."""
+        for ani_set in reversed(range(0, len(self._animated_starts))):
+            if tile_idx >= self._animated_starts[ani_set]:
+                return ani_set, tile_idx - self._animated_starts[ani_set]
+        return None, tile_idx
+
+    def _get_sheets(self, ani_set: Optional[int], pal: int) -> List[Image.Image]:
+        if (ani_set, pal) not in self._sheets:
+            if ani_set is None:
+                self._sheets[(ani_set, pal)] = [self._tile_graphics.get_pil(self._palettes.get(), pal)]
+            else:
+                self._sheets[(ani_set, pal)] = self._animated_tile_graphics[ani_set].get_pil(self._palettes.get(), pal)
+        return self._sheets[(ani_set, pal)]